@@ -73,14 +73,24 @@ class AIMM(aio.Resource):
         self._connection.state.register_change_cb(self._on_remote_state_change)
 
     async def create_instance(
-        self, model_type: str, *args: "PluginArg", **kwargs: "PluginArg"
+        self,
+        model_type: str,
+        *args: "PluginArg",
+        timeout: typing.Optional[float] = None,
+        **kwargs: "PluginArg",
     ) -> "Model":
-        """Creates a model instance on the remote server"""
+        """Creates a model instance on the remote server, failing if it is not
+        created within `timeout` seconds, if set"""
         args = tuple(_arg_to_json(a) for a in args)
         kwargs = {k: _arg_to_json(v) for k, v in kwargs.items()}
         model_json = await self._connection.send(
             "create_instance",
-            {"model_type": model_type, "args": args, "kwargs": kwargs},
+            {
+                "model_type": model_type,
+                "args": args,
+                "kwargs": kwargs,
+                "timeout": timeout,
+            },
         )
         return Model(self, model_json["instance_id"], model_json["model_type"])
 
@@ -112,25 +122,46 @@ class AIMM(aio.Resource):
         return Model(self, model_json["instance_id"], model_json["model_type"])
 
     async def fit(
-        self, instance_id: int, *args: "PluginArg", **kwargs: "PluginArg"
+        self,
+        instance_id: int,
+        *args: "PluginArg",
+        timeout: typing.Optional[float] = None,
+        **kwargs: "PluginArg",
     ) -> "Model":
-        """Fits an instance on the remote server"""
+        """Fits an instance on the remote server, failing if it is not fitted
+        within `timeout` seconds, if set"""
         args = tuple(_arg_to_json(a) for a in args)
         kwargs = {k: _arg_to_json(v) for k, v in kwargs.items()}
         model_json = await self._connection.send(
-            "fit", {"instance_id": instance_id, "args": args, "kwargs": kwargs}
+            "fit",
+            {
+                "instance_id": instance_id,
+                "args": args,
+                "kwargs": kwargs,
+                "timeout": timeout,
+            },
         )
         return Model(self, model_json["instance_id"], model_json["model_type"])
 
     async def predict(
-        self, instance_id: int, *args: "PluginArg", **kwargs: "PluginArg"
+        self,
+        instance_id: int,
+        *args: "PluginArg",
+        timeout: typing.Optional[float] = None,
+        **kwargs: "PluginArg",
     ) -> typing.Any:
-        """Uses an instance on the remote server for a prediction"""
+        """Uses an instance on the remote server for a prediction, failing if
+        it is not made within `timeout` seconds, if set"""
         args = tuple(_arg_to_json(a) for a in args)
         kwargs = {k: _arg_to_json(v) for k, v in kwargs.items()}
         result = await self._connection.send(
             "predict",
-            {"instance_id": instance_id, "args": args, "kwargs": kwargs},
+            {
+                "instance_id": instance_id,
+                "args": args,
+                "kwargs": kwargs,
+                "timeout": timeout,
+            },
         )
         return _result_from_json(result)
 
@@ -160,15 +191,29 @@ class Model:
         self._instance_id = instance_id
         self._model_type = model_type
 
-    async def fit(self, *args: "PluginArg", **kwargs: "PluginArg"):
-        """Fits the model"""
-        await self._aimm.fit(self._instance_id, *args, **kwargs)
+    async def fit(
+        self,
+        *args: "PluginArg",
+        timeout: typing.Optional[float] = None,
+        **kwargs: "PluginArg",
+    ):
+        """Fits the model, failing if it is not fitted within `timeout`
+        seconds, if set"""
+        await self._aimm.fit(
+            self._instance_id, *args, timeout=timeout, **kwargs
+        )
 
     async def predict(
-        self, *args: "PluginArg", **kwargs: "PluginArg"
+        self,
+        *args: "PluginArg",
+        timeout: typing.Optional[float] = None,
+        **kwargs: "PluginArg",
     ) -> typing.Any:
-        """Uses the model to generate a prediction"""
-        return await self._aimm.predict(self._instance_id, *args, **kwargs)
+        """Uses the model to generate a prediction, failing if it is not made
+        within `timeout` seconds, if set"""
+        return await self._aimm.predict(
+            self._instance_id, *args, timeout=timeout, **kwargs
+        )
 
     def __repr__(self):
         return (
@@ -1,9 +1,16 @@
-from aimm.plugins.common import Model, initialize, StateCallback
+from aimm.plugins.common import (
+    ExecutionMode,
+    Model,
+    initialize,
+    get_initialized_modules,
+    StateCallback,
+)
 from aimm.plugins.decorators import (
     data_access,
     instantiate,
     fit,
     predict,
+    batch_predict,
     serialize,
     deserialize,
     model,
@@ -14,18 +21,22 @@ from aimm.plugins.execute import (
     exec_instantiate,
     exec_fit,
     exec_predict,
+    exec_predict_batch,
     exec_serialize,
     exec_deserialize,
 )
 
 
 __all__ = [
+    "ExecutionMode",
     "Model",
     "initialize",
+    "get_initialized_modules",
     "exec_data_access",
     "exec_instantiate",
     "exec_fit",
     "exec_predict",
+    "exec_predict_batch",
     "exec_serialize",
     "exec_deserialize",
     "StateCallback",
@@ -33,6 +44,7 @@ __all__ = [
     "instantiate",
     "fit",
     "predict",
+    "batch_predict",
     "serialize",
     "deserialize",
     "model",
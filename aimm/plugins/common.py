@@ -1,11 +1,22 @@
-from typing import Any, ByteString, Callable, Dict, NamedTuple, Optional
+from typing import (
+    Any,
+    ByteString,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+)
 import abc
+import enum
 import importlib
 import logging
 
 
 mlog = logging.getLogger(__name__)
 
+_initialized_modules: List[str] = []
+
 
 class Model(abc.ABC):
     """Interface unifying multiple plugin entry points under same type.
@@ -29,6 +40,19 @@ class Model(abc.ABC):
         """Deserialize method for model instances"""
 
 
+class ExecutionMode(enum.Enum):
+    """Declares where the callers should execute a plugin function"""
+
+    PROCESS = "process"
+    """separate process, isolated from the caller, may be terminated"""
+    THREAD = "thread"
+    """thread of the calling process, avoids the cost of creating a process
+    and transferring arguments and results, but can not be terminated"""
+    INLINE = "inline"
+    """directly in the caller's thread (e.g. in its event loop), only
+    suitable for functions that return almost immediately"""
+
+
 class DataAccessPlugin(NamedTuple):
     """Object containing data access plugin function and call metadata"""
 
@@ -38,6 +62,19 @@ class DataAccessPlugin(NamedTuple):
     """plugin function"""
     state_cb_arg_name: Optional[str] = None
     """name of the keyword argument for the state change cb"""
+    execution_mode: ExecutionMode = ExecutionMode.PROCESS
+    """where the plugin function should be executed"""
+    cache: bool = True
+    """whether callers may cache the accessed data"""
+    cache_ttl: Optional[float] = None
+    """number of seconds the cached data is valid, if None, callers decide"""
+    share_calls: bool = True
+    """whether callers may share a single call among concurrent calls with
+    the same arguments"""
+    max_threads: Optional[int] = None
+    """if set, number of threads that callers should allow thread pools of
+    numerical libraries (e.g. BLAS and OpenMP) while executing the function
+    in a separate process, instead of their default"""
 
 
 class InstantiatePlugin(NamedTuple):
@@ -47,6 +84,12 @@ class InstantiatePlugin(NamedTuple):
     """plugin function"""
     state_cb_arg_name: Optional[str] = None
     """name of the keyword argument for the state change cb"""
+    execution_mode: ExecutionMode = ExecutionMode.PROCESS
+    """where the plugin function should be executed"""
+    max_threads: Optional[int] = None
+    """if set, number of threads that callers should allow thread pools of
+    numerical libraries (e.g. BLAS and OpenMP) while executing the function
+    in a separate process, instead of their default"""
 
 
 class FitPlugin(NamedTuple):
@@ -59,6 +102,12 @@ class FitPlugin(NamedTuple):
     instance_arg_name: Optional[str] = None
     """name of the keyword argument for the instance argument. If None, pass as
     the first positional argument"""
+    execution_mode: ExecutionMode = ExecutionMode.PROCESS
+    """where the plugin function should be executed"""
+    max_threads: Optional[int] = None
+    """if set, number of threads that callers should allow thread pools of
+    numerical libraries (e.g. BLAS and OpenMP) while executing the function
+    in a separate process, instead of their default"""
 
 
 class PredictPlugin(NamedTuple):
@@ -71,6 +120,21 @@ class PredictPlugin(NamedTuple):
     instance_arg_name: Optional[str] = None
     """name of the keyword argument for the instance argument. If None, pass as
     the first positional argument"""
+    execution_mode: ExecutionMode = ExecutionMode.PROCESS
+    """where the plugin function should be executed"""
+    max_batch_size: Optional[int] = None
+    """if set, the function performs batches of up to this many predictions
+    in a single call"""
+    max_batch_delay: float = 0
+    """number of seconds a batch waits for more predictions before the
+    function is called"""
+    updates_instance: bool = True
+    """whether the function may alter the model instance, if not, callers
+    do not need to store the instance after predictions"""
+    max_threads: Optional[int] = None
+    """if set, number of threads that callers should allow thread pools of
+    numerical libraries (e.g. BLAS and OpenMP) while executing the function
+    in a separate process, instead of their default"""
 
 
 class SerializePlugin(NamedTuple):
@@ -95,6 +159,17 @@ def initialize(conf: Dict):
             ``aimm://plugins/schema.yaml#``"""
     for name in conf["names"]:
         importlib.import_module(name)
+        if name not in _initialized_modules:
+            _initialized_modules.append(name)
+
+
+def get_initialized_modules() -> List[str]:
+    """Names of the plugin modules imported by :func:`initialize`, e.g. for
+    importing them in other processes
+
+    Returns:
+        module names, in the order in which they were imported"""
+    return list(_initialized_modules)
 
 
 StateCallback = Callable[[Dict], None]
@@ -1,4 +1,4 @@
-from typing import Callable, Dict, List, Optional, Type
+from typing import Callable, Dict, List, Optional, Type, Union
 
 from aimm.plugins import common
 
@@ -15,7 +15,15 @@ _declarations = dict(_declarations_initial)
 
 
 def data_access(
-    name: str, state_cb_arg_name: Optional[str] = None
+    name: str,
+    state_cb_arg_name: Optional[str] = None,
+    execution_mode: Union[common.ExecutionMode, str] = (
+        common.ExecutionMode.PROCESS
+    ),
+    cache: bool = True,
+    cache_ttl: Optional[float] = None,
+    max_threads: Optional[int] = None,
+    share_calls: bool = True,
 ) -> Callable:
     """Decorator used to indicate that the wrapped function is a data access
     function. The decorated function can take any number of positional and
@@ -27,6 +35,22 @@ def data_access(
             state callback function as a keyword argument and use the passed
             value as the argument name. The function is of type Callable[Any],
             where the only argument is JSON serializable data.
+        execution_mode: where callers should execute the function, in a
+            separate process by default, see :class:`ExecutionMode`
+        cache: whether callers, such as the AIMM server, may cache the
+            accessed data and reuse it for later calls with the same
+            arguments. Should be set to ``False`` if the function's results
+            change over time or the function has side effects
+        cache_ttl: if set, number of seconds cached data is valid for,
+            otherwise the caller's default is used
+        max_threads: if set, number of threads that callers executing the
+            function in a separate process should allow thread pools of
+            numerical libraries (e.g. BLAS and OpenMP), instead of their
+            default
+        share_calls: whether callers, such as the AIMM server, may share a
+            single call among concurrent calls with the same arguments,
+            independently of ``cache``. Should be set to ``False`` if the
+            function has side effects
 
     Returns:
         Decorated function"""
@@ -39,6 +63,11 @@ def data_access(
                 function=function,
                 state_cb_arg_name=state_cb_arg_name,
                 name=name,
+                execution_mode=common.ExecutionMode(execution_mode),
+                cache=cache,
+                cache_ttl=cache_ttl,
+                share_calls=share_calls,
+                max_threads=max_threads,
             ),
         )
         return function
@@ -47,7 +76,12 @@ def data_access(
 
 
 def instantiate(
-    model_type: str, state_cb_arg_name: Optional[str] = None
+    model_type: str,
+    state_cb_arg_name: Optional[str] = None,
+    execution_mode: Union[common.ExecutionMode, str] = (
+        common.ExecutionMode.PROCESS
+    ),
+    max_threads: Optional[int] = None,
 ) -> Callable:
     """Decorator used to indicate that the wrapped function is a model instance
     creation function. The decorated function should take any number of
@@ -59,6 +93,12 @@ def instantiate(
         state_cb_arg_name: if set, indicates that the caller should pass a
             state callback function as a keyword argument and use the passed
             value as the argument name. The function is of type Callable[Any].
+        execution_mode: where callers should execute the function, in a
+            separate process by default, see :class:`ExecutionMode`
+        max_threads: if set, number of threads that callers executing the
+            function in a separate process should allow thread pools of
+            numerical libraries (e.g. BLAS and OpenMP), instead of their
+            default
 
     Returns:
         Decorated function"""
@@ -68,7 +108,10 @@ def instantiate(
             "instantiate",
             model_type,
             common.InstantiatePlugin(
-                function=function, state_cb_arg_name=state_cb_arg_name
+                function=function,
+                state_cb_arg_name=state_cb_arg_name,
+                execution_mode=common.ExecutionMode(execution_mode),
+                max_threads=max_threads,
             ),
         )
         return function
@@ -80,6 +123,10 @@ def fit(
     model_types: List[str],
     state_cb_arg_name: Optional[str] = None,
     instance_arg_name: Optional[str] = None,
+    execution_mode: Union[common.ExecutionMode, str] = (
+        common.ExecutionMode.PROCESS
+    ),
+    max_threads: Optional[int] = None,
 ) -> Callable:
     """Decorator used to indicate that the wrapped function is a fitting
     function. The decorated function should take at least one argument - model
@@ -95,6 +142,12 @@ def fit(
         instance_arg_name: if set, indicates under which
             argument name to pass the concrete model instance. If not set, it
             is passed in the first positional argument
+        execution_mode: where callers should execute the function, in a
+            separate process by default, see :class:`ExecutionMode`
+        max_threads: if set, number of threads that callers executing the
+            function in a separate process should allow thread pools of
+            numerical libraries (e.g. BLAS and OpenMP), instead of their
+            default
 
     Returns:
         Decorated function"""
@@ -113,6 +166,8 @@ def fit(
                     function=function,
                     state_cb_arg_name=state_cb_arg_name,
                     instance_arg_name=instance_arg_name,
+                    execution_mode=common.ExecutionMode(execution_mode),
+                    max_threads=max_threads,
                 ),
             )
         return function
@@ -124,6 +179,11 @@ def predict(
     model_types: List[str],
     state_cb_arg_name: Optional[str] = None,
     instance_arg_name: Optional[str] = None,
+    execution_mode: Union[common.ExecutionMode, str] = (
+        common.ExecutionMode.PROCESS
+    ),
+    updates_instance: bool = True,
+    max_threads: Optional[int] = None,
 ) -> Callable:
     """Decorator used to indicate that the wrapped function is a prediction
     function. The decorated function should take at least one argument - model
@@ -139,6 +199,83 @@ def predict(
         instance_arg_name: if set, indicates under which argument name to pass
             the concrete model instance. If not set, it is passed in the first
             positional argument
+        execution_mode: where callers should execute the function, in a
+            separate process by default, see :class:`ExecutionMode`
+        updates_instance: whether the function may alter the model instance.
+            If set to ``False``, callers such as the AIMM server do not store
+            the instance after predictions
+        max_threads: if set, number of threads that callers executing the
+            function in a separate process should allow thread pools of
+            numerical libraries (e.g. BLAS and OpenMP), instead of their
+            default
+
+    Returns:
+        Decorated function"""
+
+    def decorator(function):
+        for model_type in model_types:
+            _declare(
+                "predict",
+                model_type,
+                common.PredictPlugin(
+                    function=function,
+                    state_cb_arg_name=state_cb_arg_name,
+                    instance_arg_name=instance_arg_name,
+                    execution_mode=common.ExecutionMode(execution_mode),
+                    updates_instance=updates_instance,
+                    max_threads=max_threads,
+                ),
+            )
+        return function
+
+    return decorator
+
+
+def batch_predict(
+    model_types: List[str],
+    max_batch_size: int,
+    max_batch_delay: float = 0,
+    state_cb_arg_name: Optional[str] = None,
+    instance_arg_name: Optional[str] = None,
+    execution_mode: Union[common.ExecutionMode, str] = (
+        common.ExecutionMode.PROCESS
+    ),
+    updates_instance: bool = True,
+    max_threads: Optional[int] = None,
+) -> Callable:
+    """Decorator used to indicate that the wrapped function is a prediction
+    function that performs multiple predictions in a single call. The
+    decorated function should take at least two arguments - model instance
+    (passed as the first positional argument by default) and a list of
+    predictions, where each prediction is a tuple of positional arguments
+    (list) and keyword arguments (dict) that would be passed to a regular
+    :func:`predict` function. It should return a list of results of the same
+    length, ordered as the predictions.
+
+    Callers that perform many concurrent predictions with the same instance,
+    such as the AIMM server, may collect them into batches. Single predictions
+    are passed to the function as batches of one prediction.
+
+    Args:
+        model_types: types of models supported by the decorated function
+        max_batch_size: maximum number of predictions in a batch
+        max_batch_delay: number of seconds a batch waits for more
+            predictions before the function is called
+        state_cb_arg_name: if set, indicates that the caller should pass a
+            state callback function as a keyword argument and use the passed
+            value as the argument name. The function is of type Callable[Any]
+        instance_arg_name: if set, indicates under which argument name to pass
+            the concrete model instance. If not set, it is passed in the first
+            positional argument
+        execution_mode: where callers should execute the function, in a
+            separate process by default, see :class:`ExecutionMode`
+        updates_instance: whether the function may alter the model instance.
+            If set to ``False``, callers such as the AIMM server do not store
+            the instance after predictions
+        max_threads: if set, number of threads that callers executing the
+            function in a separate process should allow thread pools of
+            numerical libraries (e.g. BLAS and OpenMP), instead of their
+            default
 
     Returns:
         Decorated function"""
@@ -152,6 +289,11 @@ def predict(
                     function=function,
                     state_cb_arg_name=state_cb_arg_name,
                     instance_arg_name=instance_arg_name,
+                    execution_mode=common.ExecutionMode(execution_mode),
+                    max_batch_size=max_batch_size,
+                    max_batch_delay=max_batch_delay,
+                    updates_instance=updates_instance,
+                    max_threads=max_threads,
                 ),
             )
         return function
@@ -212,7 +354,15 @@ def deserialize(model_types: List[str]) -> Callable:
     return decorator
 
 
-def model(cls: Type) -> Type:
+def model(
+    cls: Optional[Type] = None,
+    *,
+    execution_mode: Union[common.ExecutionMode, str] = (
+        common.ExecutionMode.PROCESS
+    ),
+    updates_instance: bool = True,
+    max_threads: Optional[int] = None,
+) -> Union[Type, Callable]:
     """Model class decorator, used to mark that a class may be used as a model
     implementation. Model class unifies different plugin actions
     (:func:`instantiate` as ``__init__``, :func:`fit`, :func:`predict`,
@@ -220,24 +370,64 @@ def model(cls: Type) -> Type:
     under the same model type (module + class name). The class should implement
     the :class:`Model` interface.
 
+    The decorator may be used directly or called with keyword arguments, e.g.
+    ``@model(execution_mode="inline", updates_instance=False)``.
+
     Args:
         cls (:class:`Model`): model class
+        execution_mode: where callers should execute instantiation, fitting
+            and prediction, in a separate process by default, see
+            :class:`ExecutionMode`
+        updates_instance: whether the ``predict`` method may alter the model
+            instance, see :func:`predict`
+        max_threads: if set, number of threads that callers should allow
+            thread pools of numerical libraries during instantiation, fitting
+            and prediction, see :func:`instantiate`
 
     Returns:
         Decorated class
     """
+    if cls is None:
+        return lambda cls: model(
+            cls,
+            execution_mode=execution_mode,
+            updates_instance=updates_instance,
+            max_threads=max_threads,
+        )
 
+    execution_mode = common.ExecutionMode(execution_mode)
     model_type = f"{cls.__module__}.{cls.__name__}"
 
-    _declare("instantiate", model_type, common.InstantiatePlugin(cls))
+    _declare(
+        "instantiate",
+        model_type,
+        common.InstantiatePlugin(
+            cls, execution_mode=execution_mode, max_threads=max_threads
+        ),
+    )
 
     fit_fn = getattr(cls, "fit")
     if isinstance(fit_fn, Callable):
-        _declare("fit", model_type, common.FitPlugin(fit_fn))
+        _declare(
+            "fit",
+            model_type,
+            common.FitPlugin(
+                fit_fn, execution_mode=execution_mode, max_threads=max_threads
+            ),
+        )
 
     predict_fn = getattr(cls, "predict")
     if isinstance(predict_fn, Callable):
-        _declare("predict", model_type, common.PredictPlugin(predict_fn))
+        _declare(
+            "predict",
+            model_type,
+            common.PredictPlugin(
+                predict_fn,
+                execution_mode=execution_mode,
+                updates_instance=updates_instance,
+                max_threads=max_threads,
+            ),
+        )
 
     serialize_fn = getattr(cls, "serialize")
     if isinstance(serialize_fn, Callable):
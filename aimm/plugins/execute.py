@@ -1,4 +1,4 @@
-from typing import Any, ByteString
+from typing import Any, ByteString, Dict, List, Tuple
 
 from aimm.plugins import common
 from aimm.plugins import decorators
@@ -8,7 +8,7 @@ def exec_data_access(
     name: str,
     state_cb: common.StateCallback = lambda state: None,
     *args: Any,
-    **kwargs: Any
+    **kwargs: Any,
 ) -> Any:
     """Uses a loaded plugin to access data"""
     plugin = decorators.get_data_access(name)
@@ -20,7 +20,7 @@ def exec_instantiate(
     model_type: str,
     state_cb: common.StateCallback = lambda state: None,
     *args: Any,
-    **kwargs: Any
+    **kwargs: Any,
 ) -> Any:
     """Uses a loaded plugin to create a model instance"""
     plugin = decorators.get_instantiate(model_type)
@@ -33,7 +33,7 @@ def exec_fit(
     instance: Any,
     state_cb: common.StateCallback = lambda state: None,
     *args: Any,
-    **kwargs: Any
+    **kwargs: Any,
 ) -> Any:
     """Uses a loaded plugin to fit a model instance"""
     plugin = decorators.get_fit(model_type)
@@ -49,12 +49,17 @@ def exec_predict(
     instance: Any,
     state_cb: common.StateCallback = lambda state: None,
     *args: Any,
-    **kwargs: Any
+    **kwargs: Any,
 ) -> tuple[Any, Any]:
     """Uses a loaded plugin to perform a prediction with a given model
     instance. Also returns the instance because it might be altered during the
     prediction, e.g. with reinforcement learning models."""
     plugin = decorators.get_predict(model_type)
+    if plugin.max_batch_size:
+        instance, results = exec_predict_batch(
+            model_type, instance, [(args, kwargs)], state_cb
+        )
+        return instance, results[0]
     kwargs = _kwargs_add_state_cb(plugin.state_cb_arg_name, state_cb, kwargs)
     args, kwargs = _args_add_instance(
         plugin.instance_arg_name, instance, args, kwargs
@@ -62,6 +67,39 @@ def exec_predict(
     return instance, plugin.function(*args, **kwargs)
 
 
+def exec_predict_batch(
+    model_type: str,
+    instance: Any,
+    predictions: List[Tuple[List[Any], Dict[str, Any]]],
+    state_cb: common.StateCallback = lambda state: None,
+) -> tuple[Any, List[Any]]:
+    """Uses a loaded plugin to perform multiple predictions with a given
+    model instance, each prediction is a tuple of positional and keyword
+    arguments. Plugins declared with :func:`batch_predict` perform all of
+    them in a single call, other prediction plugins are called once per
+    prediction. Also returns the instance, same as :func:`exec_predict`."""
+    plugin = decorators.get_predict(model_type)
+    if not plugin.max_batch_size:
+        results = []
+        for args, kwargs in predictions:
+            instance, result = exec_predict(
+                model_type, instance, state_cb, *args, **kwargs
+            )
+            results.append(result)
+        return instance, results
+    kwargs = _kwargs_add_state_cb(plugin.state_cb_arg_name, state_cb, {})
+    args, kwargs = _args_add_instance(
+        plugin.instance_arg_name, instance, [list(predictions)], kwargs
+    )
+    results = list(plugin.function(*args, **kwargs))
+    if len(results) != len(predictions):
+        raise ValueError(
+            f"batch predict returned {len(results)} results for "
+            f"{len(predictions)} predictions"
+        )
+    return instance, results
+
+
 def exec_serialize(model_type: str, instance: Any) -> ByteString:
     """Uses a loaded plugin to convert model into bytes"""
     plugin = decorators.get_serialize(model_type)
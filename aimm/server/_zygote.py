@@ -0,0 +1,9 @@
+"""Imported last by the zygote process of :mod:`aimm.server.mprocess`, after
+the preloaded modules. Moves all objects created so far to the permanent
+generation of the garbage collector, so that collections in the forked child
+processes do not touch, and thereby copy, the memory pages holding them."""
+
+import gc
+
+
+gc.freeze()
@@ -5,6 +5,7 @@ import hat.event.common
 import itertools
 
 from aimm.server import common
+from aimm.server.backend import loading
 from aimm import plugins
 from aimm.server.common import Model
 
@@ -24,6 +25,7 @@ async def create(conf, event_client):
 class EventBackend(common.Backend):
     def __init__(self, conf, event_client):
         self._model_prefix = conf["model_prefix"]
+        self._deserialization_workers = conf.get("deserialization_workers")
         self._executor = aio.create_executor()
         self._cbs = util.CallbackRegistry()
         self._group = aio.Group()
@@ -36,18 +38,54 @@ class EventBackend(common.Backend):
         return self._group
 
     async def start(self):
-        models = await self.get_models()
+        model_infos = await self.get_model_infos()
         self._id_counter = itertools.count(
-            max((model.instance_id for model in models), default=1)
+            max((info.instance_id for info in model_infos), default=1)
         )
 
     async def get_models(self) -> list[Model]:
+        models = [model async for part in self.iter_models() for model in part]
+        return sorted(models, key=lambda model: model.instance_id)
+
+    async def iter_models(self):
         query_result = await self._client.query(
             hat.event.common.QueryLatestParams(
                 event_types=[(*self._model_prefix, "*")]
             )
         )
-        return [await self._event_to_model(e) for e in query_result.events]
+        async for models in loading.deserialize_models(
+            (
+                (
+                    event.payload.data["type"],
+                    self._event_instance_id(event),
+                    base64.b64decode(
+                        event.payload.data["instance"].encode("utf-8")
+                    ),
+                )
+                for event in query_result.events
+            ),
+            self._deserialization_workers,
+        ):
+            yield models
+
+    async def get_model_infos(self):
+        query_result = await self._client.query(
+            hat.event.common.QueryLatestParams(
+                event_types=[(*self._model_prefix, "*")]
+            )
+        )
+        return [self._event_to_model_info(e) for e in query_result.events]
+
+    async def get_instance(self, instance_id):
+        query_result = await self._client.query(
+            hat.event.common.QueryLatestParams(
+                event_types=[(*self._model_prefix, str(instance_id))]
+            )
+        )
+        if not query_result.events:
+            raise ValueError(f"model {instance_id} not persisted")
+        model = await self._event_to_model(query_result.events[0])
+        return model.instance
 
     async def create_model(self, model_type, instance):
         model = common.Model(
@@ -93,6 +131,17 @@ class EventBackend(common.Backend):
         )
         return common.Model(
             instance=instance,
-            instance_id=int(event.type[len(self._model_prefix)]),
+            instance_id=self._event_instance_id(event),
             model_type=event.payload.data["type"],
         )
+
+    def _event_to_model_info(self, event):
+        instance_b64 = event.payload.data["instance"]
+        return common.ModelInfo(
+            model_type=event.payload.data["type"],
+            instance_id=self._event_instance_id(event),
+            size=len(instance_b64) * 3 // 4 - instance_b64.count("=", -2),
+        )
+
+    def _event_instance_id(self, event):
+        return int(event.type[len(self._model_prefix)])
@@ -0,0 +1,59 @@
+"""Loading of persisted models, shared by the backend implementations. Not a
+backend implementation itself."""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+import asyncio
+
+from aimm.server import common
+from aimm.server import mprocess
+from aimm import plugins
+
+
+async def deserialize_models(
+    rows: Iterable[Tuple[str, int, bytes]], workers: Optional[int] = None
+) -> AsyncIterator[List[common.Model]]:
+    """Deserialize instances of persisted models
+
+    Models are yielded in lists, as soon as their instances are deserialized,
+    so their order is not preserved.
+
+    Args:
+        rows: model types, instance IDs and serialized instances of the
+            models
+        workers: if set, instances are deserialized concurrently in a pool of
+            this many child processes, otherwise they are deserialized one by
+            one in a separate thread. Deserialized instances need to be
+            pickleable to be passed from the child processes
+
+    Yields:
+        lists of models"""
+    loop = asyncio.get_running_loop()
+    executor = (
+        ProcessPoolExecutor(workers, mp_context=mprocess.mp_context)
+        if workers
+        else ThreadPoolExecutor(1)
+    )
+    pending = set()
+    try:
+        pending = {
+            loop.run_in_executor(executor, _ext_deserialize, *row)
+            for row in rows
+        }
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            yield [future.result() for future in done]
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _ext_deserialize(model_type, instance_id, instance_bytes):
+    return common.Model(
+        instance=plugins.exec_deserialize(model_type, instance_bytes),
+        model_type=model_type,
+        instance_id=instance_id,
+    )
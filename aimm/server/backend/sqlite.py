@@ -4,6 +4,7 @@ from pathlib import Path
 import sqlite3
 
 from aimm.server import common
+from aimm.server.backend import loading
 from aimm import plugins
 
 
@@ -38,11 +39,38 @@ class SQLiteBackend(common.Backend):
         )
 
     async def get_models(self):
+        models = [model async for part in self.iter_models() for model in part]
+        return sorted(models, key=lambda model: model.instance_id)
+
+    async def iter_models(self):
         query = """SELECT * FROM models"""
         cursor = await self._execute(query)
         rows = await self._executor(_ext_fetchall, cursor)
-        models = [await self._row_to_model(row) for row in rows]
-        return models
+        async for models in loading.deserialize_models(
+            ((row["type"], row["id"], row["instance"]) for row in rows),
+            self._conf.get("deserialization_workers"),
+        ):
+            yield models
+
+    async def get_model_infos(self):
+        query = """SELECT id, type, length(instance) AS size FROM models"""
+        cursor = await self._execute(query)
+        rows = await self._executor(_ext_fetchall, cursor)
+        return [
+            common.ModelInfo(
+                model_type=row["type"], instance_id=row["id"], size=row["size"]
+            )
+            for row in rows
+        ]
+
+    async def get_instance(self, instance_id):
+        query = """SELECT * FROM models WHERE id=:instance_id"""
+        cursor = await self._execute(query, instance_id=instance_id)
+        rows = await self._executor(_ext_fetchall, cursor)
+        if not rows:
+            raise ValueError(f"model {instance_id} not persisted")
+        model = await self._row_to_model(rows[0])
+        return model.instance
 
     async def create_model(self, model_type, instance):
         instance_blob = await self._executor(
@@ -2,6 +2,7 @@ from hat import aio
 from hat import util
 from typing import (
     Any,
+    AsyncIterator,
     Dict,
     Callable,
     Iterable,
@@ -14,6 +15,7 @@ import abc
 import hat.event.eventer.client
 import hat.event.common
 import logging
+import weakref
 
 import aimm.common
 
@@ -43,6 +45,17 @@ class Model(NamedTuple):
     """instance id"""
 
 
+class ModelInfo(NamedTuple):
+    """Metadata of a persisted model, without its instance"""
+
+    model_type: str
+    """model type, used to identify which plugin to use"""
+    instance_id: int
+    """instance id"""
+    size: Optional[int] = None
+    """approximate size of the instance in bytes, if known"""
+
+
 class DataAccess(NamedTuple):
     """Representation of a :func:`plugins.exec_data_access` call. May be passed
     as an argument in some methods, indicating that data needs to be retrieved
@@ -57,6 +70,58 @@ class DataAccess(NamedTuple):
     """keyword arguments to be passed to the plugin call"""
 
 
+class ActionOptions(NamedTuple):
+    """Options of an action that are used by the engine, instead of being
+    passed to the plugin call. Passed to engine methods as their ``_options``
+    argument, so that they do not collide with the plugins' keyword
+    arguments."""
+
+    action_class: Optional[str] = None
+    """class of the action, determines its priority and reserved child
+    processes, name of the engine method if not set"""
+    timeout: Optional[float] = None
+    """number of seconds within which the action needs to finish, including
+    the time it waits for a child process, otherwise it expires, not limited
+    if not set"""
+
+
+class AutoscalingMetrics(NamedTuple):
+    """Sample of an autoscaling period of child processes, see
+    :class:`aimm.server.mprocess.Autoscaling`"""
+
+    max_children: int
+    """maximum number of concurrent child processes after the period"""
+    queue_depth: int
+    """number of handlers waiting for a child process at the end of the
+    period"""
+    peak_children: int
+    """maximum number of child processes used at once during the period"""
+    wait_time: float
+    """average number of seconds handlers admitted during the period waited
+    for a child process"""
+    cpu_utilization: float
+    """CPU utilization of the host during the period, in percent"""
+    available_memory: int
+    """available memory of the host in bytes"""
+    child_memory: int
+    """resident memory of the largest child process in bytes"""
+
+
+class StateChange(NamedTuple):
+    """Change of a single model or action in the engine state"""
+
+    version: int
+    """version of the state after the change"""
+    key: str
+    """part of the state that changed, ``models`` or ``actions``"""
+    item_id: int
+    """ID of the changed model instance or action"""
+    value: Any = None
+    """new :class:`Model` or action state"""
+    removed: bool = False
+    """whether the model or action was removed from the state"""
+
+
 class Engine(aio.Resource, abc.ABC):
     """Engine interface"""
 
@@ -73,9 +138,77 @@ class Engine(aio.Resource, abc.ABC):
     ) -> util.RegisterCallbackHandle:
         """Subscribes to any changes to the engine state"""
 
+    @property
+    def state_version(self) -> int:
+        """Implementation optional. Version of the engine state, incremented
+        with each change of the state. By default, counts the notifications
+        of :meth:`subscribe_to_state_change`."""
+        return _get_state_diffs(self).version
+
+    @property
+    def autoscaling_metrics(self) -> Optional[AutoscalingMetrics]:
+        """Metrics of the latest autoscaling period of the engine's child
+        processes, None if autoscaling is not configured or no period passed
+        yet"""
+        return None
+
+    def subscribe_to_state_diff(
+        self, cb: Callable[[List[StateChange]], None]
+    ) -> util.RegisterCallbackHandle:
+        """Implementation optional. Subscribes to changes to the engine state,
+        the callback receives the list of changed models and actions of each
+        state change. Changes with versions greater than
+        :attr:`state_version`, read together with the state, can be applied
+        to it to get the current state. By default, the changes are found by
+        comparing the states notified by
+        :meth:`subscribe_to_state_change`."""
+        return _get_state_diffs(self).register(cb)
+
+    def get_actions(
+        self,
+        progress: Optional[str] = None,
+        instance_id: Optional[int] = None,
+    ) -> Dict[int, Dict]:
+        """Implementation optional. Gets actions from the state, ordered by
+        their IDs. By default, searches all actions in the state.
+
+        Args:
+            progress: if set, only actions with this progress are returned
+            instance_id: if set, only actions of this model instance are
+                returned
+
+        Returns:
+            action states, by action IDs"""
+        actions = self.state["actions"]
+        return {
+            action_id: actions[action_id]
+            for action_id in sorted(actions)
+            if _action_matches(actions[action_id], progress, instance_id)
+        }
+
+    def archive_actions(
+        self, action_ids: Optional[Iterable[int]] = None
+    ) -> Dict[int, Dict]:
+        """Implementation optional. Removes finished actions (actions whose
+        progress is ``complete``, ``failed``, ``cancelled``, ``rejected``,
+        ``expired`` or ``limit_exceeded``) from the state. Actions that are
+        not finished are ignored. By default, actions are kept in the state
+        and none are removed.
+
+        Args:
+            action_ids: IDs of the actions, all finished actions if not set
+
+        Returns:
+            states of removed actions, by action IDs"""
+        return {}
+
     @abc.abstractmethod
     def create_instance(
-        self, model_type: str, *args: Any, **kwargs: Any
+        self,
+        model_type: str,
+        *args: Any,
+        _options: Optional[ActionOptions] = None,
+        **kwargs: Any,
     ) -> "Action":
         """Starts an action that creates a model instance and stores it in
         state.
@@ -83,6 +216,7 @@ class Engine(aio.Resource, abc.ABC):
         Args:
             model_type: model type
             *args: instantiation arguments
+            _options: options of the action used by the engine
             **kwargs: instantiation keyword arguments"""
 
     @abc.abstractmethod
@@ -94,11 +228,18 @@ class Engine(aio.Resource, abc.ABC):
         """Update existing instance in the state"""
 
     @abc.abstractmethod
-    def fit(self, instance_id: int, *args: Any, **kwargs: Any) -> "Action":
+    def fit(
+        self,
+        instance_id: int,
+        *args: Any,
+        _options: Optional[ActionOptions] = None,
+        **kwargs: Any,
+    ) -> "Action":
         """Starts an action that fits an existing model instance. The used
-        fitting function is the one assigned to the model type. The instance,
-        while it is being fitted, is not accessible by any of the other
-        functions that would use it (other calls to fit, predictions, etc.).
+        fitting function is the one assigned to the model type. The instance
+        is fitted after other actions altering it end (other calls to fit,
+        predictions that may alter it, etc.) and the fitted instance replaces
+        it in the state once fitting ends.
 
         Args:
             instance_id: id of model instance that will be fitted
@@ -106,17 +247,24 @@ class Engine(aio.Resource, abc.ABC):
                 :class:`aimm.server.common.DataAccess`, the value passed to the
                 fitting function is the result of the call to that plugin,
                 other arguments are passed directly
+            _options: options of the action used by the engine
             **kwargs: keyword arguments, work the same as the positional
                 arguments"""
 
     @abc.abstractmethod
-    def predict(self, instance_id: int, *args: Any, **kwargs: Any) -> "Action":
+    def predict(
+        self,
+        instance_id: int,
+        *args: Any,
+        _options: Optional[ActionOptions] = None,
+        **kwargs: Any,
+    ) -> "Action":
         """Starts an action that uses an existing model instance to perform a
         prediction. The used prediction function is the one assigned to model's
-        type. The instance, while prediction is called, is not accessible by
-        any of the other functions that would use it (other calls to predict,
-        fittings, etc.).  If instance has changed while predicting, it is
-        updated in the state and database.
+        type. Unless the prediction function declares that it does not alter
+        the instance, the prediction is called after other actions altering
+        the instance end and the instance returned by the call is updated in
+        the state and database.
 
         Args:
             instance_id: id of the model instance used for prediction
@@ -124,6 +272,7 @@ class Engine(aio.Resource, abc.ABC):
                 :class:`aimm.server.common.DataAccess`, the value passed to the
                 predict function is the result of the call to that plugin,
                 other arguments are passed directly
+            _options: options of the action used by the engine
             **kwargs: keyword arguments, work the same as the positional
                 arguments
 
@@ -139,7 +288,19 @@ class Action(aio.Resource, abc.ABC):
     @abc.abstractmethod
     async def wait_result(self) -> Any:
         """Wait until call returns a result. May raise
-        :class:`asyncio.CancelledError` in case the call was cancelled."""
+        :class:`asyncio.CancelledError` in case the call was cancelled,
+        :class:`ActionRejectedException` in case the engine rejected it or
+        :class:`ActionExpiredException` in case it did not finish in time."""
+
+
+class ActionRejectedException(Exception):
+    """Raised by :meth:`Action.wait_result` of actions that the engine
+    rejected, because of the limits of unfinished actions"""
+
+
+class ActionExpiredException(Exception):
+    """Raised by :meth:`Action.wait_result` of actions that did not finish
+    within their timeouts"""
 
 
 def create_subscription(conf: Any) -> list[hat.event.common.EventType]:
@@ -175,6 +336,41 @@ class Backend(aio.Resource, abc.ABC):
         Returns:
             persisted models"""
 
+    async def iter_models(self) -> AsyncIterator[List[Model]]:
+        """Get all persisted models in parts, as they are deserialized,
+        requires that a deserialization function is defined for all persisted
+        types. Implementation optional, defaults to a single part with models
+        returned by :meth:`get_models`.
+
+        Yields:
+            lists of persisted models"""
+        yield await self.get_models()
+
+    async def get_model_infos(self) -> List[ModelInfo]:
+        """Get metadata of all persisted models, without deserializing their
+        instances. Implementation optional, defaults to metadata of models
+        returned by :meth:`get_models`.
+
+        Returns:
+            metadata of persisted models"""
+        return [
+            ModelInfo(
+                model_type=model.model_type, instance_id=model.instance_id
+            )
+            for model in await self.get_models()
+        ]
+
+    async def get_instance(self, instance_id: int) -> Any:
+        """Get the deserialized instance of a persisted model. Implementation
+        optional, defaults to searching models returned by :meth:`get_models`.
+
+        Raises:
+            ValueError: model is not persisted"""
+        for model in await self.get_models():
+            if model.instance_id == instance_id:
+                return model.instance
+        raise ValueError(f"model {instance_id} not persisted")
+
     @abc.abstractmethod
     async def create_model(self, model_type: str, instance: Any):
         """Store a new model, requires that a serialization for the model type
@@ -230,3 +426,69 @@ class Control(aio.Resource, abc.ABC):
         mlog.warning(
             "received events when no process_event method was implemented"
         )
+
+
+def _action_matches(action, progress, instance_id):
+    action = action or {}
+    if progress is not None and action.get("progress") != progress:
+        return False
+    if instance_id is None:
+        return True
+    return action.get("meta", {}).get("model") == instance_id
+
+
+# state diffs of engines that do not implement them, by engines
+_state_diffs = weakref.WeakKeyDictionary()
+
+
+def _get_state_diffs(engine):
+    state_diffs = _state_diffs.get(engine)
+    if state_diffs is None:
+        state_diffs = _StateDiffs(engine)
+        _state_diffs[engine] = state_diffs
+    return state_diffs
+
+
+class _StateDiffs:
+    """Versions and changes of an engine's state, derived from its state
+    change notifications"""
+
+    def __init__(self, engine):
+        self._engine = weakref.ref(engine)
+        self._state = engine.state
+        self._version = 0
+        self._callback_registry = util.CallbackRegistry()
+        engine.subscribe_to_state_change(self._on_state_change)
+
+    @property
+    def version(self):
+        return self._version
+
+    def register(self, cb):
+        return self._callback_registry.register(cb)
+
+    def _on_state_change(self):
+        engine = self._engine()
+        if engine is None:
+            return
+        state = engine.state
+        self._version += 1
+        changes = [
+            StateChange(self._version, key, item_id, value, removed)
+            for key in ("models", "actions")
+            for item_id, value, removed in _diff_items(
+                self._state.get(key, {}), state.get(key, {})
+            )
+        ]
+        self._state = state
+        if changes:
+            self._callback_registry.notify(changes)
+
+
+def _diff_items(items, new_items):
+    # state is never modified in-place, so changed items are new objects
+    for item_id, value in new_items.items():
+        if items.get(item_id) is not value:
+            yield item_id, value, False
+    for item_id in items.keys() - new_items.keys():
+        yield item_id, None, True
@@ -36,18 +36,31 @@ class EventControl(common.Control):
         self._notified_state = {}
         self._in_progress = {}
 
-        self._notify_state()
-        self._engine.subscribe_to_state_change(self._notify_state)
+        self._notify_state(_state_to_json(self._engine))
+        self._engine.subscribe_to_state_diff(self._on_state_diff)
 
     @property
     def async_group(self) -> aio.Group:
         """Async group"""
         return self._async_group
 
-    def _notify_state(self):
-        state_json = _state_to_json(self._engine)
-        if state_json == self._notified_state:
-            return
+    def _on_state_diff(self, changes):
+        models = self._notified_state["models"]
+        actions = self._notified_state["actions"]
+        for change in changes:
+            if change.key == "models":
+                models = _apply_change(
+                    models,
+                    change,
+                    None if change.removed else change.value.model_type,
+                )
+            elif change.key == "actions":
+                actions = _apply_change(actions, change, change.value)
+        state_json = {"models": models, "actions": actions}
+        if state_json != self._notified_state:
+            self._notify_state(state_json)
+
+    def _notify_state(self, state_json):
         self.async_group.spawn(
             self._client.register,
             [_register_event(self._state_event_type, state_json)],
@@ -88,7 +101,12 @@ class EventControl(common.Control):
                 k: await self._process_arg(v)
                 for k, v in data["kwargs"].items()
             }
-            action = self._engine.create_instance(model_type, *args, **kwargs)
+            action = self._engine.create_instance(
+                model_type,
+                *args,
+                _options=common.ActionOptions(timeout=data.get("timeout")),
+                **kwargs,
+            )
             await self._register_action_state(event, "IN_PROGRESS")
             self._in_progress[data["request_id"]] = action
             try:
@@ -98,6 +116,10 @@ class EventControl(common.Control):
                 )
             except asyncio.CancelledError:
                 await self._register_action_state(event, "CANCELLED")
+            except common.ActionRejectedException:
+                await self._register_action_state(event, "REJECTED")
+            except common.ActionExpiredException:
+                await self._register_action_state(event, "EXPIRED")
             finally:
                 del self._in_progress[data["request_id"]]
         except Exception as e:
@@ -148,15 +170,18 @@ class EventControl(common.Control):
             event_prefix = self._event_prefixes["fit"]
             data = event.payload.data
             instance_id = int(event.type[len(event_prefix)])
-            if instance_id not in self._engine.state["models"]:
-                raise ValueError("instance {instance_id} not in state")
             args = [await self._process_arg(a) for a in data["args"]]
             kwargs = {
                 k: await self._process_arg(v)
                 for k, v in data["kwargs"].items()
             }
 
-            action = self._engine.fit(instance_id, *args, **kwargs)
+            action = self._engine.fit(
+                instance_id,
+                *args,
+                _options=common.ActionOptions(timeout=data.get("timeout")),
+                **kwargs,
+            )
             await self._register_action_state(event, "IN_PROGRESS")
             self._in_progress[data["request_id"]] = action
             try:
@@ -164,6 +189,10 @@ class EventControl(common.Control):
                 await self._register_action_state(event, "DONE")
             except asyncio.CancelledError:
                 await self._register_action_state(event, "CANCELLED")
+            except common.ActionRejectedException:
+                await self._register_action_state(event, "REJECTED")
+            except common.ActionExpiredException:
+                await self._register_action_state(event, "EXPIRED")
             finally:
                 del self._in_progress[data["request_id"]]
         except Exception as e:
@@ -175,15 +204,18 @@ class EventControl(common.Control):
             event_prefix = self._event_prefixes["predict"]
             data = event.payload.data
             instance_id = int(event.type[len(event_prefix)])
-            if instance_id not in self._engine.state["models"]:
-                raise ValueError("instance {instance_id} not in state")
             args = [await self._process_arg(a) for a in data["args"]]
             kwargs = {
                 k: await self._process_arg(v)
                 for k, v in data["kwargs"].items()
             }
 
-            action = self._engine.predict(instance_id, *args, **kwargs)
+            action = self._engine.predict(
+                instance_id,
+                *args,
+                _options=common.ActionOptions(timeout=data.get("timeout")),
+                **kwargs,
+            )
             await self._register_action_state(event, "IN_PROGRESS")
             self._in_progress[data["request_id"]] = action
             try:
@@ -191,6 +223,10 @@ class EventControl(common.Control):
                 await self._register_action_state(event, "DONE", prediction)
             except asyncio.CancelledError:
                 await self._register_action_state(event, "CANCELLED")
+            except common.ActionRejectedException:
+                await self._register_action_state(event, "REJECTED")
+            except common.ActionExpiredException:
+                await self._register_action_state(event, "EXPIRED")
             finally:
                 del self._in_progress[data["request_id"]]
         except Exception as e:
@@ -240,6 +276,18 @@ def _state_to_json(engine):
     }
 
 
+def _apply_change(items, change, value):
+    if change.removed:
+        if change.item_id not in items:
+            return items
+        items = dict(items)
+        del items[change.item_id]
+        return items
+    if change.item_id in items and items[change.item_id] == value:
+        return items
+    return {**items, change.item_id: value}
+
+
 def _register_event(event_type, payload, source_timestamp=None):
     return hat.event.common.RegisterEvent(
         type=tuple(event_type),
@@ -81,7 +81,10 @@ class Session(aio.Resource):
             return self._logout()
         elif name == "create_instance":
             return await self._create_instance(
-                data["model_type"], data["args"], data["kwargs"]
+                data["model_type"],
+                data["args"],
+                data["kwargs"],
+                data.get("timeout"),
             )
         elif name == "add_instance":
             return await self._add_instance(
@@ -93,32 +96,67 @@ class Session(aio.Resource):
             )
         elif name == "fit":
             return await self._fit(
-                data["instance_id"], data["args"], data["kwargs"]
+                data["instance_id"],
+                data["args"],
+                data["kwargs"],
+                data.get("timeout"),
             )
         elif name == "predict":
             return await self._predict(
-                data["instance_id"], data["args"], data["kwargs"]
+                data["instance_id"],
+                data["args"],
+                data["kwargs"],
+                data.get("timeout"),
             )
         else:
             return {"success": False}
 
     async def _run(self):
-        await self._on_state_change()
-        with self._engine.subscribe_to_state_change(
-            lambda: self.async_group.spawn(self._on_state_change)
-        ):
+        changes_queue = aio.Queue()
+        with self._engine.subscribe_to_state_diff(changes_queue.put_nowait):
+            self.async_group.spawn(self._sync_state, changes_queue)
             await self._connection.wait_closed()
 
-    async def _on_state_change(self):
-        if self._user:
-            self._connection.state.set(
-                [],
-                await _generate_state(
-                    self._engine.state["models"], self._engine.state["actions"]
-                ),
-            )
-        else:
-            self._connection.state.set([], await _generate_state({}, {}))
+    async def _sync_state(self, changes_queue):
+        # version of the engine state set as the connection state, None if
+        # the state of the engine is not set
+        version = None
+        self._connection.state.set([], await _generate_state({}, {}))
+        while True:
+            changes = await changes_queue.get()
+            if not self._user:
+                if version is not None:
+                    self._connection.state.set(
+                        [], await _generate_state({}, {})
+                    )
+                    version = None
+                continue
+
+            if version is None:
+                version = self._engine.state_version
+                self._connection.state.set(
+                    [],
+                    await _generate_state(
+                        self._engine.state["models"],
+                        self._engine.state["actions"],
+                    ),
+                )
+                continue
+
+            # changes already included in the set state are skipped
+            changes = [c for c in changes if c.version > version]
+            for change in changes:
+                path = [change.key, str(change.item_id)]
+                if change.removed:
+                    self._connection.state.remove(path)
+                elif change.key == "models":
+                    self._connection.state.set(
+                        path, await _model_to_json(change.value)
+                    )
+                else:
+                    self._connection.state.set(path, change.value)
+            if changes:
+                version = changes[-1].version
 
     def _login(self, username, password):
         if {"username": username, "password": password} in self._conf["users"]:
@@ -132,12 +170,17 @@ class Session(aio.Resource):
         self._user = None
         self._connection.set_local_data(None)
 
-    async def _create_instance(self, model_type, args, kwargs):
+    async def _create_instance(self, model_type, args, kwargs, timeout):
         self._check_authorization()
         args = [_arg_from_json(a) for a in args]
         kwargs = {k: _arg_from_json(v) for k, v in kwargs.items()}
 
-        action = self._engine.create_instance(model_type, *args, **kwargs)
+        action = self._engine.create_instance(
+            model_type,
+            *args,
+            _options=common.ActionOptions(timeout=timeout),
+            **kwargs,
+        )
         model = await action.wait_result()
         return await _model_to_json(model)
 
@@ -157,21 +200,31 @@ class Session(aio.Resource):
         await self._engine.update_instance(model)
         return await _model_to_json(model)
 
-    async def _fit(self, instance_id, args, kwargs):
+    async def _fit(self, instance_id, args, kwargs, timeout):
         self._check_authorization()
         args = [_arg_from_json(a) for a in args]
         kwargs = {k: _arg_from_json(v) for k, v in kwargs.items()}
 
-        action = self._engine.fit(instance_id, *args, **kwargs)
+        action = self._engine.fit(
+            instance_id,
+            *args,
+            _options=common.ActionOptions(timeout=timeout),
+            **kwargs,
+        )
         model = await action.wait_result()
         return await _model_to_json(model)
 
-    async def _predict(self, instance_id, args, kwargs):
+    async def _predict(self, instance_id, args, kwargs, timeout):
         self._check_authorization()
         args = [_arg_from_json(a) for a in args]
         kwargs = {k: _arg_from_json(v) for k, v in kwargs.items()}
 
-        action = self._engine.predict(instance_id, *args, **kwargs)
+        action = self._engine.predict(
+            instance_id,
+            *args,
+            _options=common.ActionOptions(timeout=timeout),
+            **kwargs,
+        )
         prediction = await action.wait_result()
         return _prediction_to_json(prediction)
 
@@ -183,14 +236,23 @@ class Session(aio.Resource):
 async def _generate_state(models, actions):
     return {
         "models": {
-            model_id: await _model_to_json(model)
+            str(model_id): await _model_to_json(model)
             for model_id, model in models.items()
         },
-        "actions": actions,
+        "actions": {
+            str(action_id): action for action_id, action in actions.items()
+        },
     }
 
 
 async def _model_to_json(model):
+    if not isinstance(model, common.Model):
+        # lazily loaded models are represented without their instances
+        return {
+            "instance_id": model.instance_id,
+            "model_type": model.model_type,
+            "instance": None,
+        }
     executor = aio.create_executor()
     instance_bytes = base64.b64encode(
         await executor(
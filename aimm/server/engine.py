@@ -2,8 +2,13 @@ from functools import partial
 from hat import aio
 from hat import util
 import asyncio
+import collections
+import contextlib
+import copy
 import itertools
 import logging
+import pickle
+import time
 import typing
 
 from aimm import plugins
@@ -44,14 +49,87 @@ class _Engine(common.Engine):
         }
 
         self._action_id_gen = itertools.count(1)
+        self._model_version_gen = itertools.count(1)
+        self._model_versions = {}
+        self._batches = {}
+        cache_conf = conf.get("data_access_cache")
+        self._data_access_cache = (
+            _Cache(cache_conf.get("max_size"), cache_conf.get("ttl"))
+            if cache_conf is not None
+            else None
+        )
+        self._data_access_calls = {}
+        self._fused_data_access = conf.get("fused_data_access", False)
+        lazy_conf = conf.get("lazy_loading")
+        self._instances = (
+            _Cache(lazy_conf.get("max_size"), None)
+            if lazy_conf is not None
+            else None
+        )
+        self._instance_loads = {}
+        self._models_loaded = asyncio.Event()
+        admission_conf = conf.get("admission", {})
+        predict_policy = admission_conf.get("predict_policy", "reject_new")
+        self._admission = _Admission(
+            admission_conf.get("max_pending"),
+            admission_conf.get("max_pending_per_instance"),
+            predict_policy == "drop_oldest",
+        )
+        # tasks of started actions and exceptions of actions ended by the
+        # engine, by action IDs
+        self._action_tasks = {}
+        self._ended_actions = {}
+        history_conf = conf.get("action_history", {})
+        self._action_history = _ActionHistory(
+            history_conf.get("max_count"), history_conf.get("max_age")
+        )
+        self._prune_handle = None
+        self._group.spawn(aio.call_on_cancel, self._cancel_prune)
 
         self._pool = mprocess.ProcessManager(
             conf["max_children"],
             self._group.create_subgroup(),
-            conf["check_children_period"],
+            conf.get("check_children_period"),
             conf["sigterm_timeout"],
+            conf.get("worker_pool", False),
+            conf.get("max_resident_instances", 0),
+            conf.get("shared_memory_threshold"),
+            {
+                name: mprocess.ProcessClass(
+                    reserved=class_conf.get("reserved_children", 0),
+                    priority=class_conf.get("priority", 0),
+                )
+                for name, class_conf in conf.get("action_classes", {}).items()
+            },
+            (
+                plugins.get_initialized_modules()
+                if conf.get("zygote", False)
+                else None
+            ),
+            # quota keys pair the properties of the quotas configuration
+            # with plugin kinds or model types
+            {
+                (key, name): quota
+                for key, quotas in conf.get("quotas", {}).items()
+                for name, quota in quotas.items()
+            },
+            state_interval=conf.get("child_state_interval"),
+            autoscaling=(
+                mprocess.Autoscaling(**conf["autoscaling"])
+                if "autoscaling" in conf
+                else None
+            ),
         )
+        limits_conf = conf.get("child_limits", {})
+        self._default_limits = limits_conf.get("default", {})
+        self._model_type_limits = limits_conf.get("model_types", {})
+        self._executor = aio.create_executor()
         self._callback_registry = util.CallbackRegistry()
+        self._diff_callback_registry = util.CallbackRegistry()
+        self._state_version = 0
+        self._notification_delay = conf.get("state_notification_delay")
+        self._notification_handle = None
+        self._pending_changes = {}
 
     @property
     def async_group(self):
@@ -61,79 +139,384 @@ class _Engine(common.Engine):
     def state(self):
         return self._state
 
+    @property
+    def state_version(self):
+        return self._state_version
+
+    @property
+    def autoscaling_metrics(self):
+        return self._pool.autoscaling_metrics
+
     async def start(self):
-        models = await self._backend.get_models()
-        self._state = {
-            "actions": {},
-            "models": {model.instance_id: model for model in models},
-        }
+        if self._instances is None:
+            # models are added to the state as they are deserialized
+            self._group.spawn(self._load_models)
+            return
+        # instances are loaded once they are used
+        self._add_models(await self._backend.get_model_infos())
+        self._models_loaded.set()
 
     def subscribe_to_state_change(self, cb):
         return self._callback_registry.register(cb)
 
-    def create_instance(self, model_type, *args, **kwargs):
-        action_id = next(self._action_id_gen)
-        state_cb = partial(self._update_action, action_id)
-        return create_action(
-            self._group.create_subgroup(),
+    def subscribe_to_state_diff(self, cb):
+        return self._diff_callback_registry.register(cb)
+
+    def get_actions(self, progress=None, instance_id=None):
+        actions = self.state["actions"]
+        action_ids = self._action_history.find(progress, instance_id)
+        return {
+            action_id: actions[action_id]
+            for action_id in sorted(action_ids)
+            if action_id in actions
+        }
+
+    def archive_actions(self, action_ids=None):
+        actions, archived = self._action_history.remove(
+            self.state["actions"], action_ids
+        )
+        if archived:
+            self._update_state(
+                dict(self.state, actions=actions),
+                [("actions", action_id, None, True) for action_id in archived],
+            )
+        return archived
+
+    def create_instance(self, model_type, *args, _options=None, **kwargs):
+        return self._create_action(
+            None,
             self._act_create_instance,
             model_type,
             args,
             kwargs,
-            state_cb,
+            action_class=_action_class(_options, "create_instance"),
+            timeout=_options.timeout if _options else None,
         )
 
     async def add_instance(self, model_type, instance):
         model = await self._backend.create_model(model_type, instance)
-        self._set_model(model)
+        await self._set_model(model)
         return model
 
     async def update_instance(self, model: common.Model):
         """Update existing instance in the state"""
-        self._set_model(model)
-        await self._backend.update_model(model)
+        await self._wait_model(model.instance_id)
+        async with self._locks[model.instance_id]:
+            await self._backend.update_model(model)
+            await self._set_model(model)
 
-    def fit(self, instance_id, *args, **kwargs):
-        action_id = next(self._action_id_gen)
-        state_cb = partial(self._update_action, action_id)
-        return create_action(
-            self._group.create_subgroup(),
+    def fit(self, instance_id, *args, _options=None, **kwargs):
+        return self._create_action(
+            instance_id,
             self._act_fit,
             instance_id,
             args,
             kwargs,
-            state_cb,
+            action_class=_action_class(_options, "fit"),
+            timeout=_options.timeout if _options else None,
         )
 
-    def predict(self, instance_id, *args, **kwargs):
-        action_id = next(self._action_id_gen)
-        state_cb = partial(self._update_action, action_id)
-        return create_action(
-            self._group.create_subgroup(),
+    def predict(self, instance_id, *args, _options=None, **kwargs):
+        return self._create_action(
+            instance_id,
             self._act_predict,
             instance_id,
             args,
             kwargs,
+            action_class=_action_class(_options, "predict"),
+            timeout=_options.timeout if _options else None,
+            droppable=True,
+        )
+
+    async def _load_models(self):
+        start = time.monotonic()
+        reported = start
+        count = 0
+        try:
+            async for models in self._backend.iter_models():
+                self._add_models(models)
+                count += len(models)
+                if time.monotonic() - reported >= 1:
+                    reported = time.monotonic()
+                    mlog.info("loaded %s models", count)
+        except Exception as e:
+            mlog.error("loading models failed: %s", e, exc_info=e)
+            self.close()
+        finally:
+            self._models_loaded.set()
+        mlog.info(
+            "loaded %s models in %.2f seconds", count, time.monotonic() - start
+        )
+
+    def _add_models(self, models):
+        # models set while loading are not replaced
+        models = [
+            model
+            for model in models
+            if model.instance_id not in self.state["models"]
+        ]
+        if not models:
+            return
+        for model in models:
+            self._locks[model.instance_id] = asyncio.Lock()
+            self._model_versions[model.instance_id] = next(
+                self._model_version_gen
+            )
+        self._update_state(
+            dict(
+                self.state,
+                models={
+                    **self.state["models"],
+                    **{model.instance_id: model for model in models},
+                },
+            ),
+            [("models", model.instance_id, model, False) for model in models],
+        )
+
+    async def _wait_model(self, instance_id):
+        # actions of models that are not loaded yet wait until all models are
+        # loaded
+        if instance_id not in self.state["models"]:
+            await self._models_loaded.wait()
+        if instance_id not in self.state["models"]:
+            raise ValueError(f"instance {instance_id} not in state")
+
+    def _create_action(
+        self, instance_id, fn, *args, action_class, timeout, droppable=False
+    ):
+        action_id = next(self._action_id_gen)
+        self._action_history.register(action_id, instance_id)
+        admitted, dropped = self._admission.admit(
+            action_id, instance_id, droppable
+        )
+        if not admitted:
+            self._finish_action(action_id, "rejected")
+            return create_action(
+                self._group.create_subgroup(),
+                _reject_action,
+                "limit of unfinished actions reached",
+            )
+
+        for dropped_id in dropped:
+            self._end_action(
+                dropped_id,
+                "rejected",
+                common.ActionRejectedException(
+                    "dropped in favour of a newer action"
+                ),
+            )
+        state_cb = partial(self._update_action, action_id)
+        return create_action(
+            self._group.create_subgroup(),
+            self._run_action,
+            action_id,
+            timeout,
+            fn,
+            *args,
             state_cb,
+            action_class,
+        )
+
+    def _end_action(self, action_id, progress, exception):
+        # ends an unfinished action, its task raises the exception
+        if self._action_history.is_finished(action_id):
+            return
+        self._finish_action(action_id, progress)
+        self._ended_actions[action_id] = exception
+        task = self._action_tasks.get(action_id)
+        if task is not None:
+            task.cancel()
+
+    async def _run_action(self, action_id, timeout, fn, *args):
+        if action_id in self._ended_actions:
+            # ended before it started
+            raise self._ended_actions.pop(action_id)
+        self._action_tasks[action_id] = asyncio.current_task()
+        timer = (
+            asyncio.get_running_loop().call_later(
+                timeout,
+                self._end_action,
+                action_id,
+                "expired",
+                common.ActionExpiredException("timeout expired"),
+            )
+            if timeout is not None
+            else None
         )
 
+        try:
+            return await fn(*args)
+        except asyncio.CancelledError:
+            exception = self._ended_actions.get(action_id)
+            if exception is None:
+                self._finish_action(action_id, "cancelled")
+                raise
+            raise exception
+        except mprocess.ProcessLimitException:
+            self._finish_action(action_id, "limit_exceeded")
+            raise
+        except Exception:
+            self._finish_action(action_id, "failed")
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+            self._admission.remove(action_id)
+            del self._action_tasks[action_id]
+            self._ended_actions.pop(action_id, None)
+
+    def _finish_action(self, action_id, progress):
+        if not self.is_open:
+            return
+        action_state = self.state["actions"].get(action_id) or {}
+        self._update_action(action_id, dict(action_state, progress=progress))
+
     def _update_action(self, action_id, action_state):
-        actions = dict(self.state["actions"])
-        actions.update({action_id: action_state})
-        self._update_state(dict(self.state, actions=actions))
+        # finished actions keep their final state, even if their calls still
+        # report changes, e.g. calls of batches that outlive them
+        if self._action_history.is_finished(action_id):
+            return
+        actions = self._action_history.update(
+            self.state["actions"], action_id, action_state
+        )
+        if actions is self.state["actions"]:
+            return
+        changes = [("actions", action_id, action_state, False)]
+        if self._action_history.is_finished(action_id):
+            actions, pruned = self._action_history.prune(actions)
+            changes.extend(
+                ("actions", pruned_id, None, True) for pruned_id in pruned
+            )
+            self._schedule_prune()
+        self._update_state(dict(self.state, actions=actions), changes)
+
+    def _schedule_prune(self):
+        # a single timer waits for the oldest finished action to exceed the
+        # maximum age
+        if self._prune_handle is not None:
+            return
+        prune_time = self._action_history.next_prune_time()
+        if prune_time is None:
+            return
+        self._prune_handle = asyncio.get_running_loop().call_later(
+            max(0, prune_time - time.monotonic()), self._prune_actions
+        )
+
+    def _cancel_prune(self):
+        if self._prune_handle is not None:
+            self._prune_handle.cancel()
+            self._prune_handle = None
 
-    def _set_model(self, model):
+    def _prune_actions(self):
+        self._prune_handle = None
+        if not self.is_open:
+            return
+        actions, pruned = self._action_history.prune(self.state["actions"])
+        if pruned:
+            self._update_state(
+                dict(self.state, actions=actions),
+                [("actions", action_id, None, True) for action_id in pruned],
+            )
+        self._schedule_prune()
+
+    async def _set_model(self, model):
+        if self._instances is not None:
+            # instances are measured by pickling them, which takes too long
+            # for large instances to run on the loop
+            size = await self._executor(_cache_size, model.instance)
         if model.instance_id not in self._locks:
             self._locks[model.instance_id] = asyncio.Lock()
+        if model.instance_id in self._model_versions:
+            self._pool.invalidate_resident(model.instance_id)
+        self._model_versions[model.instance_id] = next(self._model_version_gen)
+        if self._instances is not None:
+            # only metadata of lazily loaded models is kept in the state
+            self._instance_loads.pop(model.instance_id, None)
+            self._instances.set(model.instance_id, model.instance, size=size)
+            model = common.ModelInfo(
+                model_type=model.model_type,
+                instance_id=model.instance_id,
+                size=size,
+            )
         models = dict(self.state["models"])
         models.update({model.instance_id: model})
-        self._update_state(dict(self.state, models=models))
+        self._update_state(
+            dict(self.state, models=models),
+            [("models", model.instance_id, model, False)],
+        )
+
+    async def _get_model(self, instance_id):
+        model = self.state["models"][instance_id]
+        if self._instances is None:
+            return model
+        hit, instance = self._instances.get(instance_id)
+        if not hit:
+            instance = await self._load_instance(model)
+        return common.Model(
+            instance=instance,
+            model_type=model.model_type,
+            instance_id=instance_id,
+        )
+
+    async def _load_instance(self, model_info):
+        # concurrent loads of an instance share a single backend call
+        instance_id = model_info.instance_id
+        load = self._instance_loads.get(instance_id)
+        if load is not None and load.is_joinable:
+            return await load.wait(lambda _: None)
+
+        async def load_instance(_):
+            try:
+                instance = await self._backend.get_instance(instance_id)
+                size = model_info.size
+                if size is None:
+                    size = await self._executor(_cache_size, instance)
+                # instances set while loading are not replaced
+                if self._instance_loads.get(instance_id) is load:
+                    self._instances.set(instance_id, instance, size=size)
+                return instance
+            finally:
+                if self._instance_loads.get(instance_id) is load:
+                    del self._instance_loads[instance_id]
+
+        load = _SharedCall(self._group, load_instance)
+        self._instance_loads[instance_id] = load
+        return await load.wait(lambda _: None)
 
-    def _update_state(self, new_state):
+    def _update_state(self, new_state, changes):
         self._state = new_state
+        self._state_version += 1
+        for change in changes:
+            change = common.StateChange(self._state_version, *change)
+            key = change.key, change.item_id
+            # only the latest change of an item is notified, ordered by
+            # versions of the changes
+            self._pending_changes.pop(key, None)
+            self._pending_changes[key] = change
+
+        if self._notification_delay is None:
+            self._notify_state()
+        elif self._notification_handle is None:
+            loop = asyncio.get_running_loop()
+            self._notification_handle = loop.call_later(
+                self._notification_delay, self._notify_delayed_state
+            )
+
+    def _notify_delayed_state(self):
+        self._notification_handle = None
+        if self.is_open:
+            self._notify_state()
+
+    def _notify_state(self):
+        changes = list(self._pending_changes.values())
+        self._pending_changes = {}
         self._callback_registry.notify()
+        if changes:
+            self._diff_callback_registry.notify(changes)
 
-    async def _act_create_instance(self, model_type, args, kwargs, state_cb):
+    async def _act_create_instance(
+        self, model_type, args, kwargs, state_cb, action_class
+    ):
         reactive = _ReactiveState(
             {
                 "meta": {
@@ -146,32 +529,44 @@ class _Engine(common.Engine):
         )
         reactive.register_state_change_cb(lambda: state_cb(reactive.state))
 
-        reactive.update(dict(reactive.state, progress="accessing_data"))
-        args, kwargs = await _derive_data_access_args(
-            self._pool, args, kwargs, reactive.register_substate("data_access")
-        )
+        plugin = _get_plugin(plugins.decorators.get_instantiate, model_type)
+        execution_mode = _execution_mode(plugin)
+        fused = self._is_fused(execution_mode, args, kwargs)
+        if not fused:
+            reactive.update(dict(reactive.state, progress="accessing_data"))
+            args, kwargs = await self._access_data(
+                args, kwargs, reactive, action_class
+            )
 
         reactive.update(dict(reactive.state, progress="executing"))
-        handler = self._pool.create_handler(
-            reactive.register_substate("action").update
+        handler = self._create_handler(
+            plugin,
+            _plugin_state_cb(reactive, fused),
+            action_class,
+            "instantiate",
+            model_type,
         )
-        instance = await handler.run(
+        instance = await _run_plugin(
+            handler,
+            fused,
             plugins.exec_instantiate,
-            model_type,
-            handler.proc_notify_state_change,
-            *args,
-            **kwargs
+            [model_type],
+            args,
+            kwargs,
         )
 
         reactive.update(dict(reactive.state, progress="storing"))
         model = await self._backend.create_model(model_type, instance)
-        self._set_model(model)
+        await self._set_model(model)
 
         reactive.update(dict(reactive.state, progress="complete"))
 
         return model
 
-    async def _act_fit(self, instance_id, args, kwargs, state_cb):
+    async def _act_fit(
+        self, instance_id, args, kwargs, state_cb, action_class
+    ):
+        await self._wait_model(instance_id)
         reactive = _ReactiveState(
             {
                 "meta": {
@@ -184,31 +579,45 @@ class _Engine(common.Engine):
         )
         reactive.register_state_change_cb(lambda: state_cb(reactive.state))
 
-        reactive.update(dict(reactive.state, progress="accessing_data"))
-        args, kwargs = await _derive_data_access_args(
-            self._pool, args, kwargs, reactive.register_substate("data_access")
-        )
+        model_type = self.state["models"][instance_id].model_type
+        plugin = _get_plugin(plugins.decorators.get_fit, model_type)
+        execution_mode = _execution_mode(plugin)
+        fused = self._is_fused(execution_mode, args, kwargs)
+        if not fused:
+            reactive.update(dict(reactive.state, progress="accessing_data"))
+            args, kwargs = await self._access_data(
+                args, kwargs, reactive, action_class
+            )
 
         reactive.update(dict(reactive.state, progress="executing"))
-        handler = self._pool.create_handler(
-            reactive.register_substate("action").update
+        handler = self._create_handler(
+            plugin,
+            _plugin_state_cb(reactive, fused),
+            action_class,
+            "fit",
+            model_type,
         )
-
-        model = self.state["models"][instance_id]
         async with self._locks[instance_id]:
-            instance = await handler.run(
+            model = await self._get_model(instance_id)
+            instance = await _run_plugin(
+                handler,
+                fused,
                 plugins.exec_fit,
-                model.model_type,
-                model.instance,
-                handler.proc_notify_state_change,
-                *args,
-                **kwargs
+                [
+                    model.model_type,
+                    _instance_copy(execution_mode, model.instance),
+                ],
+                args,
+                kwargs,
             )
-        new_model = await self._update_model(instance, model, reactive)
+            new_model = await self._update_model(instance, model, reactive)
         reactive.update(dict(reactive.state, progress="complete"))
         return new_model
 
-    async def _act_predict(self, instance_id, args, kwargs, state_cb):
+    async def _act_predict(
+        self, instance_id, args, kwargs, state_cb, action_class
+    ):
+        await self._wait_model(instance_id)
         reactive = _ReactiveState(
             {
                 "meta": {
@@ -221,29 +630,311 @@ class _Engine(common.Engine):
         )
         reactive.register_state_change_cb(lambda: state_cb(reactive.state))
 
-        reactive.update(dict(reactive.state, progress="accessing_data"))
-        args, kwargs = await _derive_data_access_args(
-            self._pool, args, kwargs, reactive.register_substate("data_access")
-        )
+        model_type = self.state["models"][instance_id].model_type
+        plugin = _get_plugin(plugins.decorators.get_predict, model_type)
+        batched = plugin is not None and bool(plugin.max_batch_size)
+        execution_mode = _execution_mode(plugin)
+        # batched predictions need their data before joining a batch
+        fused = not batched and self._is_fused(execution_mode, args, kwargs)
+        if not fused:
+            reactive.update(dict(reactive.state, progress="accessing_data"))
+            args, kwargs = await self._access_data(
+                args, kwargs, reactive, action_class
+            )
+
+        if batched:
+            prediction = await self._predict_in_batch(
+                instance_id, plugin, args, kwargs, reactive, action_class
+            )
+            reactive.update(dict(reactive.state, progress="complete"))
+            return prediction
 
-        handler = self._pool.create_handler(
-            reactive.register_substate("action").update
+        handler = self._create_handler(
+            plugin,
+            _plugin_state_cb(reactive, fused),
+            action_class,
+            "predict",
+            model_type,
         )
-        async with self._locks[instance_id]:
-            model = self.state["models"][instance_id]
+        updates_instance = plugin is None or plugin.updates_instance
+        async with self._instance_lock(instance_id, updates_instance):
+            model = await self._get_model(instance_id)
             reactive.update(dict(reactive.state, progress="executing"))
-            instance, prediction = await handler.run(
-                plugins.exec_predict,
-                model.model_type,
-                model.instance,
-                handler.proc_notify_state_change,
-                *args,
-                **kwargs
+            instance, prediction = await _run_plugin(
+                handler,
+                fused,
+                _predict_fn(plugins.exec_predict, updates_instance),
+                [
+                    model.model_type,
+                    self._resident_instance(
+                        model, execution_mode, updates_instance
+                    ),
+                ],
+                args,
+                kwargs,
             )
-        await self._update_model(instance, model, reactive)
+            if updates_instance:
+                await self._update_model(instance, model, reactive)
         reactive.update(dict(reactive.state, progress="complete"))
         return prediction
 
+    async def _predict_in_batch(
+        self, instance_id, plugin, args, kwargs, reactive, action_class
+    ):
+        batch = self._batches.get(instance_id)
+        if batch is None:
+            batch = _PredictBatch(action_class)
+            self._batches[instance_id] = batch
+            self._group.spawn(self._run_batch, instance_id, plugin, batch)
+        future = asyncio.get_running_loop().create_future()
+        batch.entries.append(
+            _BatchEntry(
+                args=args,
+                kwargs=kwargs,
+                reactive=reactive,
+                action_state=reactive.register_substate("action"),
+                future=future,
+            )
+        )
+        if len(batch.entries) >= plugin.max_batch_size:
+            self._close_batch(instance_id, batch)
+        return await future
+
+    async def _run_batch(self, instance_id, plugin, batch):
+        with contextlib.suppress(asyncio.TimeoutError):
+            await aio.wait_for(batch.closed.wait(), plugin.max_batch_delay)
+        self._close_batch(instance_id, batch)
+        # predictions cancelled while waiting for the batch are left out
+        entries = [e for e in batch.entries if not e.future.done()]
+        try:
+            if entries:
+                predictions = await self._execute_batch(
+                    instance_id, plugin, entries, batch.action_class
+                )
+                for entry, prediction in zip(entries, predictions):
+                    if not entry.future.done():
+                        entry.future.set_result(prediction)
+        except Exception as e:
+            for entry in entries:
+                if not entry.future.done():
+                    entry.future.set_exception(e)
+        finally:
+            for entry in entries:
+                if not entry.future.done():
+                    entry.future.cancel()
+
+    async def _execute_batch(self, instance_id, plugin, entries, action_class):
+        # entries of predictions that ended, e.g. expired or were dropped,
+        # while the batch runs are no longer updated
+        def state_cb(state):
+            for entry in entries:
+                if not entry.future.done():
+                    entry.action_state.update(state)
+
+        def update_progress(progress):
+            for entry in entries:
+                if not entry.future.done():
+                    entry.reactive.update(
+                        dict(entry.reactive.state, progress=progress)
+                    )
+
+        handler = self._create_handler(
+            plugin,
+            state_cb,
+            action_class,
+            "predict",
+            self.state["models"][instance_id].model_type,
+        )
+        async with self._instance_lock(instance_id, plugin.updates_instance):
+            model = await self._get_model(instance_id)
+            update_progress("executing")
+            instance, predictions = await handler.run(
+                _predict_fn(
+                    plugins.exec_predict_batch, plugin.updates_instance
+                ),
+                model.model_type,
+                self._resident_instance(
+                    model, plugin.execution_mode, plugin.updates_instance
+                ),
+                [(entry.args, entry.kwargs) for entry in entries],
+                handler.proc_notify_state_change,
+            )
+            if not plugin.updates_instance:
+                return predictions
+            update_progress("storing")
+            new_model = common.Model(
+                instance=instance,
+                model_type=model.model_type,
+                instance_id=model.instance_id,
+            )
+            await self._backend.update_model(new_model)
+            await self._set_model(new_model)
+        return predictions
+
+    def _instance_lock(self, instance_id, updates_instance):
+        # calls that alter instances are serialized, while the rest use the
+        # current instance without waiting for them
+        if updates_instance:
+            return self._locks[instance_id]
+        return contextlib.nullcontext()
+
+    def _resident_instance(self, model, execution_mode, updates_instance):
+        return mprocess.Resident(
+            key=model.instance_id,
+            version=self._model_versions[model.instance_id],
+            value=(
+                _instance_copy(execution_mode, model.instance)
+                if updates_instance
+                else model.instance
+            ),
+        )
+
+    def _close_batch(self, instance_id, batch):
+        if self._batches.get(instance_id) is batch:
+            del self._batches[instance_id]
+        batch.closed.set()
+
+    def _is_fused(self, execution_mode, args, kwargs):
+        # data is accessed in the child process of the plugin call, without
+        # passing it through the engine's process
+        if not self._fused_data_access:
+            return False
+        if execution_mode != plugins.ExecutionMode.PROCESS:
+            return False
+        return any(
+            isinstance(arg, common.DataAccess)
+            for arg in itertools.chain(args, kwargs.values())
+        )
+
+    async def _access_data(self, args, kwargs, reactive, action_class):
+        return await _derive_data_access_args(
+            partial(
+                self._get_data,
+                action_class,
+                reactive.register_substate("data_access"),
+                reactive.register_substate("data_access_cache"),
+            ),
+            args,
+            kwargs,
+        )
+
+    async def _get_data(
+        self, action_class, reactive_state, cache_state, key, data_access
+    ):
+        plugin = _get_plugin(
+            plugins.decorators.get_data_access, data_access.name
+        )
+        cached = plugin is not None and plugin.cache
+        cached = cached and self._data_access_cache is not None
+        shared = plugin is not None and plugin.share_calls
+        data_key = _data_access_key(data_access) if cached or shared else None
+        state_cb = reactive_state.register_substate(key).update
+        if data_key is None:
+            return await self._call_data_access(
+                data_access, plugin, state_cb, action_class
+            )
+
+        def set_cache_state(cache_state_value):
+            if self._data_access_cache is not None:
+                cache_state.update(
+                    {**cache_state.state, key: cache_state_value}
+                )
+
+        # concurrent calls with the same arguments share a single call
+        call = self._data_access_calls.get(data_key) if shared else None
+        if call is not None and call.is_joinable:
+            set_cache_state("shared")
+            return await call.wait(state_cb)
+
+        if cached:
+            hit, data = self._data_access_cache.get(data_key)
+            set_cache_state("hit" if hit else "miss")
+            if hit:
+                return data
+
+        async def call_data_access(state_cb):
+            try:
+                data = await self._call_data_access(
+                    data_access, plugin, state_cb, action_class
+                )
+            finally:
+                if shared and self._data_access_calls.get(data_key) is call:
+                    del self._data_access_calls[data_key]
+            if cached:
+                # data is measured by pickling it, which takes too long for
+                # large data to run on the loop
+                size = await self._executor(_cache_size, data)
+                self._data_access_cache.set(
+                    data_key, data, plugin.cache_ttl, size
+                )
+            return data
+
+        if not shared:
+            return await call_data_access(state_cb)
+        call = _SharedCall(self._group, call_data_access)
+        self._data_access_calls[data_key] = call
+        return await call.wait(state_cb)
+
+    async def _call_data_access(
+        self, data_access, plugin, state_cb, action_class
+    ):
+        handler = self._create_handler(
+            plugin,
+            state_cb,
+            action_class,
+            "data_access",
+        )
+        return await handler.run(
+            plugins.exec_data_access,
+            data_access.name,
+            handler.proc_notify_state_change,
+            *data_access.args,
+            **data_access.kwargs,
+        )
+
+    def _create_handler(
+        self,
+        plugin,
+        state_cb,
+        action_class,
+        plugin_kind,
+        model_type=None,
+    ):
+        execution_mode = _execution_mode(plugin)
+        if execution_mode == plugins.ExecutionMode.PROCESS:
+            quota_keys = [("plugin_kinds", plugin_kind)]
+            if model_type is not None:
+                quota_keys.append(("model_types", model_type))
+            return self._pool.create_handler(
+                state_cb,
+                action_class,
+                quota_keys,
+                self._child_limits(
+                    model_type, plugin.max_threads if plugin else None
+                ),
+            )
+        return _InProcessHandler(
+            self._group.create_subgroup(),
+            state_cb,
+            (
+                self._executor
+                if execution_mode == plugins.ExecutionMode.THREAD
+                else None
+            ),
+        )
+
+    def _child_limits(self, model_type, max_threads):
+        # plugins' thread limits override the default limits, but not the
+        # limits configured for their model types
+        limits = {
+            **self._default_limits,
+            **({} if max_threads is None else {"threads": max_threads}),
+            **self._model_type_limits.get(model_type, {}),
+        }
+        if not limits:
+            return None
+        return mprocess.ProcessLimits(**limits)
+
     async def _update_model(self, instance, model, reactive):
         new_model = common.Model(
             instance=instance,
@@ -253,7 +944,7 @@ class _Engine(common.Engine):
         reactive.update(dict(reactive.state, progress="storing"))
         await self._backend.update_model(new_model)
 
-        self._set_model(new_model)
+        await self._set_model(new_model)
         return new_model
 
 
@@ -276,21 +967,17 @@ class _Action(common.Action):
         return await self._task
 
 
-async def _derive_data_access_args(pool, args, kwargs, reactive_state):
+async def _derive_data_access_args(get_data, args, kwargs):
     actions = {}
     async with aio.Group() as group:
         for i, arg in enumerate(args):
             if not isinstance(arg, common.DataAccess):
                 continue
-            actions[i] = group.spawn(
-                _get_data_access_action, pool, reactive_state, i, arg
-            )
+            actions[i] = group.spawn(get_data, i, arg)
         for key, value in kwargs.items():
             if not isinstance(value, common.DataAccess):
                 continue
-            actions[key] = group.spawn(
-                _get_data_access_action, pool, reactive_state, i, arg
-            )
+            actions[key] = group.spawn(get_data, key, value)
 
         if actions:
             await asyncio.wait([task for task in actions.values()])
@@ -303,17 +990,494 @@ async def _derive_data_access_args(pool, args, kwargs, reactive_state):
     return args, kwargs
 
 
-async def _get_data_access_action(pool, reactive_state, key, data_access):
-    handler = pool.create_handler(reactive_state.register_substate(key).update)
+async def _run_plugin(handler, fused, exec_fn, exec_args, args, kwargs):
+    if not fused:
+        return await handler.run(
+            exec_fn,
+            *exec_args,
+            handler.proc_notify_state_change,
+            *args,
+            **kwargs,
+        )
     return await handler.run(
-        plugins.exec_data_access,
-        data_access.name,
+        _exec_fused,
+        exec_fn,
         handler.proc_notify_state_change,
-        *data_access.args,
-        **data_access.kwargs
+        args,
+        kwargs,
+        *exec_args,
     )
 
 
+def _exec_fused(exec_fn, state_cb, args, kwargs, *exec_args):
+    # executed in the child process, state changes of data access calls and
+    # of the plugin call are passed through the same state callback
+    def access_data(key, arg):
+        if not isinstance(arg, common.DataAccess):
+            return arg
+        return plugins.exec_data_access(
+            arg.name,
+            lambda state: state_cb(
+                mprocess.Substate(("data_access", key), state)
+            ),
+            *arg.args,
+            **arg.kwargs,
+        )
+
+    args = [access_data(i, arg) for i, arg in enumerate(args)]
+    kwargs = {key: access_data(key, arg) for key, arg in kwargs.items()}
+    return exec_fn(
+        *exec_args,
+        lambda state: state_cb(mprocess.Substate("action", state)),
+        *args,
+        **kwargs,
+    )
+
+
+def _plugin_state_cb(reactive, fused):
+    action_state = reactive.register_substate("action")
+    if not fused:
+        return action_state.update
+
+    data_access_state = reactive.register_substate("data_access")
+    data_access_substates = {}
+
+    def state_cb(substate):
+        if substate.key == "action":
+            action_state.update(substate.state)
+            return
+        _, key = substate.key
+        state = substate.state
+        if key not in data_access_substates:
+            data_access_substates[key] = data_access_state.register_substate(
+                key
+            )
+        data_access_substates[key].update(state)
+
+    return state_cb
+
+
+def _data_access_key(data_access):
+    try:
+        return pickle.dumps(
+            (
+                data_access.name,
+                list(data_access.args),
+                sorted(data_access.kwargs.items()),
+            )
+        )
+    except Exception:
+        # calls with arguments that can not be pickled are neither cached
+        # nor shared
+        return None
+
+
+def _action_class(options, default):
+    if options is None or options.action_class is None:
+        return default
+    return options.action_class
+
+
+def _execution_mode(plugin):
+    if plugin is None:
+        return plugins.ExecutionMode.PROCESS
+    return plugin.execution_mode
+
+
+def _instance_copy(execution_mode, instance):
+    # calls in child processes always alter copies of instances, while calls
+    # in the engine's process are given their own copies, so that the current
+    # instance stays unaltered until the new one is set
+    if execution_mode == plugins.ExecutionMode.PROCESS:
+        return instance
+    return copy.deepcopy(instance)
+
+
+def _predict_fn(exec_fn, updates_instance):
+    if updates_instance:
+        return exec_fn
+    # instances that plugins do not alter are not sent back from the call
+    return partial(_exec_discard_instance, exec_fn)
+
+
+def _exec_discard_instance(exec_fn, *args, **kwargs):
+    _, prediction = exec_fn(*args, **kwargs)
+    return None, prediction
+
+
+def _get_plugin(get_plugin, key):
+    try:
+        return get_plugin(key)
+    except ValueError:
+        # missing plugins are reported by the call itself
+        return None
+
+
+class _SharedCall:
+    """Call whose result is shared by multiple callers. State changes of the
+    call are passed to all callers that wait for it and the call is cancelled
+    once none of them wait for it anymore"""
+
+    def __init__(self, async_group, fn):
+        self._state_cbs = util.CallbackRegistry()
+        self._waiting = 0
+        self._cancelled = False
+        self._future = asyncio.get_running_loop().create_future()
+        self._task = async_group.spawn(self._run, fn)
+
+    @property
+    def is_joinable(self):
+        return not self._cancelled and not self._future.done()
+
+    async def wait(self, state_cb):
+        self._waiting += 1
+        try:
+            with self._state_cbs.register(state_cb):
+                return await asyncio.shield(self._future)
+        finally:
+            self._waiting -= 1
+            if not self._waiting and not self._future.done():
+                self._cancelled = True
+                self._task.cancel()
+
+    async def _run(self, fn):
+        try:
+            self._future.set_result(await fn(self._state_cbs.notify))
+        except asyncio.CancelledError:
+            self._future.cancel()
+            raise
+        except Exception as e:
+            self._future.set_exception(e)
+
+
+class _Cache:
+    """Results of data access calls, by their arguments, or lazily loaded
+    instances, by their IDs. Least recently used entries are evicted once
+    their total size exceeds the maximum size"""
+
+    def __init__(self, max_size, ttl):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._size = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if entry.expire is not None and entry.expire <= time.monotonic():
+            self._remove(key)
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry.data
+
+    def set(self, key, data, ttl=None, size=None):
+        if key in self._entries:
+            self._remove(key)
+        ttl = ttl if ttl is not None else self._ttl
+        if size is None:
+            # data of unknown size, e.g. data that can not be pickled, is not
+            # cached
+            return
+        if self._max_size is not None and size > self._max_size:
+            return
+        self._entries[key] = _CacheEntry(
+            data=data,
+            size=size,
+            expire=time.monotonic() + ttl if ttl is not None else None,
+        )
+        self._size += size
+        while self._max_size is not None and self._size > self._max_size:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        self._size -= self._entries.pop(key).size
+
+
+class _CacheEntry(typing.NamedTuple):
+    data: typing.Any
+    size: int
+    expire: typing.Optional[float]
+
+
+def _data_size(data):
+    # pickled data is only counted, not kept, and out-of-band buffers, e.g.
+    # of numpy arrays, are measured without copying them
+    counter = _SizeCounter()
+
+    def count_buffer(buffer):
+        counter.write(buffer.raw())
+
+    pickle.Pickler(counter, protocol=5, buffer_callback=count_buffer).dump(
+        data
+    )
+    return counter.size
+
+
+class _SizeCounter:
+    """Writable file-like object that only counts the written bytes"""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += memoryview(data).nbytes
+
+
+async def _reject_action(reason):
+    raise common.ActionRejectedException(reason)
+
+
+def _cache_size(data):
+    try:
+        return _data_size(data)
+    except Exception:
+        return None
+
+
+class _ActionHistory:
+    """Indexes of actions in the engine state, by their progress and model
+    instances, and retention of finished actions"""
+
+    finished = frozenset(
+        [
+            "complete",
+            "failed",
+            "cancelled",
+            "rejected",
+            "expired",
+            "limit_exceeded",
+        ]
+    )
+
+    def __init__(self, max_count, max_age):
+        self.max_count = max_count
+        self.max_age = max_age
+        self._instances = {}
+        self._progresses = {}
+        self._by_instance = collections.defaultdict(set)
+        self._by_progress = collections.defaultdict(set)
+        self._finish_times = collections.OrderedDict()
+
+    def register(self, action_id, instance_id):
+        self._instances[action_id] = instance_id
+        if instance_id is not None:
+            self._by_instance[instance_id].add(action_id)
+
+    def is_finished(self, action_id):
+        return action_id in self._finish_times
+
+    def find(self, progress, instance_id):
+        if progress is None and instance_id is None:
+            return set(self._instances)
+        if progress is None:
+            return set(self._by_instance.get(instance_id, ()))
+        action_ids = self._by_progress.get(progress, set())
+        if instance_id is None:
+            return set(action_ids)
+        return action_ids & self._by_instance.get(instance_id, set())
+
+    def update(self, actions, action_id, action_state):
+        if action_id not in self._instances:
+            # action was already removed from the state
+            return actions
+        progress = (action_state or {}).get("progress")
+        self._set_progress(action_id, progress)
+        actions = dict(actions)
+        actions[action_id] = action_state
+        if progress in self.finished and not self.is_finished(action_id):
+            self._finish_times[action_id] = time.monotonic()
+        return actions
+
+    def next_prune_time(self):
+        """Returns the monotonic time at which the oldest finished action
+        exceeds the maximum age, None if there is no such action"""
+        if self.max_age is None or not self._finish_times:
+            return None
+        return next(iter(self._finish_times.values())) + self.max_age
+
+    def prune(self, actions):
+        """Removes finished actions that exceed the retention limits, returns
+        actions without them and the removed actions' states"""
+        expired = []
+        limit = (
+            time.monotonic() - self.max_age
+            if self.max_age is not None
+            else None
+        )
+        excess = (
+            len(self._finish_times) - self.max_count
+            if self.max_count is not None
+            else 0
+        )
+        for action_id, finish_time in self._finish_times.items():
+            if len(expired) < excess or (
+                limit is not None and finish_time <= limit
+            ):
+                expired.append(action_id)
+            else:
+                break
+        return self.remove(actions, expired)
+
+    def remove(self, actions, action_ids=None):
+        """Removes finished actions from indexes, returns actions without
+        them and the removed actions' states"""
+        if action_ids is None:
+            action_ids = list(self._finish_times)
+        action_ids = [i for i in action_ids if self.is_finished(i)]
+        if not action_ids:
+            return actions, {}
+        actions = dict(actions)
+        removed = {}
+        for action_id in action_ids:
+            removed[action_id] = actions.pop(action_id, None)
+            self._set_progress(action_id, None)
+            instance_id = self._instances.pop(action_id)
+            if instance_id is not None:
+                self._discard(self._by_instance, instance_id, action_id)
+            del self._finish_times[action_id]
+        return actions, removed
+
+    def _set_progress(self, action_id, progress):
+        previous = self._progresses.pop(action_id, None)
+        if previous is not None:
+            self._discard(self._by_progress, previous, action_id)
+        if progress is not None:
+            self._progresses[action_id] = progress
+            self._by_progress[progress].add(action_id)
+
+    def _discard(self, index, key, action_id):
+        index[key].discard(action_id)
+        if not index[key]:
+            del index[key]
+
+
+class _Admission:
+    """Unfinished actions, by their model instances, limited in number. Once
+    a limit is reached, new actions are rejected, unless the oldest droppable
+    actions are dropped in their favour"""
+
+    def __init__(self, max_pending, max_pending_per_instance, drop_oldest):
+        self._max_pending = max_pending
+        self._max_pending_per_instance = max_pending_per_instance
+        self._drop_oldest = drop_oldest
+        # action IDs, in order of admission, mapped to whether they are
+        # droppable
+        self._actions = collections.OrderedDict()
+        self._instances = {}
+        self._by_instance = collections.defaultdict(collections.OrderedDict)
+
+    def admit(self, action_id, instance_id, droppable):
+        """Returns whether the action is admitted and IDs of the actions that
+        are dropped in its favour"""
+        limits = [(self._actions, self._max_pending)]
+        if instance_id is not None:
+            instance_actions = self._by_instance.get(instance_id, {})
+            limits.insert(
+                0, (instance_actions, self._max_pending_per_instance)
+            )
+        dropped = []
+        for actions, limit in limits:
+            if limit is None:
+                continue
+            while len(actions) - sum(i in actions for i in dropped) >= limit:
+                oldest = (
+                    self._find_droppable(actions, dropped)
+                    if droppable and self._drop_oldest
+                    else None
+                )
+                if oldest is None:
+                    return False, []
+                dropped.append(oldest)
+
+        for dropped_id in dropped:
+            self.remove(dropped_id)
+        self._actions[action_id] = droppable
+        self._instances[action_id] = instance_id
+        if instance_id is not None:
+            self._by_instance[instance_id][action_id] = droppable
+        return True, dropped
+
+    def remove(self, action_id):
+        if action_id not in self._actions:
+            return
+        del self._actions[action_id]
+        instance_id = self._instances.pop(action_id)
+        if instance_id is None:
+            return
+        del self._by_instance[instance_id][action_id]
+        if not self._by_instance[instance_id]:
+            del self._by_instance[instance_id]
+
+    def _find_droppable(self, actions, dropped):
+        for action_id, droppable in actions.items():
+            if droppable and action_id not in dropped:
+                return action_id
+        return None
+
+
+class _PredictBatch:
+    """Predictions with the same model instance, collected to be performed
+    in a single plugin call"""
+
+    def __init__(self, action_class):
+        self.action_class = action_class
+        self.entries = []
+        self.closed = asyncio.Event()
+
+
+class _BatchEntry(typing.NamedTuple):
+    args: typing.List
+    kwargs: typing.Dict
+    reactive: "_ReactiveState"
+    action_state: "_ReactiveState"
+    future: asyncio.Future
+
+
+class _InProcessHandler(aio.Resource):
+    """Handler of plugin calls executed in the engine's process, with the
+    same interface as :class:`mprocess.ProcessHandler`. Calls are executed
+    using the executor if it is set, or directly in the event loop otherwise.
+    Threads can not be terminated, closing the handler only stops waiting for
+    the result of the call."""
+
+    def __init__(self, async_group, state_cb, executor):
+        self._async_group = async_group
+        self._state_cb = state_cb
+        self._executor = executor
+        self._loop = asyncio.get_running_loop()
+
+    @property
+    def async_group(self):
+        return self._async_group
+
+    def proc_notify_state_change(self, state):
+        if self._executor is None:
+            self._notify_state(state)
+        else:
+            self._loop.call_soon_threadsafe(self._notify_state, state)
+
+    async def run(self, fn, *args, **kwargs):
+        args = [_resident_value(arg) for arg in args]
+        kwargs = {k: _resident_value(v) for k, v in kwargs.items()}
+        try:
+            if self._executor is None:
+                return fn(*args, **kwargs)
+            return await self._async_group.spawn(
+                self._executor, fn, *args, **kwargs
+            )
+        finally:
+            self._async_group.close()
+
+    def _notify_state(self, state):
+        if self._state_cb and self.is_open:
+            self._state_cb(state)
+
+
+def _resident_value(arg):
+    return arg.value if isinstance(arg, mprocess.Resident) else arg
+
+
 class _ReactiveState:
     def __init__(self, state):
         self._state = state
@@ -3,84 +3,290 @@
 objects, wrappers for the process calls."""
 
 from hat import aio
-from typing import Any, Callable, NamedTuple, Optional
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 import asyncio
+import collections
 import contextlib
 import enum
+import itertools
 import logging
+import math
 import multiprocessing
+import multiprocessing.context
+import multiprocessing.reduction
+import multiprocessing.resource_tracker
+import multiprocessing.shared_memory
+import os
+import pickle
 import psutil
+import resource
+import secrets
 import signal
+import struct
+import threading
+import threadpoolctl
+import time
+import types
+import weakref
+
+from aimm.server import common
 
 
 mlog = logging.getLogger(__name__)
 
 StateCallback = Callable[[Any], None]
 
-# TODO: switch to spawn
 mp_context = multiprocessing.get_context("fork")
 
+AutoscalingMetrics = common.AutoscalingMetrics
+
 
 class ProcessManager(aio.Resource):
     """Class used to create :class:`ProcessHandler` objects and limit the
-    amount of concurrently active child processes.
+    amount of concurrently active child processes. Handlers waiting for a
+    child process are admitted in the order in which they requested it, as
+    soon as one of the previous child processes ends.
 
     Args:
         max_children: maximum number of child processes that may be created
         async_group: async group
-        check_children_period: number of seconds waited before checking if a
-            child process may be created and notifying pending handlers
+        check_children_period: deprecated and ignored, kept for compatibility,
+            since handlers are admitted as soon as a child process ends
         sigterm_timeout: number of seconds waited before sending SIGKILL if a
-            child process does not terminate after SIGTERM"""
+            child process does not terminate after SIGTERM
+        worker_pool: if set, calls are executed in up to ``max_children``
+            long-lived worker processes instead of a new process per call. All
+            called functions and their arguments need to be pickleable
+        max_resident: maximum number of :class:`Resident` arguments each
+            worker keeps in its memory, ignored if ``worker_pool`` is not
+            set
+        shared_memory_threshold: if set, buffers of pickled call arguments and
+            results (e.g. contents of numpy arrays and pandas dataframes) of
+            at least this many bytes are transferred through shared memory
+            instead of pipes
+        process_classes: classes of handlers, by their names, with their own
+            reserved child processes and priorities, see
+            :class:`ProcessClass`. Handlers of classes that are not listed
+            have no reserved child processes and priority 0
+        zygote_preload: if set, child processes are not forked from the
+            current process, but from a zygote process that imports these
+            modules and freezes its garbage collector before forking them.
+            All called functions and their arguments need to be pickleable
+        quotas: maximum numbers of child processes used at once by handlers
+            with the same quota keys, by the keys, see
+            :meth:`create_handler`. Handlers with used up quotas wait, same as
+            when all ``max_children`` child processes are used
+        max_threads: maximum number of threads of numerical libraries in each
+            child process, unless set by the limits of its handler, see
+            :attr:`ProcessLimits.threads`. If not set, the number of CPUs
+            divided by the current maximum number of concurrent child
+            processes, see :attr:`max_children`, but at least 1, 0 leaves
+            them unlimited
+        state_interval: if set, minimal number of seconds between state
+            changes sent by a child process, see
+            :meth:`ProcessHandler.proc_notify_state_change`
+        autoscaling: if set, the number of concurrent child processes is
+            adjusted to the load and the host's resources, between
+            ``min_children`` of the autoscaling and ``max_children``, see
+            :class:`Autoscaling`
+
+    Raises:
+        ValueError: if more child processes are reserved than
+            ``max_children`` or the autoscaling's ``min_children``"""
 
     def __init__(
         self,
         max_children: int,
         async_group: aio.Group,
-        check_children_period: float,
+        check_children_period: Optional[float],
         sigterm_timeout: float,
+        worker_pool: bool = False,
+        max_resident: int = 0,
+        shared_memory_threshold: Optional[int] = None,
+        process_classes: Optional[Dict[str, "ProcessClass"]] = None,
+        zygote_preload: Optional[Iterable[str]] = None,
+        quotas: Optional[Dict[Hashable, int]] = None,
+        max_threads: Optional[int] = None,
+        state_interval: Optional[float] = None,
+        autoscaling: Optional["Autoscaling"] = None,
     ):
-        self._max_children = max_children
         self._async_group = async_group
-        self._check_children_period = check_children_period
         self._sigterm_timeout = sigterm_timeout
+        self._state_interval = state_interval
+        self._shared_memory_threshold = shared_memory_threshold
+        self._context = (
+            mp_context
+            if zygote_preload is None
+            else _zygote_context(zygote_preload)
+        )
 
-        self._condition = asyncio.Condition()
+        self._max_threads = max_threads
+
+        self._slots = _Slots(max_children, process_classes or {}, quotas)
+        self._worker_pool = None
+        self._autoscaler = None
+
+        if shared_memory_threshold is not None:
+            # children need to share the tracker of the parent, since segments
+            # created by one process are unlinked by the other one
+            multiprocessing.resource_tracker.ensure_running()
+
+        if worker_pool:
+            self._worker_pool = _WorkerPool(
+                self._slots, sigterm_timeout, max_resident, self._context
+            )
+            self._async_group.spawn(
+                aio.call_on_cancel, self._worker_pool.async_close
+            )
 
-        self._async_group.spawn(self._condition_loop)
+        if autoscaling is not None:
+            self._autoscaler = _Autoscaler(
+                self._slots, self._worker_pool, max_children, autoscaling
+            )
+            self._async_group.spawn(self._autoscaler.run)
 
     @property
     def async_group(self) -> aio.Group:
         return self._async_group
 
-    def create_handler(self, state_cb: StateCallback) -> "ProcessHandler":
+    @property
+    def max_children(self) -> int:
+        """Current maximum number of concurrent child processes, adjusted by
+        the autoscaling if it is set"""
+        return self._slots.count
+
+    @property
+    def autoscaling_metrics(self) -> Optional[AutoscalingMetrics]:
+        """Metrics of the latest autoscaling period, None if autoscaling is
+        not set or no period passed yet"""
+        if self._autoscaler is None:
+            return None
+        return self._autoscaler.metrics
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of handlers waiting for a child process"""
+        return self._slots.queue_depth
+
+    @property
+    def active_children(self) -> int:
+        """Number of child processes currently used by handlers"""
+        return self._slots.used
+
+    def invalidate_resident(self, key: Hashable):
+        """Removes values stored under ``key`` from the memory of all workers.
+        Stale values are not used even without invalidation, since they are
+        identified by their version, but they keep occupying the memory of
+        workers until they are evicted.
+
+        Args:
+            key: key of the :class:`Resident` argument"""
+        if self._worker_pool is not None:
+            self._worker_pool.invalidate(key)
+
+    def create_handler(
+        self,
+        state_cb: StateCallback,
+        process_class: Optional[str] = None,
+        quota_keys: Iterable[Hashable] = (),
+        limits: Optional["ProcessLimits"] = None,
+    ) -> "ProcessHandler":
         """Creates a ProcessHandler
 
         Args:
             state_cb (Callable[List[Any], None]): state callback for changes
                 in the process call
+            process_class: name of the class of the handler, determines
+                the child processes reserved for it and its priority while
+                waiting for a child process
+            quota_keys: keys of the quotas that the handler's child process
+                counts against, the handler waits until none of them is used
+                up
+            limits: if set, limits applied to the handler's child process
+                before the call, the number of threads defaults to the
+                manager's ``max_threads``
 
         Returns:
             ProcessHandler"""
+        limits = limits or ProcessLimits()
+        if limits.threads is None:
+            limits = limits._replace(threads=self._get_max_threads())
         return ProcessHandler(
             self._async_group.create_subgroup(),
             self._sigterm_timeout,
             state_cb,
-            self._condition,
+            self._slots,
+            self._worker_pool,
+            self._shared_memory_threshold,
+            process_class,
+            self._context,
+            quota_keys,
+            limits,
+            self._state_interval,
         )
 
-    async def _condition_loop(self):
-        condition = self._condition
-        process = psutil.Process()
-        with contextlib.suppress(asyncio.CancelledError):
-            while True:
-                async with condition:
-                    available_processes = self._max_children - len(
-                        process.children()
-                    )
-                    if available_processes > 0:
-                        condition.notify(available_processes)
-                await asyncio.sleep(self._check_children_period)
+    def _get_max_threads(self):
+        if self._max_threads is not None:
+            return self._max_threads
+        # follows the number of concurrent child processes, which may be
+        # changed by the autoscaling
+        return max(1, (os.cpu_count() or 1) // max(1, self._slots.count))
+
+
+class ProcessClass(NamedTuple):
+    """Scheduling parameters of a class of handlers. Handlers waiting for a
+    child process are admitted in the order of their priorities and, within
+    the same priority, in the order in which they requested it. Reserved child
+    processes may only be used by handlers of their class, while the remaining
+    ones, up to ``max_children``, are shared by all classes."""
+
+    reserved: int = 0
+    """number of child processes reserved for handlers of the class"""
+    priority: int = 0
+    """priority of waiting handlers of the class, higher priority handlers
+    are admitted first"""
+
+
+class Autoscaling(NamedTuple):
+    """Parameters of the adaptive number of concurrent child processes. The
+    manager starts with ``max_children`` and samples its load and the host's
+    resources every ``period`` seconds. It proposes adding a child process
+    when handlers waited for one, either at the moment of sampling or for
+    longer than ``max_wait_time`` on average during the period, as long as
+    the CPU utilization is below ``max_cpu_utilization`` and another child
+    process, estimated by the largest current one, fits in the available
+    memory without going below ``min_available_memory``. It proposes removing
+    one when the available memory is below ``min_available_memory`` or when
+    some child processes stayed unused during the whole period. A proposal
+    is applied only once it is made in ``stable_periods`` consecutive periods,
+    so that short spikes do not make the number flap."""
+
+    min_children: int = 1
+    """lower bound of the number of concurrent child processes"""
+    period: float = 5
+    """number of seconds between samples"""
+    stable_periods: int = 3
+    """number of consecutive periods with the same proposal needed to apply
+    it"""
+    max_wait_time: float = 0
+    """average number of seconds handlers may wait for a child process
+    before more child processes are proposed"""
+    max_cpu_utilization: float = 90
+    """CPU utilization of the host, in percent, above which no child
+    processes are added"""
+    min_available_memory: int = 0
+    """available memory of the host, in bytes, below which child processes
+    are removed"""
 
 
 class ProcessHandler(aio.Resource):
@@ -92,8 +298,19 @@ class ProcessHandler(aio.Resource):
         sigterm_timeout (float): time waited until process handles SIGTERM
             before sending SIGKILL during forced shutdown
         state_cb (Optional[Callable[Any]]): state change cb
-        condition (asyncio.Condition): condition that notifies when a new
-            process may be created
+        slots (_Slots): admission of new child processes
+        worker_pool (Optional[_WorkerPool]): pool of worker processes, if set
+            the call is executed in one of its workers instead of a new process
+        shared_memory_threshold (Optional[int]): if set, minimal size of a
+            buffer transferred through shared memory
+        process_class (Optional[str]): name of the class of the handler
+        context (Optional[multiprocessing.context.BaseContext]): context
+            used to start the child process, ``fork`` if not set
+        quota_keys (Iterable[Hashable]): keys of the quotas the child process
+            counts against
+        limits (Optional[ProcessLimits]): limits applied to the child process
+        state_interval (Optional[float]): minimal number of seconds between
+            state changes sent by the child process
     """
 
     def __init__(
@@ -101,20 +318,37 @@ class ProcessHandler(aio.Resource):
         async_group: aio.Group,
         sigterm_timeout: float,
         state_cb: StateCallback,
-        condition: asyncio.Condition,
+        slots: "_Slots",
+        worker_pool: Optional["_WorkerPool"] = None,
+        shared_memory_threshold: Optional[int] = None,
+        process_class: Optional[str] = None,
+        context: Optional[multiprocessing.context.BaseContext] = None,
+        quota_keys: Iterable[Hashable] = (),
+        limits: Optional["ProcessLimits"] = None,
+        state_interval: Optional[float] = None,
     ):
         self._async_group = async_group
         self._sigterm_timeout = sigterm_timeout
         self._state_cb = state_cb
-        self._condition = condition
-
-        self._result_pipe = mp_context.Pipe(False)
-        self._state_pipe = mp_context.Pipe(False)
+        self._process_class = process_class
+        self._context = context or mp_context
+        self._quota_keys = tuple(quota_keys)
+        self._limits = limits
+        self._state_interval = state_interval
+        self._slots = slots
+        self._worker_pool = worker_pool
+        self._shared_memory_threshold = shared_memory_threshold
+        self._shared_memory_prefix = f"aimm_{secrets.token_hex(4)}_"
 
+        self._job_segments = []
+        self._result_received = False
+        self._slot_acquired = False
         self._process = None
-        self._executor = aio.create_executor()
+        self._worker = None
+        self._reader = None
+        self._message_fd = None
+        self._message_lock = threading.Lock()
 
-        self._async_group.spawn(self._state_loop)
         self._async_group.spawn(aio.call_on_cancel, self._cleanup)
 
     @property
@@ -126,61 +360,246 @@ class ProcessHandler(aio.Resource):
         handler of state change, new state is passed to ``state_cb`` received
         in the constructor.
 
+        When passed to the call as any of its positional or keyword
+        arguments, the method is replaced by the child's own state
+        notification function, which is required when running in a worker
+        pool or in a child of the zygote process. If the handler has a state
+        interval, that function sends state changes at most once per interval
+        without blocking the call, state changes made in the meantime are
+        coalesced and only the latest one of each :class:`Substate` key is
+        sent once the interval passes. The latest state changes are always
+        sent before the result of the call.
+
         Args:
             state: call state, needs to be pickleable
 
         """
-        self._state_pipe[1].send(state)
+        _proc_write(self._message_fd, self._message_lock, _StateChange(state))
 
     async def run(self, fn: Callable, *args: Any, **kwargs: Any):
         """Requests the start of function execution in the separate process.
 
         Args:
             fn: function that will be called
-            *args: positional arguments, need to be pickleable
-            **kwargs: keyword arguments, need to be pickleable
+            *args: positional arguments, need to be pickleable, values of
+                :class:`Resident` arguments are passed to the function
+            **kwargs: keyword arguments, need to be pickleable, same as with
+                positional arguments, values of :class:`Resident` arguments are
+                passed to the function
 
         """
-        await self._condition.acquire()
+        if self._worker_pool is not None:
+            return await self._run_in_worker(fn, args, kwargs)
+
+        args = [self._worker_arg(_resident_value(arg)) for arg in args]
+        kwargs = {
+            k: self._worker_arg(_resident_value(v)) for k, v in kwargs.items()
+        }
+
         try:
-            await self._condition.wait()
-            self._process = mp_context.Process(
-                target=_proc_run_fn,
-                args=(self._result_pipe, fn, *args),
-                kwargs=kwargs,
+            await self._slots.acquire(self._process_class, self._quota_keys)
+            self._slot_acquired = True
+            read_fd, self._message_fd = os.pipe()
+            self._reader = _MessageReader(read_fd)
+            try:
+                self._process = self._context.Process(
+                    target=_proc_run_fn,
+                    args=(
+                        _ChildFd(self._message_fd),
+                        (
+                            self._message_lock
+                            if _is_forked(self._context)
+                            else None
+                        ),
+                        self._transport("r"),
+                        self._limits,
+                        self._state_interval,
+                        fn,
+                        *args,
+                    ),
+                    kwargs=kwargs,
+                )
+                self._process.start()
+            finally:
+                # the child holds the only write end, so that its termination
+                # is detected as the end of the pipe
+                os.close(self._message_fd)
+
+            async def wait_result():
+                result = await self._receive_result(self._reader)
+                if result.success:
+                    return result.result
+                else:
+                    raise result.exception
+
+            return await self._wait_result(wait_result())
+        finally:
+            self._async_group.close()
+
+    async def _run_in_worker(self, fn, args, kwargs):
+        resident = [
+            arg
+            for arg in (*args, *kwargs.values())
+            if isinstance(arg, Resident)
+        ]
+        try:
+            self._worker = await self._worker_pool.acquire(
+                self._process_class, resident, self._quota_keys
             )
-            self._process.start()
+            reader = self._worker.reader
+            job = self._worker_pool.create_job(
+                self._worker,
+                fn,
+                [self._worker_arg(arg) for arg in args],
+                {k: self._worker_arg(v) for k, v in kwargs.items()},
+                self._transport("r"),
+                self._limits,
+                self._state_interval,
+            )
+            await self._send_job(self._worker.writer, job)
 
             async def wait_result():
-                result = await self._executor(
-                    _ext_closeable_recv, self._result_pipe
-                )
+                result = await self._receive_result(reader)
+                if not result.success and self._worker is not None:
+                    self._worker_pool.forget(self._worker, resident)
+                # the niceness of an unprivileged process cannot be lowered,
+                # so a worker that applied it is not reused and is ended on
+                # cleanup instead
+                if self._limits is None or self._limits.nice is None:
+                    self._release_worker()
                 if result.success:
                     return result.result
                 else:
                     raise result.exception
 
-            return await aio.uncancellable(wait_result())
+            return await self._wait_result(wait_result())
         finally:
-            self._condition.release()
             self._async_group.close()
 
-    async def _state_loop(self):
-        with contextlib.suppress(asyncio.CancelledError, ValueError):
-            while True:
-                state = await self._executor(
-                    _ext_closeable_recv, self._state_pipe
-                )
-                if self._state_cb:
-                    self._state_cb(state)
+    async def _wait_result(self, result):
+        # cancelling the call terminates its child process, same as closing
+        # the handler, and the call ends once the child process ends
+        task = asyncio.ensure_future(result)
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            self._async_group.close()
+            with contextlib.suppress(Exception):
+                await aio.uncancellable(task)
+            raise
+
+    def _transport(self, suffix):
+        if self._shared_memory_threshold is None:
+            return None
+        return _Transport(
+            threshold=self._shared_memory_threshold,
+            prefix=self._shared_memory_prefix + suffix,
+        )
+
+    async def _send_job(self, writer, job):
+        payload = _encode(job, self._transport("j"))
+        if isinstance(payload, _SharedPayload):
+            self._job_segments = [name for name, _ in payload.segments]
+        await writer.write(payload)
+
+    async def _receive_result(self, reader):
+        while True:
+            msg = await reader.receive()
+            if not isinstance(msg, _StateChange):
+                break
+            if self._state_cb:
+                self._state_cb(msg.state)
+        self._result_received = True
+        return msg
+
+    def _release_worker(self):
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            self._worker_pool.release(
+                worker, self._process_class, self._quota_keys
+            )
+
+    def _worker_arg(self, arg):
+        if not isinstance(arg, types.MethodType):
+            return arg
+        if arg == self.proc_notify_state_change:
+            return _WorkerArg.STATE_CB
+        return arg
 
     async def _cleanup(self):
+        worker, self._worker = self._worker, None
+        if worker is not None:
+            await self._worker_pool.discard(
+                worker, self._process_class, self._quota_keys
+            )
         if self._process is not None:
-            await self._executor(
-                _ext_end_process, self._process, self._sigterm_timeout
+            await _end_process(self._process, self._sigterm_timeout)
+        if self._reader is not None:
+            self._reader.close()
+        if self._slot_acquired:
+            self._slot_acquired = False
+            self._slots.release(self._process_class, self._quota_keys)
+        if self._shared_memory_threshold is not None:
+            _unlink_segments(
+                self._job_segments,
+                None if self._result_received else self._transport("r"),
             )
-        await self._executor(_ext_close_pipe, self._result_pipe)
-        await self._executor(_ext_close_pipe, self._state_pipe)
+
+
+class Resident(NamedTuple):
+    """Wrapper of a call argument that worker processes keep in their memory
+    between calls. If a worker already holds a value with the same key and
+    version, only the key and version are sent to it. Without a worker pool,
+    the wrapped value is passed as a regular argument.
+
+    If the call fails, the values it received are removed from the worker's
+    memory, since the call might have left them in an inconsistent state."""
+
+    key: Hashable
+    """key under which the value is kept"""
+    version: Hashable
+    """version of the value, workers holding a different version of the value
+    under the same key receive the new value"""
+    value: Any
+    """wrapped value"""
+
+
+class Substate(NamedTuple):
+    """State change of a part of a call's state, identified by its key. State
+    changes sent with a state interval, see
+    :meth:`ProcessHandler.proc_notify_state_change`, are coalesced per key, so
+    that the latest state change of each part is sent. State changes that are
+    not wrapped in substates all share the same key."""
+
+    key: Hashable
+    """key of the part of the state"""
+    state: Any
+    """new state of the part"""
+
+
+class ProcessLimits(NamedTuple):
+    """Limits applied to a child process before the call. A call exceeding
+    the memory limit fails with :class:`ProcessLimitException`, while failing
+    to apply the limits, e.g. lowering the niceness without the privilege to
+    do so, fails the call with the raised error. Workers of the worker pool
+    lift the limits after the call, except for the niceness, which an
+    unprivileged process cannot lower, so a worker that applied it is not
+    reused for other calls."""
+
+    max_memory: Optional[int] = None
+    """maximum size of the virtual memory of the child process in bytes,
+    applied as its ``RLIMIT_AS``"""
+    cpu_affinity: Optional[List[int]] = None
+    """CPUs the child process may run on"""
+    nice: Optional[int] = None
+    """niceness of the child process"""
+    threads: Optional[int] = None
+    """maximum number of threads of thread pools of numerical libraries, such
+    as BLAS and OpenMP, in the child process, 0 leaves them unlimited. Applied
+    through :mod:`threadpoolctl` to libraries that are already loaded, e.g.
+    by the plugin modules, and through the libraries' environment variables,
+    e.g. ``OMP_NUM_THREADS``, to libraries loaded by the call. Libraries that
+    keep more threads are logged as warnings"""
 
 
 @contextlib.contextmanager
@@ -202,42 +621,972 @@ class ProcessTerminatedException(Exception):
     pass
 
 
+class ProcessLimitException(Exception):
+    """Raised by calls whose child processes exceeded their limits"""
+
+
 def _plugin_sigterm_handler(_, __):
     raise ProcessTerminatedException("process sigterm")
 
 
-def _proc_run_fn(pipe, fn, *args, **kwargs):
+class _StateChange(NamedTuple):
+    state: Any
+
+
+class _ChildFd:
+    """File descriptor passed to a child process. A forked child inherits the
+    descriptor, while a child forked from the zygote receives its duplicate
+    when the process object is pickled."""
+
+    def __init__(self, fd: int):
+        self.fd = fd
+
+    def __reduce__(self):
+        return _ChildFd._rebuild, (multiprocessing.reduction.DupFd(self.fd),)
+
+    @staticmethod
+    def _rebuild(dup_fd):
+        return _ChildFd(dup_fd.detach())
+
+
+class _WorkerArg(enum.Enum):
+    STATE_CB = enum.auto()
+    RESIDENT = enum.auto()
+
+
+class _Worker(NamedTuple):
+    process: multiprocessing.Process
+    writer: "_MessageWriter"
+    reader: "_MessageReader"
+    resident: collections.OrderedDict
+    evict: set
+
+
+class _Slots:
+    """Admission of a limited number of concurrent child processes. Waiting
+    callers are admitted by the priority of their class and, within the same
+    priority, first-in-first-out. A released slot is handed over directly to
+    the next admitted caller. Callers with quota keys are also admitted only
+    while the quotas of all of their keys are not used up."""
+
+    def __init__(
+        self,
+        count: int,
+        classes: Dict[str, ProcessClass],
+        quotas: Optional[Dict[Hashable, int]] = None,
+    ):
+        reserved = sum(c.reserved for c in classes.values())
+        if reserved > count:
+            raise ValueError(
+                f"{reserved} reserved child processes exceed the maximum "
+                f"of {count}"
+            )
+        self._classes = classes
+        self._quotas = quotas or {}
+        self._reserved_count = reserved
+        self._shared = count - reserved
+        self._shared_used = 0
+        self._used = collections.Counter()
+        self._quotas_used = collections.Counter()
+        self._waiting = []
+        self._peak_used = 0
+        self._wait_total = 0
+        self._wait_count = 0
+
+    @property
+    def count(self) -> int:
+        return self._shared + self._reserved_count
+
+    @property
+    def used(self) -> int:
+        return sum(self._used.values())
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiting)
+
+    async def acquire(
+        self,
+        process_class: Optional[str] = None,
+        quota_keys: Iterable[Hashable] = (),
+    ):
+        # slots are handed over to waiting callers as soon as they become
+        # admissible, so a new caller may only take a slot that none of the
+        # waiting callers could
+        if self._admissible(process_class, quota_keys):
+            self._take(process_class, quota_keys)
+            self._add_wait_time(0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        entry = process_class, quota_keys, future
+        self._waiting.append(entry)
+        start = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                self._waiting.remove(entry)
+            else:
+                self.release(process_class, quota_keys)
+            raise
+        self._add_wait_time(time.monotonic() - start)
+
+    def release(
+        self,
+        process_class: Optional[str] = None,
+        quota_keys: Iterable[Hashable] = (),
+    ):
+        self._used[process_class] -= 1
+        if self._used[process_class] >= self._reserved(process_class):
+            self._shared_used -= 1
+        for key in quota_keys:
+            self._quotas_used[key] -= 1
+        self._admit_waiting()
+
+    def resize(self, count: int):
+        # slots used above a reduced count are not taken away, but they are
+        # not handed over to waiting callers once released
+        if self._reserved_count > count:
+            raise ValueError(
+                f"{self._reserved_count} reserved child processes exceed "
+                f"the maximum of {count}"
+            )
+        self._shared = count - self._reserved_count
+        self._admit_waiting()
+
+    def pop_stats(self) -> Tuple[int, float]:
+        """Returns the peak number of used slots and the average wait time of
+        admitted callers since the previous call"""
+        peak_used, self._peak_used = self._peak_used, self.used
+        wait_time = (
+            self._wait_total / self._wait_count if self._wait_count else 0
+        )
+        self._wait_total = 0
+        self._wait_count = 0
+        return peak_used, wait_time
+
+    def _admit_waiting(self):
+        while (entry := self._next_waiting()) is not None:
+            self._waiting.remove(entry)
+            process_class, quota_keys, future = entry
+            self._take(process_class, quota_keys)
+            future.set_result(None)
+
+    def _add_wait_time(self, wait_time):
+        self._wait_total += wait_time
+        self._wait_count += 1
+
+    def _next_waiting(self):
+        admissible = [
+            (self._priority(entry[0]), -i, entry)
+            for i, entry in enumerate(self._waiting)
+            if self._admissible(entry[0], entry[1])
+        ]
+        if not admissible:
+            return None
+        return max(admissible, key=lambda i: i[:2])[2]
+
+    def _admissible(self, process_class, quota_keys):
+        for key in quota_keys:
+            if self._quotas_used[key] >= self._quotas.get(key, math.inf):
+                return False
+        if self._used[process_class] < self._reserved(process_class):
+            return True
+        return self._shared_used < self._shared
+
+    def _take(self, process_class, quota_keys):
+        if self._used[process_class] >= self._reserved(process_class):
+            self._shared_used += 1
+        self._used[process_class] += 1
+        for key in quota_keys:
+            self._quotas_used[key] += 1
+        self._peak_used = max(self._peak_used, self.used)
+
+    def _reserved(self, process_class):
+        return self._classes.get(process_class, ProcessClass()).reserved
+
+    def _priority(self, process_class):
+        return self._classes.get(process_class, ProcessClass()).priority
+
+
+class _Autoscaler:
+    """Adjusts the count of slots to the load and the host's resources, see
+    :class:`Autoscaling`"""
+
+    def __init__(
+        self,
+        slots: _Slots,
+        worker_pool: Optional["_WorkerPool"],
+        max_children: int,
+        autoscaling: Autoscaling,
+    ):
+        if autoscaling.min_children > max_children:
+            raise ValueError(
+                f"minimum of {autoscaling.min_children} child processes "
+                f"exceeds the maximum of {max_children}"
+            )
+        # checks the reserved slots against the lower bound
+        slots.resize(autoscaling.min_children)
+        slots.resize(max_children)
+        self._slots = slots
+        self._worker_pool = worker_pool
+        self._max_children = max_children
+        self._conf = autoscaling
+        self._proposal = 0
+        self._proposal_periods = 0
+        self._metrics = None
+
+    @property
+    def metrics(self) -> Optional[AutoscalingMetrics]:
+        return self._metrics
+
+    async def run(self):
+        # the first call only starts measuring the utilization
+        psutil.cpu_percent()
+        self._slots.pop_stats()
+        while True:
+            await asyncio.sleep(self._conf.period)
+            self._step()
+
+    def _step(self):
+        peak_used, wait_time = self._slots.pop_stats()
+        count = self._slots.count
+        metrics = AutoscalingMetrics(
+            max_children=count,
+            queue_depth=self._slots.queue_depth,
+            peak_children=peak_used,
+            wait_time=wait_time,
+            cpu_utilization=psutil.cpu_percent(),
+            available_memory=psutil.virtual_memory().available,
+            child_memory=_children_memory(),
+        )
+        proposal, reason = self._propose(metrics)
+        new_count = count + proposal
+        if new_count < self._conf.min_children:
+            proposal = 0
+        if new_count > self._max_children:
+            proposal = 0
+        if proposal != self._proposal:
+            self._proposal = proposal
+            self._proposal_periods = 0
+            if proposal:
+                mlog.info(
+                    "max_children change from %s to %s proposed: %s",
+                    count,
+                    new_count,
+                    reason,
+                )
+        self._proposal_periods += 1
+
+        if proposal and self._proposal_periods >= self._conf.stable_periods:
+            self._proposal_periods = 0
+            metrics = metrics._replace(max_children=new_count)
+            mlog.info(
+                "max_children changed from %s to %s: %s",
+                count,
+                new_count,
+                reason,
+            )
+            self._slots.resize(new_count)
+            if self._worker_pool is not None:
+                self._worker_pool.trim()
+        mlog.debug("autoscaling metrics: %s", metrics)
+        self._metrics = metrics
+
+    def _propose(self, metrics):
+        if metrics.available_memory < self._conf.min_available_memory:
+            return -1, "available memory below minimum"
+        waiting = metrics.queue_depth > 0
+        if metrics.wait_time > self._conf.max_wait_time:
+            waiting = True
+        if waiting:
+            if metrics.cpu_utilization > self._conf.max_cpu_utilization:
+                return 0, None
+            # the new child process should not take the memory below the
+            # minimum, which would only remove it again
+            free_memory = metrics.available_memory - metrics.child_memory
+            if free_memory < self._conf.min_available_memory:
+                return 0, None
+            return 1, "handlers waiting for child processes"
+        if metrics.peak_children < metrics.max_children:
+            return -1, "child processes unused"
+        return 0, None
+
+
+def _children_memory():
+    memory = 0
+    for child in psutil.Process().children(recursive=True):
+        with contextlib.suppress(psutil.Error):
+            memory = max(memory, child.memory_info().rss)
+    return memory
+
+
+class _WorkerPool(aio.Resource):
+    """Pool of long-lived worker processes, there is at most one worker per
+    slot. Workers are created on demand and idle ones are reused for later
+    calls. Each worker keeps up to ``max_resident`` :class:`Resident` values
+    in its memory."""
+
+    def __init__(
+        self,
+        slots: _Slots,
+        sigterm_timeout: float,
+        max_resident: int,
+        context: multiprocessing.context.BaseContext,
+    ):
+        self._async_group = aio.Group()
+        self._sigterm_timeout = sigterm_timeout
+        self._slots = slots
+        self._max_resident = max_resident
+        self._context = context
+        self._workers = {}
+        self._idle = collections.deque()
+
+        self._async_group.spawn(aio.call_on_cancel, self._cleanup)
+
+    @property
+    def async_group(self) -> aio.Group:
+        return self._async_group
+
+    async def acquire(
+        self,
+        process_class: Optional[str] = None,
+        resident: Iterable["Resident"] = (),
+        quota_keys: Iterable[Hashable] = (),
+    ) -> _Worker:
+        await self._slots.acquire(process_class, quota_keys)
+        try:
+            while self._idle:
+                worker = self._pop_idle(resident)
+                if worker.process.is_alive() and not worker.reader.is_closed:
+                    return worker
+                await self._end_worker(worker)
+            worker = _create_worker(self._context)
+            self._workers[worker.process.pid] = worker
+            return worker
+        except BaseException:
+            self._slots.release(process_class, quota_keys)
+            raise
+
+    def release(
+        self,
+        worker: _Worker,
+        process_class: Optional[str] = None,
+        quota_keys: Iterable[Hashable] = (),
+    ):
+        if self._async_group.is_closing:
+            self._workers.pop(worker.process.pid, None)
+            _kill_worker(worker)
+        else:
+            self._idle.append(worker)
+            self.trim()
+        self._slots.release(process_class, quota_keys)
+
+    def trim(self):
+        """Ends idle workers exceeding the count of slots"""
+        while self._idle and len(self._workers) > self._slots.count:
+            worker = self._idle.popleft()
+            self._workers.pop(worker.process.pid, None)
+            self._async_group.spawn(self._end_worker, worker)
+
+    async def discard(
+        self,
+        worker: _Worker,
+        process_class: Optional[str] = None,
+        quota_keys: Iterable[Hashable] = (),
+    ):
+        try:
+            await self._end_worker(worker)
+        finally:
+            self._slots.release(process_class, quota_keys)
+
+    def create_job(
+        self,
+        worker: _Worker,
+        fn: Callable,
+        args: List,
+        kwargs: Dict,
+        transport: Optional["_Transport"],
+        limits: Optional["ProcessLimits"] = None,
+        state_interval: Optional[float] = None,
+    ) -> Tuple:
+        """Creates the message sent to the worker, :class:`Resident` arguments
+        are sent without their values if the worker already holds them"""
+        args = [self._resident_arg(worker, arg) for arg in args]
+        kwargs = {k: self._resident_arg(worker, v) for k, v in kwargs.items()}
+        evict = worker.evict - set(worker.resident)
+        worker.evict.clear()
+        return fn, args, kwargs, evict, transport, limits, state_interval
+
+    def forget(self, worker: _Worker, resident: Iterable["Resident"]):
+        for arg in resident:
+            worker.resident.pop(arg.key, None)
+
+    def invalidate(self, key: Hashable):
+        for worker in self._workers.values():
+            if worker.resident.pop(key, None) is not None:
+                worker.evict.add(key)
+
+    def _resident_arg(self, worker, arg):
+        if not isinstance(arg, Resident):
+            return arg
+        if self._max_resident < 1:
+            return arg.value
+        if worker.resident.get(arg.key) == arg.version:
+            worker.resident.move_to_end(arg.key)
+            return arg._replace(value=_WorkerArg.RESIDENT)
+        worker.resident[arg.key] = arg.version
+        worker.resident.move_to_end(arg.key)
+        while len(worker.resident) > self._max_resident:
+            key, _ = worker.resident.popitem(last=False)
+            worker.evict.add(key)
+        return arg
+
+    def _pop_idle(self, resident):
+        index = len(self._idle) - 1
+        if resident:
+            hits = [
+                sum(w.resident.get(r.key) == r.version for r in resident)
+                for w in self._idle
+            ]
+            index = max(range(len(hits)), key=lambda i: (hits[i], i))
+        worker = self._idle[index]
+        del self._idle[index]
+        return worker
+
+    async def _end_worker(self, worker):
+        self._workers.pop(worker.process.pid, None)
+        try:
+            await _end_process(worker.process, self._sigterm_timeout)
+        finally:
+            worker.writer.close()
+            worker.reader.close()
+
+    async def _cleanup(self):
+        while self._idle:
+            await self._end_worker(self._idle.pop())
+
+
+def _create_worker(context):
+    job_read_fd, job_fd = os.pipe()
+    read_fd, message_fd = os.pipe()
     try:
-        with sigterm_override():
-            result = _Result(success=True, result=fn(*args, **kwargs))
+        process = context.Process(
+            target=_proc_worker_loop,
+            args=(
+                _ChildFd(job_read_fd),
+                _ChildFd(message_fd),
+                # only a forked child inherits the parent's ends of the pipes
+                [job_fd, read_fd] if _is_forked(context) else [],
+            ),
+        )
+        process.start()
+    except BaseException:
+        os.close(job_fd)
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(job_read_fd)
+        os.close(message_fd)
+    return _Worker(
+        process=process,
+        writer=_MessageWriter(job_fd),
+        reader=_MessageReader(read_fd),
+        resident=collections.OrderedDict(),
+        evict=set(),
+    )
+
+
+def _resident_value(arg):
+    return arg.value if isinstance(arg, Resident) else arg
+
+
+def _proc_call(fn, args, kwargs, limits=None):
+    try:
+        with sigterm_override(), _proc_limits(limits):
+            return _Result(success=True, result=fn(*args, **kwargs))
     except Exception as e:
-        result = _Result(success=False, exception=e)
-    pipe[1].send(result)
+        return _Result(success=False, exception=_proc_exception(e, limits))
+
+
+@contextlib.contextmanager
+def _proc_limits(limits):
+    # limits are lifted after the call, except for the niceness
+    with contextlib.ExitStack() as stack:
+        if limits is None:
+            limits = ProcessLimits()
+        if limits.max_memory is not None:
+            soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+            max_memory = limits.max_memory
+            if hard != resource.RLIM_INFINITY:
+                max_memory = min(max_memory, hard)
+            resource.setrlimit(resource.RLIMIT_AS, (max_memory, hard))
+            stack.callback(
+                resource.setrlimit, resource.RLIMIT_AS, (soft, hard)
+            )
+        if limits.cpu_affinity is not None:
+            stack.callback(os.sched_setaffinity, 0, os.sched_getaffinity(0))
+            os.sched_setaffinity(0, limits.cpu_affinity)
+        if limits.nice is not None:
+            os.setpriority(os.PRIO_PROCESS, 0, limits.nice)
+        if limits.threads:
+            stack.enter_context(_proc_threads(limits.threads))
+        yield
+
+
+@contextlib.contextmanager
+def _proc_threads(threads):
+    # libraries loaded before the call, e.g. by plugin modules imported by
+    # the server or the zygote, are limited at runtime, while the variables
+    # limit the ones loaded by the call
+    environ = {name: os.environ.get(name) for name in _thread_variables}
+    os.environ.update({name: str(threads) for name in _thread_variables})
+    limiter = None
+    try:
+        try:
+            limiter = threadpoolctl.threadpool_limits(threads)
+        except Exception as e:
+            mlog.warning(
+                "thread limit %s not applied: %s", threads, e, exc_info=e
+            )
+        for info in threadpoolctl.threadpool_info():
+            if info["num_threads"] > threads:
+                mlog.warning(
+                    "thread limit %s not applied to %s, which uses %s threads",
+                    threads,
+                    info["filepath"],
+                    info["num_threads"],
+                )
+        yield
+    finally:
+        if limiter is not None:
+            limiter.restore_original_limits()
+        for name, value in environ.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+_thread_variables = [
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+]
+
+
+def _proc_exception(e, limits):
+    if not isinstance(e, MemoryError):
+        return e
+    if limits is None or limits.max_memory is None:
+        return e
+    return ProcessLimitException(
+        f"memory limit of {limits.max_memory} bytes exceeded"
+    )
+
+
+def _proc_run_fn(
+    fd, lock, transport, limits, state_interval, fn, *args, **kwargs
+):
+    fd = fd.fd
+    lock = lock or threading.Lock()
+    state_sender = _StateSender(fd, lock, state_interval)
+
+    def worker_arg(arg):
+        if arg is _WorkerArg.STATE_CB:
+            return state_sender
+        return arg
+
+    result = _proc_call(
+        fn,
+        [worker_arg(arg) for arg in args],
+        {k: worker_arg(v) for k, v in kwargs.items()},
+        limits,
+    )
+    state_sender.flush()
+    _proc_send_result(fd, lock, result, transport, limits)
+
+
+class _StateSender:
+    """State notification function of a call in a child process. Sends state
+    changes at most once per ``interval`` seconds, later state changes are
+    kept, one per :class:`Substate` key, and only the latest ones are sent by
+    a timer thread once the interval passes, or on :meth:`flush`"""
+
+    def __init__(self, fd, lock, interval):
+        self._fd = fd
+        self._lock = lock
+        self._interval = interval or 0
+        self._state_lock = threading.Lock()
+        self._pending = {}
+        self._sent = -math.inf
+        self._timer = None
+
+    def __call__(self, state):
+        key = state.key if isinstance(state, Substate) else _whole_state
+        with self._state_lock:
+            # keys are sent in the order of their latest state changes
+            self._pending.pop(key, None)
+            self._pending[key] = state
+            if self._timer is not None:
+                return
+            delay = self._sent + self._interval - time.monotonic()
+            if delay <= 0:
+                self._send()
+                return
+            self._timer = threading.Timer(delay, self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Sends the latest state changes that were not sent yet"""
+        with self._state_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._send()
+
+    def _on_timer(self):
+        with self._state_lock:
+            # timers cancelled by flush may still run
+            if self._timer is not threading.current_thread():
+                return
+            self._timer = None
+            self._send()
+
+    def _send(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        self._sent = time.monotonic()
+        for state in pending.values():
+            _proc_write(self._fd, self._lock, _StateChange(state))
+
 
+_whole_state = object()
 
-def _ext_end_process(process, sigterm_timeout):
+
+def _proc_send_result(fd, lock, result, transport, limits=None):
+    try:
+        _proc_write(fd, lock, _encode(result, transport))
+    except Exception as e:
+        result = _Result(success=False, exception=_proc_exception(e, limits))
+        _proc_write(fd, lock, result)
+
+
+def _proc_worker_loop(job_fd, message_fd, parent_fds):
+    job_fd, message_fd = job_fd.fd, message_fd.fd
+    for fd in parent_fds:
+        os.close(fd)
+    lock = threading.Lock()
+    resident = {}
+
+    def worker_arg(arg):
+        if arg is _WorkerArg.STATE_CB:
+            return state_sender
+        if isinstance(arg, Resident):
+            if arg.value is not _WorkerArg.RESIDENT:
+                resident[arg.key] = arg.value
+            return resident[arg.key]
+        return arg
+
+    while True:
+        try:
+            fn, args, kwargs, evict, transport, limits, state_interval = (
+                _decode(_proc_read(job_fd))
+            )
+        except EOFError:
+            return
+        for key in evict:
+            resident.pop(key, None)
+        state_sender = _StateSender(message_fd, lock, state_interval)
+        result = _proc_call(
+            fn,
+            [worker_arg(arg) for arg in args],
+            {k: worker_arg(v) for k, v in kwargs.items()},
+            limits,
+        )
+        state_sender.flush()
+        if not result.success:
+            for arg in [*args, *kwargs.values()]:
+                if isinstance(arg, Resident):
+                    resident.pop(arg.key, None)
+        _proc_send_result(message_fd, lock, result, transport, limits)
+        if isinstance(result.exception, ProcessTerminatedException):
+            return
+
+
+def _proc_write(fd, lock, obj):
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    with lock:
+        _proc_write_all(fd, _header.pack(len(data)))
+        _proc_write_all(fd, data)
+
+
+def _proc_write_all(fd, data):
+    data = memoryview(data)
+    while data:
+        data = data[os.write(fd, data) :]
+
+
+def _proc_read(fd):
+    size = _header.unpack(_proc_read_exactly(fd, _header.size))[0]
+    return pickle.loads(_proc_read_exactly(fd, size))
+
+
+def _proc_read_exactly(fd, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = os.read(fd, size - len(data))
+        if not chunk:
+            raise EOFError()
+        data += chunk
+    return data
+
+
+_header = struct.Struct("!Q")
+_read_size = 1 << 16
+
+
+class _MessageReader:
+    """Receives messages that a child process writes to a pipe. The read end
+    of the pipe is watched by the event loop, so no threads are blocked while
+    waiting for messages. Reaching the end of the pipe, i.e. termination of
+    the child, closes the reader."""
+
+    def __init__(self, fd: int):
+        self._fd = fd
+        self._loop = asyncio.get_running_loop()
+        self._buffer = bytearray()
+        self._queue = aio.Queue()
+
+        os.set_blocking(fd, False)
+        self._loop.add_reader(fd, self._on_readable)
+
+    @property
+    def is_closed(self) -> bool:
+        return self._queue.is_closed
+
+    async def receive(self) -> Any:
+        try:
+            data = await self._queue.get()
+        except aio.QueueClosedError:
+            raise ProcessTerminatedException("process terminated")
+        return _decode(pickle.loads(data))
+
+    def close(self):
+        """Reads what is left in the pipe and closes it, messages read before
+        closing can still be received"""
+        self._on_readable()
+        if self._fd is not None:
+            self._stop()
+
+    def _on_readable(self):
+        while self._fd is not None:
+            try:
+                data = os.read(self._fd, max(_read_size, self._missing()))
+            except BlockingIOError:
+                break
+            except OSError:
+                data = b""
+            if not data:
+                self._stop()
+                break
+            self._buffer += data
+            self._parse()
+
+    def _missing(self):
+        if len(self._buffer) < _header.size:
+            return 0
+        size = _header.unpack_from(self._buffer)[0]
+        return _header.size + size - len(self._buffer)
+
+    def _parse(self):
+        while len(self._buffer) >= _header.size:
+            end = _header.size + _header.unpack_from(self._buffer)[0]
+            if len(self._buffer) < end:
+                break
+            self._queue.put_nowait(bytes(self._buffer[_header.size : end]))
+            del self._buffer[:end]
+
+    def _stop(self):
+        self._loop.remove_reader(self._fd)
+        os.close(self._fd)
+        self._fd = None
+        self._queue.close()
+
+
+class _MessageWriter:
+    """Sends messages to a child process through a pipe. Writing waits for the
+    pipe to become writable in the event loop, instead of blocking it."""
+
+    def __init__(self, fd: int):
+        self._fd = fd
+        self._loop = asyncio.get_running_loop()
+        self._writable = None
+
+        os.set_blocking(fd, False)
+
+    async def write(self, obj: Any):
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        data = memoryview(_header.pack(len(data)) + data)
+        while data:
+            if self._fd is None:
+                raise ProcessTerminatedException("process terminated")
+            try:
+                data = data[os.write(self._fd, data) :]
+            except BlockingIOError:
+                await self._wait_writable()
+            except OSError:
+                raise ProcessTerminatedException("process terminated")
+
+    def close(self):
+        if self._fd is None:
+            return
+        if self._writable is not None:
+            self._loop.remove_writer(self._fd)
+            self._on_writable()
+        os.close(self._fd)
+        self._fd = None
+
+    async def _wait_writable(self):
+        self._writable = self._loop.create_future()
+        self._loop.add_writer(self._fd, self._on_writable)
+        try:
+            await self._writable
+        finally:
+            self._writable = None
+            if self._fd is not None:
+                self._loop.remove_writer(self._fd)
+
+    def _on_writable(self):
+        if not self._writable.done():
+            self._writable.set_result(None)
+
+
+def _zygote_context(preload):
+    # the forkserver is the zygote, it is started once per process, with the
+    # modules preloaded by the first manager that uses it
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__, *preload, "aimm.server._zygote"])
+    return context
+
+
+def _is_forked(context):
+    return context.get_start_method() == "fork"
+
+
+async def _end_process(process, sigterm_timeout):
     if process.is_alive():
         process.terminate()
-        process.join(sigterm_timeout)
+        await _wait_exit(process, sigterm_timeout)
     if process.is_alive():
         process.kill()
+        await _wait_exit(process, sigterm_timeout)
     process.join()
     process.close()
 
 
-class _PipeSentinel(enum.Enum):
-    CLOSE = enum.auto
+async def _wait_exit(process, timeout):
+    loop = asyncio.get_running_loop()
+    exited = loop.create_future()
+    loop.add_reader(
+        process.sentinel, lambda: exited.done() or exited.set_result(None)
+    )
+    try:
+        await aio.wait_for(exited, timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        loop.remove_reader(process.sentinel)
+
+
+def _kill_worker(worker):
+    if worker.process.is_alive():
+        worker.process.kill()
+    worker.process.join()
+    worker.process.close()
+    worker.writer.close()
+    worker.reader.close()
+
+
+def _unlink_segments(names, transport):
+    for name in names:
+        _unlink_segment(name)
+    if transport is None:
+        return
+    for i in itertools.count():
+        if not _unlink_segment(f"{transport.prefix}{i}"):
+            break
+
 
+class _Transport(NamedTuple):
+    threshold: int
+    prefix: str
 
-def _ext_close_pipe(pipe):
-    _, send_conn = pipe
-    send_conn.send(_PipeSentinel.CLOSE)
-    send_conn.close()
 
+class _SharedPayload(NamedTuple):
+    data: bytes
+    segments: List[Tuple[str, int]]
+
+
+def _encode(obj, transport):
+    if transport is None:
+        return obj
+    segments = []
+
+    def buffer_callback(buffer):
+        raw = buffer.raw()
+        if raw.nbytes < transport.threshold:
+            return True
+        name = f"{transport.prefix}{len(segments)}"
+        shm = multiprocessing.shared_memory.SharedMemory(
+            name=name, create=True, size=raw.nbytes
+        )
+        segments.append((name, raw.nbytes))
+        shm.buf[: raw.nbytes] = raw
+        shm.close()
+        return False
 
-def _ext_closeable_recv(pipe):
-    recv_conn, _ = pipe
-    value = recv_conn.recv()
-    if value == _PipeSentinel.CLOSE:
-        raise ProcessTerminatedException("pipe closed")
-    return value
+    try:
+        data = pickle.dumps(obj, protocol=5, buffer_callback=buffer_callback)
+    except BaseException:
+        for name, _ in segments:
+            _unlink_segment(name)
+        raise
+    return _SharedPayload(data=data, segments=segments)
+
+
+def _decode(value):
+    if not isinstance(value, _SharedPayload):
+        return value
+    buffers = [_attach_segment(name, size) for name, size in value.segments]
+    return pickle.loads(value.data, buffers=buffers)
+
+
+def _attach_segment(name, size):
+    # unpickled objects may keep using the buffer, e.g. numpy arrays created
+    # from it, so the segment stays mapped until the buffer is released.
+    # Objects reading through the pickle buffer reference the view, unlike
+    # ones created directly from a memoryview, which only share its mapping,
+    # so once the view is collected the mapping is no longer exported and
+    # the segment can be closed
+    shm = multiprocessing.shared_memory.SharedMemory(name=name)
+    shm.unlink()
+    view = shm.buf[:size]
+    # segments still used at exit are released with the process
+    weakref.finalize(view, shm.close).atexit = False
+    return pickle.PickleBuffer(view)
+
+
+def _unlink_segment(name):
+    try:
+        shm = multiprocessing.shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    shm.unlink()
+    shm.close()
+    return True
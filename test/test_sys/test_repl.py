@@ -18,7 +18,12 @@ def aimm_port(unused_tcp_port):
     return unused_tcp_port
 
 
-def simple_conf(aimm_port, backend_path):
+@pytest.fixture(params=[False, True], ids=["fork", "zygote"])
+def zygote(request):
+    return request.param
+
+
+def simple_conf(aimm_port, backend_path, zygote=False):
     password_hash = hashlib.sha256()
     password_hash.update("pass".encode("utf-8"))
     return {
@@ -43,6 +48,7 @@ def simple_conf(aimm_port, backend_path):
             "sigterm_timeout": 5,
             "max_children": 5,
             "check_children_period": 3,
+            "zygote": zygote,
         },
         "backend": {
             "module": "aimm.server.backend.sqlite",
@@ -63,8 +69,8 @@ def simple_conf(aimm_port, backend_path):
 
 
 @pytest.fixture
-async def aimm_server_proc(data_path, aimm_port):
-    conf = simple_conf(aimm_port, data_path / "aimm.db")
+async def aimm_server_proc(data_path, aimm_port, zygote):
+    conf = simple_conf(aimm_port, data_path / "aimm.db", zygote)
     aimm_conf_path = data_path / "aimm.yaml"
     json.encode_file(conf, aimm_conf_path)
     proc = await asyncio.create_subprocess_shell(
@@ -99,3 +105,16 @@ async def test_workflow(repl_client):
     await model.fit("a1", "a2", k1="1", k2="2")
     prediction = await model.predict(0.1, a="b", c="d")
     assert prediction == [[0.1], dict(a="b", c="d")]
+
+
+async def test_timeout(repl_client):
+    model = await repl_client.create_instance(
+        "test_sys.plugins.basic.Model1", timeout=5
+    )
+    await model.fit(timeout=5)
+    assert await model.predict(0, timeout=5) == [[0], {}]
+
+    # the plugin sleeps for the number of seconds passed to predict
+    with pytest.raises(Exception):
+        await model.predict(3, timeout=0.5)
+    assert await model.predict(0) == [[0], {}]
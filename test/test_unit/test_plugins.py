@@ -1,4 +1,5 @@
 from aimm import plugins
+import pytest
 
 
 def dummy_state_cb(state):
@@ -98,3 +99,163 @@ def test_model(plugin_teardown):
     plugins.exec_fit(model_type, model, dummy_state_cb, "fit_a1", fit_k1="1")
     assert model.fit_args == ("fit_a1",)
     assert model.fit_kwargs == {"fit_k1": "1"}
+
+
+def test_execution_mode(plugin_teardown):
+    @plugins.data_access("test", execution_mode="thread")
+    def data_access():
+        pass
+
+    @plugins.predict(["test"], execution_mode=plugins.ExecutionMode.INLINE)
+    def predict(instance):
+        pass
+
+    @plugins.model(execution_mode="inline")
+    class Model1(plugins.Model):
+        def fit(self):
+            return self
+
+        def predict(self):
+            pass
+
+        def serialize(self):
+            return bytes()
+
+        @classmethod
+        def deserialize(cls, _):
+            return Model1()
+
+    decorators = plugins.decorators
+    assert decorators.get_data_access("test").execution_mode == (
+        plugins.ExecutionMode.THREAD
+    )
+    assert decorators.get_predict("test").execution_mode == (
+        plugins.ExecutionMode.INLINE
+    )
+    assert decorators.get_fit("test_plugins.Model1").execution_mode == (
+        plugins.ExecutionMode.INLINE
+    )
+    assert decorators.get_instantiate(
+        "test_plugins.Model1"
+    ).execution_mode == (plugins.ExecutionMode.INLINE)
+
+
+def test_max_threads(plugin_teardown):
+    @plugins.data_access("test", max_threads=2)
+    def data_access():
+        pass
+
+    @plugins.model(max_threads=4)
+    class Model1(plugins.Model):
+        def fit(self):
+            return self
+
+        def predict(self):
+            pass
+
+        def serialize(self):
+            return bytes()
+
+        @classmethod
+        def deserialize(cls, _):
+            return Model1()
+
+    decorators = plugins.decorators
+    assert decorators.get_data_access("test").max_threads == 2
+    for get_plugin in [
+        decorators.get_instantiate,
+        decorators.get_fit,
+        decorators.get_predict,
+    ]:
+        assert get_plugin("test_plugins.Model1").max_threads == 4
+
+
+def test_data_access_cache(plugin_teardown):
+    @plugins.data_access("cached")
+    def cached():
+        pass
+
+    @plugins.data_access("uncached", cache=False)
+    def uncached():
+        pass
+
+    @plugins.data_access("ttl", cache_ttl=10)
+    def ttl():
+        pass
+
+    decorators = plugins.decorators
+    assert decorators.get_data_access("cached").cache
+    assert decorators.get_data_access("cached").cache_ttl is None
+    assert not decorators.get_data_access("uncached").cache
+    assert decorators.get_data_access("ttl").cache_ttl == 10
+
+
+def test_data_access_share_calls(plugin_teardown):
+    @plugins.data_access("shared")
+    def shared():
+        pass
+
+    @plugins.data_access("unshared", share_calls=False)
+    def unshared():
+        pass
+
+    assert plugins.decorators.get_data_access("shared").share_calls
+    assert not plugins.decorators.get_data_access("unshared").share_calls
+
+
+def test_updates_instance(plugin_teardown):
+    @plugins.predict(["test"], updates_instance=False)
+    def predict(instance):
+        pass
+
+    @plugins.model(updates_instance=False)
+    class Model1(plugins.Model):
+        def fit(self):
+            return self
+
+        def predict(self):
+            pass
+
+        def serialize(self):
+            return bytes()
+
+        @classmethod
+        def deserialize(cls, _):
+            return Model1()
+
+    decorators = plugins.decorators
+    assert not decorators.get_predict("test").updates_instance
+    assert not decorators.get_predict("test_plugins.Model1").updates_instance
+
+
+def test_batch_predict(plugin_teardown):
+    @plugins.batch_predict(["test"], max_batch_size=10)
+    def predict(instance, predictions):
+        return [(instance, args, kwargs) for args, kwargs in predictions]
+
+    assert plugins.exec_predict("test", "instance", dummy_state_cb, 1) == (
+        "instance",
+        ("instance", (1,), {}),
+    )
+    assert plugins.exec_predict_batch(
+        "test", "instance", [([1], {}), ([], {"a": 2})]
+    ) == ("instance", [("instance", [1], {}), ("instance", [], {"a": 2})])
+
+
+def test_batch_predict_regular(plugin_teardown):
+    @plugins.predict(["test"])
+    def predict(instance, *args, **kwargs):
+        return instance, args, kwargs
+
+    assert plugins.exec_predict_batch(
+        "test", "instance", [([1], {}), ([], {"a": 2})]
+    ) == ("instance", [("instance", (1,), {}), ("instance", (), {"a": 2})])
+
+
+def test_batch_predict_result_count(plugin_teardown):
+    @plugins.batch_predict(["test"], max_batch_size=10)
+    def predict(instance, predictions):
+        return []
+
+    with pytest.raises(ValueError):
+        plugins.exec_predict_batch("test", "instance", [([1], {})])
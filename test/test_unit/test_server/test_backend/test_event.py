@@ -100,3 +100,25 @@ async def test_update_model(string_plugins):
         "instance": base64.b64encode(exp_instance_bytes).decode("utf-8"),
     }
     await backend.async_close()
+
+
+async def test_lazy_models(string_plugins):
+    mock_client = MockClient()
+    backend = await event.create({"model_prefix": ["model"]}, mock_client)
+    assert await backend.get_model_infos() == []
+
+    await backend.create_model("type", "instance")
+    events = await mock_client._register_queue.get()
+    mock_client._query_result = hat.event.common.QueryResult(
+        events=events, more_follows=False
+    )
+
+    assert await backend.get_model_infos() == [
+        common.ModelInfo(model_type="type", instance_id=1, size=8)
+    ]
+    assert await backend.get_instance(1) == "instance"
+    query = await mock_client._query_queue.get()
+    while not mock_client._query_queue.empty():
+        query = mock_client._query_queue.get_nowait()
+    assert query.event_types == [("model", "1")]
+    await backend.async_close()
@@ -1,3 +1,4 @@
+import os
 import pytest
 
 from aimm.server.backend import sqlite
@@ -38,3 +39,55 @@ async def test_models(backend, plugin_teardown):
     model_updated = expected_model._replace(instance="instance2")
     await backend.update_model(model_updated)
     assert await backend.get_models() == [model_updated]
+
+
+async def test_lazy_models(backend, plugin_teardown):
+    @plugins.serialize(["test"])
+    def serialize(instance):
+        return instance.encode("utf-8")
+
+    @plugins.deserialize(["test"])
+    def deserialize(instance_blob):
+        return instance_blob.decode("utf-8")
+
+    await backend.create_model("test", "instance")
+    await backend.create_model("test", "instance2")
+    assert await backend.get_model_infos() == [
+        common.ModelInfo(model_type="test", instance_id=1, size=8),
+        common.ModelInfo(model_type="test", instance_id=2, size=9),
+    ]
+    assert await backend.get_instance(2) == "instance2"
+    with pytest.raises(ValueError):
+        await backend.get_instance(3)
+
+
+async def test_deserialization_workers(tmp_path, plugin_teardown):
+    @plugins.serialize(["test"])
+    def serialize(instance):
+        return instance.encode("utf-8")
+
+    @plugins.deserialize(["test"])
+    def deserialize(instance_blob):
+        return instance_blob.decode("utf-8"), os.getpid()
+
+    backend = await sqlite.create(
+        {"path": str(tmp_path / "backend.db"), "deserialization_workers": 2},
+        None,
+    )
+    for i in range(5):
+        await backend.create_model("test", f"instance{i}")
+
+    parts = [part async for part in backend.iter_models()]
+    assert sorted(model.instance_id for part in parts for model in part) == [
+        1,
+        2,
+        3,
+        4,
+        5,
+    ]
+    models = await backend.get_models()
+    assert [model.instance[0] for model in models] == [
+        f"instance{i}" for i in range(5)
+    ]
+    assert all(model.instance[1] != os.getpid() for model in models)
+    await backend.async_close()
@@ -1,4 +1,5 @@
 from hat import aio
+from hat import util
 import asyncio
 import base64
 import hat.event.common
@@ -32,12 +33,15 @@ class MockEngine(common.Engine):
         if state is None:
             state = {"models": {}, "actions": {}}
         self._state = state
+        self._state_version = 0
+        self._diff_cb = lambda _: None
         self._cb = None
         self._create_instance_cb = create_instance_cb
         self._add_instance_cb = add_instance_cb
         self._update_instance_cb = update_instance_cb
         self._fit_cb = fit_cb
         self._predict_cb = predict_cb
+        self.timeouts = []
 
         self._group = aio.Group()
 
@@ -52,12 +56,39 @@ class MockEngine(common.Engine):
     @state.setter
     def state(self, value):
         self._state = value
+        self._state_version += 1
         self._cb()
+        self._diff_cb(
+            [
+                common.StateChange(self._state_version, key, item_id, item)
+                for key in ("models", "actions")
+                for item_id, item in value[key].items()
+            ]
+        )
+
+    @property
+    def state_version(self):
+        return self._state_version
+
+    def subscribe_to_state_diff(self, cb):
+        self._diff_cb = cb
+
+        def cancel():
+            self._diff_cb = lambda _: None
+
+        return util.RegisterCallbackHandle(cancel=cancel)
 
     def subscribe_to_state_change(self, cb):
         self._cb = cb
 
-    def create_instance(self, *args, **kwargs):
+    def get_actions(self, progress=None, instance_id=None):
+        return self._state["actions"]
+
+    def archive_actions(self, action_ids=None):
+        return {}
+
+    def create_instance(self, *args, _options=None, **kwargs):
+        self.timeouts.append(_options.timeout if _options else None)
         if self._create_instance_cb:
             return aimm.server.engine.create_action(
                 self._group.create_subgroup(),
@@ -78,7 +109,8 @@ class MockEngine(common.Engine):
             return await aio.call(self._update_instance_cb, *args, **kwargs)
         raise NotImplementedError()
 
-    def fit(self, *args, **kwargs):
+    def fit(self, *args, _options=None, **kwargs):
+        self.timeouts.append(_options.timeout if _options else None)
         if self._fit_cb:
             return aimm.server.engine.create_action(
                 self._group.create_subgroup(),
@@ -89,7 +121,8 @@ class MockEngine(common.Engine):
             )
         raise NotImplementedError()
 
-    def predict(self, *args, **kwargs):
+    def predict(self, *args, _options=None, **kwargs):
+        self.timeouts.append(_options.timeout if _options else None)
         if self._predict_cb:
             return aimm.server.engine.create_action(
                 self._group.create_subgroup(),
@@ -484,6 +517,132 @@ async def test_cancel():
     await control.async_close()
 
 
+@pytest.mark.timeout(1)
+async def test_rejected():
+    async def predict_cb(_, *__, **___):
+        raise common.ActionRejectedException()
+
+    client = MockClient()
+    engine = MockEngine(
+        {"models": {12: common.Model("M", "test", 12)}, "actions": {}},
+        predict_cb=predict_cb,
+    )
+    control = await aimm.server.control.event.create(conf(), engine, client)
+
+    await client._register_queue.get()  # state
+
+    req_event = _event(
+        ("predict", "12"), {"args": [], "kwargs": {}, "request_id": "1"}
+    )
+    await control.process_events([req_event])
+
+    events = await client._register_queue.get()
+    assert events[0].payload.data["status"] == "IN_PROGRESS"
+
+    events = await client._register_queue.get()
+    assert len(events) == 1
+    event = events[0]
+    assert event.type == ("action_state",)
+    assert event.payload.data == {
+        "request_id": "1",
+        "status": "REJECTED",
+        "result": None,
+    }
+    await control.async_close()
+
+
+@pytest.mark.timeout(1)
+async def test_expired():
+    async def predict_cb(_, *__, **___):
+        raise common.ActionExpiredException()
+
+    client = MockClient()
+    engine = MockEngine(
+        {"models": {12: common.Model("M", "test", 12)}, "actions": {}},
+        predict_cb=predict_cb,
+    )
+    control = await aimm.server.control.event.create(conf(), engine, client)
+
+    await client._register_queue.get()  # state
+
+    req_event = _event(
+        ("predict", "12"),
+        {"args": [], "kwargs": {}, "request_id": "1", "timeout": 0.5},
+    )
+    await control.process_events([req_event])
+
+    events = await client._register_queue.get()
+    assert events[0].payload.data["status"] == "IN_PROGRESS"
+
+    events = await client._register_queue.get()
+    assert events[0].payload.data == {
+        "request_id": "1",
+        "status": "EXPIRED",
+        "result": None,
+    }
+    assert engine.timeouts == [0.5]
+    await control.async_close()
+
+
+async def test_timeout_kwarg():
+    predict_kwargs = []
+
+    async def predict_cb(_, *__, **kwargs):
+        predict_kwargs.append(kwargs)
+
+    client = MockClient()
+    engine = MockEngine(
+        {"models": {12: common.Model("M", "test", 12)}, "actions": {}},
+        predict_cb=predict_cb,
+    )
+    control = await aimm.server.control.event.create(conf(), engine, client)
+
+    await client._register_queue.get()  # state
+
+    # keyword arguments of plugins do not collide with the timeout
+    req_event = _event(
+        ("predict", "12"),
+        {"args": [], "kwargs": {"timeout": 3}, "request_id": "1"},
+    )
+    await control.process_events([req_event])
+
+    events = await client._register_queue.get()
+    assert events[0].payload.data["status"] == "IN_PROGRESS"
+    events = await client._register_queue.get()
+    assert events[0].payload.data["status"] == "DONE"
+    assert predict_kwargs == [{"timeout": 3}]
+    assert engine.timeouts == [None]
+    await control.async_close()
+
+
+async def test_predict_not_loaded():
+    predict_calls = []
+
+    async def predict_cb(model_id, *args, **kwargs):
+        predict_calls.append(model_id)
+        return "prediction"
+
+    client = MockClient()
+    engine = MockEngine(predict_cb=predict_cb)
+    control = await aimm.server.control.event.create(conf(), engine, client)
+
+    await client._register_queue.get()  # state
+
+    # instances that are not in the state yet are resolved by the engine
+    req_event = _event(
+        ("predict", "12"),
+        {"args": [], "kwargs": {}, "request_id": "1"},
+    )
+    await control.process_events([req_event])
+
+    events = await client._register_queue.get()
+    assert events[0].payload.data["status"] == "IN_PROGRESS"
+    events = await client._register_queue.get()
+    assert events[0].payload.data["status"] == "DONE"
+    assert predict_calls == [12]
+    await control.async_close()
+
+
 def _register_event(event_type, payload, source_timestamp=None):
     return hat.event.common.RegisterEvent(
         type=event_type,
@@ -24,12 +24,15 @@ class MockEngine(common.Engine):
         if state is None:
             state = {"models": {}, "actions": {}}
         self._state = state
+        self._state_version = 0
+        self._diff_cb = lambda _: None
         self._cb = lambda: None
         self._create_instance_cb = create_instance_cb
         self._add_instance_cb = add_instance_cb
         self._update_instance_cb = update_instance_cb
         self._fit_cb = fit_cb
         self._predict_cb = predict_cb
+        self.timeouts = []
         self._group = aio.Group()
 
     @property
@@ -43,7 +46,27 @@ class MockEngine(common.Engine):
     @state.setter
     def state(self, value):
         self._state = value
+        self._state_version += 1
         self._cb()
+        self._diff_cb(
+            [
+                common.StateChange(self._state_version, key, item_id, item)
+                for key in ("models", "actions")
+                for item_id, item in value[key].items()
+            ]
+        )
+
+    @property
+    def state_version(self):
+        return self._state_version
+
+    def subscribe_to_state_diff(self, cb):
+        self._diff_cb = cb
+
+        def cancel():
+            self._diff_cb = lambda _: None
+
+        return util.RegisterCallbackHandle(cancel=cancel)
 
     def subscribe_to_state_change(self, cb):
         self._cb = cb
@@ -53,7 +76,14 @@ class MockEngine(common.Engine):
 
         return util.RegisterCallbackHandle(cancel=cancel)
 
-    def create_instance(self, *args, **kwargs):
+    def get_actions(self, progress=None, instance_id=None):
+        return self._state["actions"]
+
+    def archive_actions(self, action_ids=None):
+        return {}
+
+    def create_instance(self, *args, _options=None, **kwargs):
+        self.timeouts.append(_options.timeout if _options else None)
         if self._create_instance_cb:
             return aimm.server.engine._Action(
                 self._group.create_subgroup(),
@@ -74,7 +104,8 @@ class MockEngine(common.Engine):
             return await aio.call(self._update_instance_cb, *args, **kwargs)
         raise NotImplementedError()
 
-    def fit(self, *args, **kwargs):
+    def fit(self, *args, _options=None, **kwargs):
+        self.timeouts.append(_options.timeout if _options else None)
         if self._fit_cb:
             return aimm.server.engine._Action(
                 self._group.create_subgroup(),
@@ -85,7 +116,8 @@ class MockEngine(common.Engine):
             )
         raise NotImplementedError()
 
-    def predict(self, *args, **kwargs):
+    def predict(self, *args, _options=None, **kwargs):
+        self.timeouts.append(_options.timeout if _options else None)
         if self._predict_cb:
             return aimm.server.engine._Action(
                 self._group.create_subgroup(),
@@ -138,6 +170,26 @@ async def _connect(username, password, port, monkeypatch):
     return client
 
 
+async def test_state(conf, juggler_port, monkeypatch):
+    engine = MockEngine()
+    control = await aimm.server.control.repl.create(conf, engine, None)
+    client = await _connect("user", "password", juggler_port, monkeypatch)
+    await asyncio.sleep(0.1)
+
+    actions = {1: {"progress": "executing"}}
+    engine.state = {"models": {}, "actions": actions}
+    await asyncio.sleep(0.3)
+    assert client.state == {"models": {}, "actions": actions}
+
+    actions = {1: {"progress": "complete"}, 2: {"progress": "executing"}}
+    engine.state = {"models": {}, "actions": actions}
+    await asyncio.sleep(0.3)
+    assert client.state == {"models": {}, "actions": actions}
+
+    await client.async_close()
+    await control.async_close()
+
+
 @pytest.fixture
 def plugins_model1(plugin_teardown):
     @plugins.serialize(["Model1"])
@@ -1,8 +1,16 @@
 from hat import aio
+from hat import util
+import asyncio
+import os
+import pickle
 import pytest
+import threading
+import threadpoolctl
+import time
 
 from aimm.server import engine
 from aimm.server import common
+from aimm.server import mprocess
 from aimm import plugins
 
 
@@ -43,13 +51,14 @@ class MockBackend(common.Backend):
         self._queue.put_nowait(("update", model))
 
 
-async def create_engine(backend=None):
+async def create_engine(backend=None, **conf):
     backend = backend or MockBackend()
     return await engine.create(
         {
             "sigterm_timeout": 1,
             "max_children": 1,
             "check_children_period": 0.2,
+            **conf,
         },
         backend,
     )
@@ -67,10 +76,61 @@ async def test_models_in_backend():
         2: common.Model(instance=None, model_type="test", instance_id=2),
     }
     eng = await create_engine(MockBackend(models.values()))
+    loaded = asyncio.Event()
+    eng.subscribe_to_state_change(loaded.set)
+    await loaded.wait()
     assert eng.state == {"actions": {}, "models": models}
     await eng.async_close()
 
 
+async def test_models_loading(plugin_teardown):
+    class PartsBackend(MockBackend):
+        def __init__(self):
+            super().__init__()
+            self.parts = aio.Queue()
+
+        async def iter_models(self):
+            while True:
+                part = await self.parts.get()
+                if part is None:
+                    return
+                yield part
+
+    @plugins.predict(["test"], execution_mode="inline", updates_instance=False)
+    def predict(instance):
+        return instance
+
+    def model(instance_id):
+        return common.Model(
+            instance=instance_id, model_type="test", instance_id=instance_id
+        )
+
+    backend = PartsBackend()
+    eng = await create_engine(backend)
+    changes = aio.Queue()
+    eng.subscribe_to_state_diff(changes.put_nowait)
+    assert eng.state == {"actions": {}, "models": {}}
+
+    backend.parts.put_nowait([model(1), model(2)])
+    assert [c.item_id for c in await changes.get()] == [1, 2]
+    assert await eng.predict(1).wait_result() == 1
+
+    # actions of models that are not loaded wait for the loading to finish
+    action = eng.predict(3)
+    missing_action = eng.predict(4)
+    await asyncio.sleep(0.01)
+    backend.parts.put_nowait([model(3)])
+    backend.parts.put_nowait(None)
+    assert await action.wait_result() == 3
+    assert list(eng.state["models"]) == [1, 2, 3]
+
+    # models missing once all models are loaded fail their actions
+    with pytest.raises(ValueError):
+        await missing_action.wait_result()
+
+    await eng.async_close()
+
+
 @pytest.mark.timeout(2)
 async def test_create_instance(plugin_teardown):
     backend = MockBackend()
@@ -141,9 +201,10 @@ async def test_add_instance(plugin_teardown):
 
 
 @pytest.mark.timeout(2)
-async def test_fit(plugin_teardown):
+@pytest.mark.parametrize("worker_pool", [False, True])
+async def test_fit(plugin_teardown, worker_pool):
     backend = MockBackend()
-    eng = await create_engine(backend)
+    eng = await create_engine(backend, worker_pool=worker_pool)
 
     queue = aio.Queue()
 
@@ -180,9 +241,17 @@ async def test_fit(plugin_teardown):
 
 
 # @pytest.mark.timeout(2)
-async def test_predict(plugin_teardown):
+@pytest.mark.parametrize(
+    "worker_pool, max_resident_instances",
+    [(False, 0), (True, 0), (True, 1)],
+)
+async def test_predict(plugin_teardown, worker_pool, max_resident_instances):
     backend = MockBackend()
-    eng = await create_engine(backend)
+    eng = await create_engine(
+        backend,
+        worker_pool=worker_pool,
+        max_resident_instances=max_resident_instances,
+    )
 
     queue = aio.Queue()
 
@@ -218,3 +287,1132 @@ async def test_predict(plugin_teardown):
     assert predict_backend_update == ("update", expected_model)
 
     await eng.async_close()
+
+
+@pytest.mark.timeout(2)
+@pytest.mark.parametrize("worker_pool", [False, True])
+async def test_predict_unchanged_instance(plugin_teardown, worker_pool):
+    backend = MockBackend()
+    eng = await create_engine(backend, worker_pool=worker_pool)
+
+    @plugins.predict(["test"], updates_instance=False)
+    def predict(instance, x):
+        return instance + x
+
+    model = await eng.add_instance("test", 1)
+    await backend.queue.get()
+
+    actions = [eng.predict(model.instance_id, x) for x in (1, 2)]
+    assert [await action.wait_result() for action in actions] == [2, 3]
+    assert eng.state["models"][model.instance_id] is model
+    assert backend.queue.empty()
+    assert [a["progress"] for a in eng.state["actions"].values()] == [
+        "complete",
+        "complete",
+    ]
+
+    await eng.async_close()
+
+
+@pytest.mark.timeout(2)
+async def test_predict_during_fit(plugin_teardown):
+    eng = await create_engine()
+
+    @plugins.fit(["test"], execution_mode="thread")
+    def fit(instance):
+        time.sleep(0.3)
+        instance.append("fitted")
+        return instance
+
+    @plugins.predict(["test"], execution_mode="thread", updates_instance=False)
+    def predict(instance):
+        return list(instance)
+
+    model = await eng.add_instance("test", [])
+    fit_future = asyncio.ensure_future(
+        eng.fit(model.instance_id).wait_result()
+    )
+    await asyncio.sleep(0.1)
+    assert await eng.predict(model.instance_id).wait_result() == []
+    assert not fit_future.done()
+
+    new_model = await fit_future
+    assert new_model.instance == ["fitted"]
+    assert model.instance == []
+    assert await eng.predict(model.instance_id).wait_result() == ["fitted"]
+
+    await eng.async_close()
+
+
+@pytest.mark.timeout(2)
+async def test_predict_resident(plugin_teardown):
+    backend = MockBackend()
+    eng = await create_engine(
+        backend, worker_pool=True, max_resident_instances=1
+    )
+
+    @plugins.predict(["test"])
+    def predict(instance, x):
+        return instance + x
+
+    model = await eng.add_instance("test", 1)
+    assert await eng.predict(model.instance_id, 1).wait_result() == 2
+    assert await eng.predict(model.instance_id, 2).wait_result() == 3
+
+    await eng.update_instance(model._replace(instance=10))
+    assert await eng.predict(model.instance_id, 1).wait_result() == 11
+
+    await eng.async_close()
+
+
+@pytest.mark.timeout(3)
+async def test_action_classes(plugin_teardown):
+    eng = await create_engine(
+        max_children=2,
+        action_classes={"predict": {"reserved_children": 1, "priority": 1}},
+    )
+
+    @plugins.instantiate("test")
+    def instantiate(duration):
+        time.sleep(duration)
+        return "instance"
+
+    @plugins.predict(["test"])
+    def predict(instance, *args, **kwargs):
+        return instance, args, kwargs
+
+    model = await eng.add_instance("test", "instance")
+    creating = [
+        asyncio.ensure_future(eng.create_instance("test", 0.5).wait_result())
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0.1)
+
+    action = eng.predict(model.instance_id, 1)
+    assert await action.wait_result() == ("instance", (1,), {})
+    assert not any(future.done() for future in creating)
+
+    action = eng.predict(
+        model.instance_id,
+        2,
+        _options=common.ActionOptions(action_class="background"),
+    )
+    background = asyncio.ensure_future(action.wait_result())
+    await asyncio.sleep(0.2)
+    assert not background.done()
+
+    await asyncio.wait(creating)
+    assert await background == ("instance", (2,), {})
+
+    # keyword arguments of plugins do not collide with the options
+    action = eng.predict(
+        model.instance_id, 3, action_class="background", timeout=5
+    )
+    assert await action.wait_result() == (
+        "instance",
+        (3,),
+        {"action_class": "background", "timeout": 5},
+    )
+    await eng.async_close()
+
+
+@pytest.mark.timeout(2)
+@pytest.mark.parametrize("execution_mode", ["process", "thread", "inline"])
+async def test_execution_mode(plugin_teardown, execution_mode):
+    eng = await create_engine()
+
+    @plugins.data_access(
+        "data", state_cb_arg_name="state_cb", execution_mode=execution_mode
+    )
+    def data_access(state_cb):
+        state_cb("accessing")
+        return os.getpid()
+
+    @plugins.predict(
+        ["test"], state_cb_arg_name="state_cb", execution_mode=execution_mode
+    )
+    def predict(instance, data_pid, state_cb):
+        state_cb("predicting")
+        return data_pid, os.getpid()
+
+    model = await eng.add_instance("test", "instance")
+    action = eng.predict(model.instance_id, common.DataAccess("data", [], {}))
+    data_pid, predict_pid = await action.wait_result()
+    if execution_mode == "process":
+        assert data_pid != os.getpid()
+        assert predict_pid != os.getpid()
+    else:
+        assert data_pid == os.getpid()
+        assert predict_pid == os.getpid()
+
+    state = eng.state["actions"][1]
+    assert state["data_access"] == {0: "accessing"}
+    assert state["action"] == "predicting"
+    assert state["progress"] == "complete"
+
+    await eng.async_close()
+
+
+@pytest.mark.timeout(2)
+async def test_thread_cancel(plugin_teardown):
+    eng = await create_engine()
+
+    @plugins.instantiate("test", execution_mode="thread")
+    def instantiate():
+        time.sleep(0.2)
+        return "instance"
+
+    action = eng.create_instance("test")
+    await asyncio.sleep(0.05)
+    await action.async_close()
+    with pytest.raises(asyncio.CancelledError):
+        await action.wait_result()
+    assert eng.state["models"] == {}
+
+    await eng.async_close()
+
+
+@pytest.mark.timeout(3)
+@pytest.mark.parametrize("execution_mode", ["process", "inline"])
+async def test_predict_batch(plugin_teardown, execution_mode):
+    backend = MockBackend()
+    eng = await create_engine(backend)
+
+    @plugins.batch_predict(
+        ["test"],
+        max_batch_size=3,
+        max_batch_delay=0.1,
+        state_cb_arg_name="state_cb",
+        execution_mode=execution_mode,
+    )
+    def predict(instance, predictions, state_cb):
+        state_cb(len(predictions))
+        instance.append(len(predictions))
+        return [(args[0], len(predictions)) for args, _ in predictions]
+
+    model = await eng.add_instance("test", [])
+    await backend.queue.get()
+
+    actions = [eng.predict(model.instance_id, i) for i in range(5)]
+    results = [await action.wait_result() for action in actions]
+    assert results == [
+        (0, 3),
+        (1, 3),
+        (2, 3),
+        (3, 2),
+        (4, 2),
+    ]
+
+    # one update per batch
+    await backend.queue.get()
+    assert await backend.queue.get() == (
+        "update",
+        model._replace(instance=[3, 2]),
+    )
+    assert backend.queue.empty()
+
+    actions_state = eng.state["actions"]
+    assert [actions_state[i + 1]["action"] for i in range(5)] == [
+        3,
+        3,
+        3,
+        2,
+        2,
+    ]
+    assert all(
+        actions_state[i + 1]["progress"] == "complete" for i in range(5)
+    )
+
+    await eng.async_close()
+
+
+@pytest.mark.timeout(3)
+async def test_predict_batch_cancel(plugin_teardown):
+    eng = await create_engine()
+
+    @plugins.batch_predict(["test"], max_batch_size=3, max_batch_delay=0.1)
+    def predict(instance, predictions):
+        return [len(predictions)] * len(predictions)
+
+    model = await eng.add_instance("test", "instance")
+    actions = [eng.predict(model.instance_id) for i in range(3)]
+    await asyncio.sleep(0)
+    await actions[0].async_close()
+    await asyncio.sleep(0.01)
+    assert [await action.wait_result() for action in actions[1:]] == [2, 2]
+
+    await eng.async_close()
+
+
+@pytest.mark.timeout(3)
+async def test_predict_batch_expired(plugin_teardown):
+    eng = await create_engine()
+
+    @plugins.batch_predict(["test"], max_batch_size=2, max_batch_delay=0.1)
+    def predict(instance, predictions):
+        time.sleep(0.3)
+        return [len(predictions)] * len(predictions)
+
+    model = await eng.add_instance("test", "instance")
+    expiring = eng.predict(
+        model.instance_id, _options=common.ActionOptions(timeout=0.2)
+    )
+    action = eng.predict(model.instance_id)
+    with pytest.raises(common.ActionExpiredException):
+        await expiring.wait_result()
+    assert await action.wait_result() == 2
+
+    # the rest of the batch does not overwrite the expired action's state
+    assert set(eng.get_actions(progress="expired")) == {1}
+    assert set(eng.get_actions(progress="complete")) == {2}
+
+    await eng.async_close()
+
+
+@pytest.mark.timeout(2)
+async def test_action_history(plugin_teardown):
+    eng = await create_engine(action_history={"max_count": 2})
+
+    @plugins.predict(["test"], execution_mode="inline")
+    def predict(instance, x):
+        if x is None:
+            raise Exception("failed")
+        return x
+
+    @plugins.predict(["test2"], execution_mode="thread")
+    def predict2(instance):
+        time.sleep(0.2)
+
+    model = await eng.add_instance("test", None)
+    model2 = await eng.add_instance("test2", None)
+
+    assert await eng.predict(model.instance_id, 1).wait_result() == 1
+    with pytest.raises(Exception, match="failed"):
+        await eng.predict(model.instance_id, None).wait_result()
+    action = eng.predict(model2.instance_id)
+    await asyncio.sleep(0.05)
+    assert list(eng.state["actions"]) == [1, 2, 3]
+    assert list(eng.get_actions(progress="executing")) == [3]
+    assert list(eng.get_actions(instance_id=model.instance_id)) == [1, 2]
+    assert eng.get_actions(progress="failed") == {2: eng.state["actions"][2]}
+
+    await action.async_close()
+    assert list(eng.state["actions"]) == [2, 3]
+    assert eng.state["actions"][3]["progress"] == "cancelled"
+    assert eng.get_actions(instance_id=model.instance_id) == {
+        2: eng.state["actions"][2]
+    }
+
+    action = eng.predict(model.instance_id, 4)
+    assert list(eng.archive_actions()) == [2, 3]
+    assert eng.archive_actions() == {}
+    await action.wait_result()
+    assert list(eng.state["actions"]) == [4]
+    archived = eng.archive_actions([4])
+    assert archived[4]["progress"] == "complete"
+    assert eng.state["actions"] == {}
+    assert eng.get_actions() == {}
+
+    await eng.async_close()
+
+
+@pytest.mark.timeout(10)
+async def test_action_history_unbounded(plugin_teardown):
+    eng = await create_engine()
+
+    @plugins.predict(["test"], execution_mode="inline")
+    def predict(instance):
+        pass
+
+    # finished actions are kept until they are archived by default
+    model = await eng.add_instance("test", None)
+    actions = [eng.predict(model.instance_id) for _ in range(1001)]
+    for action in actions:
+        await action.wait_result()
+    assert len(eng.get_actions(progress="complete")) == 1001
+    assert len(eng.archive_actions()) == 1001
+
+    await eng.async_close()
+
+
+@pytest.mark.timeout(2)
+async def test_action_history_max_age(plugin_teardown):
+    eng = await create_engine(action_history={"max_age": 0.1})
+
+    @plugins.predict(["test"], execution_mode="inline")
+    def predict(instance):
+        pass
+
+    model = await eng.add_instance("test", None)
+    await eng.predict(model.instance_id).wait_result()
+    assert list(eng.state["actions"]) == [1]
+    await asyncio.sleep(0.05)
+    await eng.predict(model.instance_id).wait_result()
+    await asyncio.sleep(0.07)
+    assert list(eng.state["actions"]) == [2]
+    await asyncio.sleep(0.05)
+    assert eng.state["actions"] == {}
+
+    await eng.async_close()
+
+
+@pytest.mark.timeout(2)
+async def test_action_history_prune_timer(plugin_teardown, monkeypatch):
+    eng = await create_engine(action_history={"max_age": 0.1})
+    loop = asyncio.get_running_loop()
+    timers = []
+    pending_counts = []
+
+    def call_later(delay, callback, *args, **kwargs):
+        handle = loop_call_later(delay, callback, *args, **kwargs)
+        if callback == eng._prune_actions:
+            pending_counts.append(
+                sum(
+                    1
+                    for timer in timers
+                    if not timer.cancelled() and timer.when() > loop.time()
+                )
+            )
+            timers.append(handle)
+        return handle
+
+    loop_call_later = loop.call_later
+    monkeypatch.setattr(loop, "call_later", call_later)
+
+    @plugins.predict(["test"], execution_mode="inline")
+    def predict(instance):
+        pass
+
+    # finished actions share a single pending timer
+    model = await eng.add_instance("test", None)
+    actions = [eng.predict(model.instance_id) for _ in range(10)]
+    for action in actions:
+        await action.wait_result()
+    assert len(timers) == 1
+
+    await asyncio.sleep(0.15)
+    assert eng.state["actions"] == {}
+    assert set(pending_counts) == {0}
+
+    # pending timer is cancelled once the engine is closed
+    await eng.predict(model.instance_id).wait_result()
+    await eng.async_close()
+    assert timers[-1].cancelled()
+
+
+@pytest.mark.timeout(2)
+async def test_state_diff(plugin_teardown):
+    eng = await create_engine()
+
+    @plugins.predict(["test"], execution_mode="inline")
+    def predict(instance):
+        return instance
+
+    state = eng.state
+    version = eng.state_version
+    changes = []
+    eng.subscribe_to_state_diff(changes.extend)
+
+    model = await eng.add_instance("test", "instance")
+    assert changes == [
+        common.StateChange(version + 1, "models", model.instance_id, model)
+    ]
+    await eng.predict(model.instance_id).wait_result()
+    archived = eng.archive_actions()
+    assert list(archived) == [1]
+
+    versions = [change.version for change in changes]
+    assert versions == sorted(versions)
+    assert versions[-1] == eng.state_version
+    assert changes[-1] == common.StateChange(
+        eng.state_version, "actions", 1, None, True
+    )
+    assert [c.value for c in changes if c.key == "actions"][-2] == (
+        archived[1]
+    )
+
+    for change in changes:
+        items = dict(state[change.key])
+        if change.removed:
+            del items[change.item_id]
+        else:
+            items[change.item_id] = change.value
+        state = dict(state, **{change.key: items})
+    assert state == eng.state
+
+    await eng.async_close()
+
+
+@pytest.mark.timeout(2)
+@pytest.mark.parametrize("delay", [0, 0.05])
+async def test_state_notification_delay(plugin_teardown, delay):
+    eng = await create_engine(state_notification_delay=delay)
+
+    @plugins.predict(["test"], execution_mode="inline", updates_instance=False)
+    def predict(instance, x):
+        return x
+
+    notified_states = []
+    notified_changes = []
+    eng.subscribe_to_state_change(lambda: notified_states.append(eng.state))
+    eng.subscribe_to_state_diff(notified_changes.append)
+
+    model = await eng.add_instance("test", None)
+    assert notified_states == []
+    actions = [eng.predict(model.instance_id, x) for x in range(3)]
+    assert [await action.wait_result() for action in actions] == [0, 1, 2]
+    await asyncio.sleep(delay + 0.01)
+
+    assert len(notified_states) == len(notified_changes) < 5
+    assert notified_states[-1] is eng.state
+    changes = [change for changes in notified_changes for change in changes]
+    assert [(c.key, c.item_id) for c in changes] == [
+        ("models", model.instance_id),
+        ("actions", 1),
+        ("actions", 2),
+        ("actions", 3),
+    ]
+    assert [c.value for c in changes[1:]] == list(
+        eng.state["actions"].values()
+    )
+    assert changes[-1].version == eng.state_version
+
+    await eng.async_close()
+
+
+@pytest.mark.timeout(2)
+async def test_data_access_cache(plugin_teardown):
+    eng = await create_engine(data_access_cache={"max_size": 1000})
+    calls = []
+
+    @plugins.data_access("cached", execution_mode="inline")
+    def cached(x):
+        calls.append(("cached", x))
+        return bytes(x * 300)
+
+    @plugins.data_access("short", execution_mode="inline", cache_ttl=0.1)
+    def short():
+        calls.append(("short",))
+        return "short"
+
+    @plugins.data_access("uncached", execution_mode="inline", cache=False)
+    def uncached():
+        calls.append(("uncached",))
+        return "uncached"
+
+    @plugins.predict(["test"], execution_mode="inline", updates_instance=False)
+    def predict(instance, *args, **kwargs):
+        return args, kwargs
+
+    def data_access(name, *args):
+        return common.DataAccess(name=name, args=args, kwargs={})
+
+    model = await eng.add_instance("test", None)
+
+    async def predict_data(*args, **kwargs):
+        action = eng.predict(model.instance_id, *args, **kwargs)
+        result = await action.wait_result()
+        action_id = max(eng.state["actions"])
+        return result, eng.state["actions"][action_id]
+
+    result, action_state = await predict_data(
+        data_access("cached", 1), data=data_access("uncached")
+    )
+    assert result == ((bytes(300),), {"data": "uncached"})
+    assert action_state["data_access_cache"] == {0: "miss"}
+
+    result, action_state = await predict_data(
+        data_access("cached", 1), data=data_access("uncached")
+    )
+    assert result == ((bytes(300),), {"data": "uncached"})
+    assert action_state["data_access_cache"] == {0: "hit"}
+    assert sorted(calls) == [("cached", 1), ("uncached",), ("uncached",)]
+    calls.clear()
+
+    # least recently used data is evicted
+    await predict_data(data_access("cached", 3))
+    _, action_state = await predict_data(data_access("cached", 3))
+    assert action_state["data_access_cache"] == {0: "hit"}
+    _, action_state = await predict_data(data_access("cached", 1))
+    assert action_state["data_access_cache"] == {0: "miss"}
+    assert calls == [("cached", 3), ("cached", 1)]
+    calls.clear()
+
+    await predict_data(data_access("short"))
+    await predict_data(data_access("short"))
+    await asyncio.sleep(0.1)
+    await predict_data(data_access("short"))
+    assert calls == [("short",), ("short",)]
+
+    threads = []
+
+    class Data:
+        def __reduce__(self):
+            threads.append(threading.current_thread())
+            return bytes, (b"data",)
+
+    @plugins.data_access("measured", execution_mode="inline")
+    def measured():
+        return Data()
+
+    # data is measured outside of the event loop
+    _, action_state = await predict_data(data_access("measured"))
+    assert action_state["data_access_cache"] == {0: "miss"}
+    _, action_state = await predict_data(data_access("measured"))
+    assert action_state["data_access_cache"] == {0: "hit"}
+    assert len(threads) == 1
+    assert threading.main_thread() not in threads
+
+    await eng.async_close()
+
+
+@pytest.mark.timeout(2)
+async def test_data_access_shared(plugin_teardown):
+    eng = await create_engine()
+    calls = []
+
+    @plugins.data_access(
+        "data", execution_mode="thread", state_cb_arg_name="state_cb"
+    )
+    def data(x, state_cb):
+        calls.append(x)
+        state_cb("accessing")
+        time.sleep(0.2)
+        return x
+
+    @plugins.predict(["test"], execution_mode="inline", updates_instance=False)
+    def predict(instance, x):
+        return x
+
+    model = await eng.add_instance("test", None)
+
+    def predict_data(x):
+        return eng.predict(
+            model.instance_id, common.DataAccess("data", [x], {})
+        )
+
+    actions = [predict_data(1) for _ in range(3)] + [predict_data(2)]
+    await asyncio.sleep(0.1)
+    await actions[0].async_close()
+    assert [await action.wait_result() for action in actions[1:]] == [
+        1,
+        1,
+        2,
+    ]
+    assert calls == [1, 2]
+    assert all(
+        action["data_access"] == {0: "accessing"}
+        for action in eng.state["actions"].values()
+    )
+
+    # call is cancelled once no action waits for it
+    actions = [predict_data(1) for _ in range(2)]
+    await asyncio.sleep(0.1)
+    for action in actions:
+        await action.async_close()
+    assert await predict_data(1).wait_result() == 1
+    assert calls == [1, 2, 1, 1]
+
+    await eng.async_close()
+
+
+@pytest.mark.parametrize("cache", [False, True])
+@pytest.mark.parametrize("share_calls", [False, True])
+async def test_data_access_share_calls(plugin_teardown, cache, share_calls):
+    eng = await create_engine()
+    calls = []
+
+    @plugins.data_access(
+        "data", execution_mode="thread", cache=cache, share_calls=share_calls
+    )
+    def data(x):
+        calls.append(x)
+        time.sleep(0.2)
+        return x
+
+    @plugins.predict(["test"], execution_mode="inline", updates_instance=False)
+    def predict(instance, x):
+        return x
+
+    model = await eng.add_instance("test", None)
+    actions = [
+        eng.predict(model.instance_id, common.DataAccess("data", [1], {}))
+        for _ in range(2)
+    ]
+    assert [await action.wait_result() for action in actions] == [1, 1]
+    assert calls == ([1] if share_calls else [1, 1])
+
+    await eng.async_close()
+
+
+@pytest.mark.parametrize("worker_pool", [False, True])
+@pytest.mark.parametrize("child_state_interval", [None, 10])
+async def test_fused_data_access(
+    plugin_teardown, worker_pool, child_state_interval
+):
+    eng = await create_engine(
+        worker_pool=worker_pool,
+        fused_data_access=True,
+        child_state_interval=child_state_interval,
+    )
+
+    # with a state interval, only the latest state of each data access and
+    # of the action itself is sent
+    @plugins.data_access("data", state_cb_arg_name="state_cb")
+    def data(x, state_cb):
+        state_cb("connecting")
+        state_cb("accessing")
+        return x, os.getpid()
+
+    @plugins.instantiate("test", state_cb_arg_name="state_cb")
+    def instantiate(data, y, state_cb):
+        state_cb("instantiating")
+        return data, y, os.getpid()
+
+    action = eng.create_instance(
+        "test",
+        common.DataAccess("data", [1], {}),
+        y=common.DataAccess("data", [2], {}),
+    )
+    model = await action.wait_result()
+    (x, x_pid), (y, y_pid), pid = model.instance
+    assert (x, y) == (1, 2)
+    assert x_pid == y_pid == pid != os.getpid()
+    (action_state,) = eng.state["actions"].values()
+    assert action_state["progress"] == "complete"
+    assert action_state["data_access"] == {0: "accessing", "y": "accessing"}
+    assert action_state["action"] == "instantiating"
+
+    await eng.async_close()
+
+
+async def test_lazy_loading(plugin_teardown):
+    class LazyBackend(MockBackend):
+        loads = []
+
+        async def get_models(self):
+            raise Exception("instances are not loaded at start")
+
+        async def get_model_infos(self):
+            return [
+                common.ModelInfo(
+                    model_type=model.model_type,
+                    instance_id=model.instance_id,
+                    size=len(model.instance),
+                )
+                for model in self._models
+            ]
+
+        async def get_instance(self, instance_id):
+            self.loads.append(instance_id)
+            await asyncio.sleep(0.01)
+            (model,) = [
+                m for m in self._models if m.instance_id == instance_id
+            ]
+            return model.instance
+
+    backend = LazyBackend(
+        [
+            common.Model(
+                instance=bytes([i]) * 300, model_type="test", instance_id=i
+            )
+            for i in range(1, 4)
+        ]
+    )
+    eng = await create_engine(backend, lazy_loading={"max_size": 700})
+    assert eng.state["models"] == {
+        i: common.ModelInfo(model_type="test", instance_id=i, size=300)
+        for i in range(1, 4)
+    }
+
+    @plugins.predict(["test"], execution_mode="inline", updates_instance=False)
+    def predict(instance):
+        return instance[0]
+
+    async def predict_all(*instance_ids):
+        actions = [eng.predict(i) for i in instance_ids]
+        return [await action.wait_result() for action in actions]
+
+    # concurrent predictions share a load
+    assert await predict_all(1, 1, 2) == [1, 1, 2]
+    assert backend.loads == [1, 2]
+    assert await predict_all(1, 2) == [1, 2]
+    assert backend.loads == [1, 2]
+
+    # least recently used instance is dropped
+    assert await predict_all(3, 1) == [3, 1]
+    assert backend.loads == [1, 2, 3]
+    assert await predict_all(2) == [2]
+    assert backend.loads == [1, 2, 3, 2]
+
+    # updated instances are kept without loading them
+    await eng.update_instance(
+        common.Model(
+            instance=bytes([4]) * 10, model_type="test", instance_id=3
+        )
+    )
+    assert eng.state["models"][3] == common.ModelInfo(
+        model_type="test", instance_id=3, size=len(pickle.dumps(b"0" * 10, 5))
+    )
+    assert await predict_all(3) == [4]
+    assert backend.loads == [1, 2, 3, 2]
+
+    await eng.async_close()
+
+
+async def test_lazy_loading_size(plugin_teardown):
+    threads = []
+
+    class Instance:
+        def __reduce__(self):
+            threads.append(threading.current_thread())
+            return bytes, (b"instance",)
+
+    # backend does not know the sizes of its instances
+    backend = MockBackend(
+        [common.Model(instance=Instance(), model_type="test", instance_id=1)]
+    )
+    eng = await create_engine(backend, lazy_loading={})
+    assert eng.state["models"][1].size is None
+
+    @plugins.predict(["test"], execution_mode="inline", updates_instance=False)
+    def predict(instance):
+        return type(instance).__name__
+
+    # instances are measured outside of the event loop
+    assert await eng.predict(1).wait_result() == "Instance"
+    assert threads
+    model = await eng.add_instance("test", Instance())
+    assert eng.state["models"][model.instance_id].size > 0
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
+
+    await eng.async_close()
+
+
+@pytest.mark.parametrize("predict_policy", ["reject_new", "drop_oldest"])
+async def test_admission(plugin_teardown, predict_policy):
+    eng = await create_engine(
+        admission={
+            "max_pending": 3,
+            "max_pending_per_instance": 2,
+            "predict_policy": predict_policy,
+        }
+    )
+    events = {key: threading.Event() for key in range(1, 7)}
+
+    @plugins.predict(["test"], execution_mode="inline", updates_instance=False)
+    def predict(instance, key):
+        return key
+
+    @plugins.data_access("wait", execution_mode="thread", cache=False)
+    def wait(key):
+        events[key].wait()
+        return key
+
+    def predict_wait(instance_id, key):
+        return eng.predict(instance_id, common.DataAccess("wait", [key], {}))
+
+    model1 = await eng.add_instance("test", None)
+    model2 = await eng.add_instance("test", None)
+
+    actions = {
+        1: predict_wait(model1.instance_id, 1),
+        2: predict_wait(model1.instance_id, 2),
+        3: predict_wait(model2.instance_id, 3),
+    }
+    await asyncio.sleep(0.01)
+
+    # limit per instance
+    actions[4] = predict_wait(model1.instance_id, 4)
+    # global limit
+    actions[5] = predict_wait(model2.instance_id, 5)
+    await asyncio.sleep(0.01)
+
+    if predict_policy == "reject_new":
+        rejected, admitted = [4, 5], [1, 2, 3]
+    else:
+        rejected, admitted = [1, 2], [3, 4, 5]
+    for key in rejected:
+        events[key].set()
+        with pytest.raises(common.ActionRejectedException):
+            await actions[key].wait_result()
+    for key in admitted:
+        events[key].set()
+        assert await actions[key].wait_result() == key
+    assert {
+        key: action["progress"]
+        for key, action in zip(sorted(actions), eng.state["actions"].values())
+    } == {
+        key: "rejected" if key in rejected else "complete" for key in actions
+    }
+
+    # finished actions are no longer counted
+    action = predict_wait(model1.instance_id, 6)
+    await asyncio.sleep(0.01)
+    events[6].set()
+    assert await action.wait_result() == 6
+
+    await eng.async_close()
+
+
+@pytest.mark.timeout(3)
+async def test_timeout(plugin_teardown):
+    eng = await create_engine(max_children=1)
+
+    @plugins.predict(["test"], updates_instance=False)
+    def predict(instance, duration):
+        time.sleep(duration)
+        return duration
+
+    model = await eng.add_instance("test", None)
+
+    action = eng.predict(
+        model.instance_id, 10, _options=common.ActionOptions(timeout=0.3)
+    )
+    # expires while waiting for the child process
+    waiting_action = eng.predict(
+        model.instance_id, 0, _options=common.ActionOptions(timeout=0.1)
+    )
+    with pytest.raises(common.ActionExpiredException):
+        await waiting_action.wait_result()
+    with pytest.raises(common.ActionExpiredException):
+        await action.wait_result()
+
+    # child process of the expired action is terminated
+    action = eng.predict(
+        model.instance_id, 0, _options=common.ActionOptions(timeout=1)
+    )
+    assert await action.wait_result() == 0
+    assert [
+        action["progress"] for action in eng.state["actions"].values()
+    ] == [
+        "expired",
+        "expired",
+        "complete",
+    ]
+
+    await eng.async_close()
+
+
+@pytest.mark.timeout(3)
+async def test_quotas(plugin_teardown):
+    eng = await create_engine(
+        max_children=2, quotas={"model_types": {"slow": 1}}
+    )
+
+    @plugins.instantiate("slow")
+    def instantiate_slow():
+        time.sleep(0.5)
+        return "slow"
+
+    @plugins.instantiate("fast")
+    def instantiate_fast():
+        return "fast"
+
+    creating = [
+        asyncio.ensure_future(eng.create_instance("slow").wait_result())
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0.1)
+
+    # the second slow instantiation waits, leaving a child process free
+    model = await aio.wait_for(eng.create_instance("fast").wait_result(), 0.3)
+    assert model.instance == "fast"
+    done, _ = await asyncio.wait(creating, timeout=0.6)
+    assert len(done) == 1
+
+    await asyncio.wait(creating)
+    await eng.async_close()
+
+
+@pytest.mark.timeout(3)
+async def test_child_limits(plugin_teardown):
+    nice = os.getpriority(os.PRIO_PROCESS, 0) + 1
+    eng = await create_engine(
+        child_limits={
+            "default": {"nice": nice},
+            "model_types": {"test": {"max_memory": 2**30}},
+        }
+    )
+
+    @plugins.predict(["test"], updates_instance=False)
+    def predict(instance, size):
+        return len(bytearray(size)), os.getpriority(os.PRIO_PROCESS, 0)
+
+    model = await eng.add_instance("test", None)
+    assert await eng.predict(model.instance_id, 1).wait_result() == (1, nice)
+
+    action = eng.predict(model.instance_id, 2**31)
+    with pytest.raises(mprocess.ProcessLimitException):
+        await action.wait_result()
+    assert [
+        action["progress"] for action in eng.state["actions"].values()
+    ] == ["complete", "limit_exceeded"]
+
+    await eng.async_close()
+
+
+async def test_thread_limits(plugin_teardown):
+    # numpy's BLAS is loaded before child processes are forked
+    import numpy  # NOQA
+
+    eng = await create_engine(
+        child_limits={
+            "default": {"threads": 2},
+            "model_types": {"limited": {"threads": 1}},
+        }
+    )
+
+    def predict(instance):
+        return {
+            info["num_threads"]
+            for info in threadpoolctl.threadpool_info()
+            if info["user_api"] == "blas"
+        }
+
+    plugins.predict(["default"], updates_instance=False)(predict)
+    plugins.predict(
+        ["requested", "limited"], updates_instance=False, max_threads=4
+    )(predict)
+
+    for model_type, threads in [
+        ("default", {2}),
+        ("requested", {4}),
+        ("limited", {1}),
+    ]:
+        model = await eng.add_instance(model_type, None)
+        action = eng.predict(model.instance_id)
+        assert await action.wait_result() == threads
+
+    await eng.async_close()
+
+
+@pytest.mark.timeout(2)
+async def test_child_state_interval(plugin_teardown):
+    eng = await create_engine(child_state_interval=10)
+    states = []
+    eng.subscribe_to_state_change(
+        lambda: states.append(eng.state["actions"].get(1, {}).get("action"))
+    )
+
+    @plugins.predict(["test"], state_cb_arg_name="state_cb")
+    def predict(instance, state_cb):
+        for i in range(100):
+            state_cb(i)
+        return instance, None
+
+    model = await eng.add_instance("test", "instance")
+    await eng.predict(model.instance_id).wait_result()
+
+    # only the first state change is sent during the interval, but the
+    # latest one is sent before the result
+    assert set(states) - {None} == {0, 99}
+    assert eng.state["actions"][1]["action"] == 99
+
+    await eng.async_close()
+
+
+@pytest.mark.timeout(2)
+async def test_autoscaling_metrics():
+    eng = await create_engine(
+        max_children=2,
+        autoscaling={"period": 0.05, "stable_periods": 1},
+    )
+    assert eng.autoscaling_metrics is None
+
+    await asyncio.sleep(0.3)
+    assert eng.autoscaling_metrics.max_children == 1
+    assert eng.autoscaling_metrics.queue_depth == 0
+
+    await eng.async_close()
+
+    eng = await create_engine()
+    await asyncio.sleep(0.1)
+    assert eng.autoscaling_metrics is None
+    await eng.async_close()
+
+
+class StateEngine(common.Engine):
+    def __init__(self):
+        self._group = aio.Group()
+        self._state = {"models": {}, "actions": {}}
+        self._callback_registry = util.CallbackRegistry()
+
+    @property
+    def async_group(self):
+        return self._group
+
+    @property
+    def state(self):
+        return self._state
+
+    def set_state(self, state):
+        self._state = state
+        self._callback_registry.notify()
+
+    def subscribe_to_state_change(self, cb):
+        return self._callback_registry.register(cb)
+
+    def create_instance(self, model_type, *args, **kwargs):
+        raise NotImplementedError()
+
+    async def add_instance(self, model_type, instance):
+        raise NotImplementedError()
+
+    async def update_instance(self, model):
+        raise NotImplementedError()
+
+    def fit(self, instance_id, *args, **kwargs):
+        raise NotImplementedError()
+
+    def predict(self, instance_id, *args, **kwargs):
+        raise NotImplementedError()
+
+
+async def test_default_state_diff():
+    eng = StateEngine()
+    changes = []
+    eng.subscribe_to_state_diff(changes.append)
+    assert eng.state_version == 0
+
+    model = common.Model(instance=None, model_type="test", instance_id=1)
+    action = {"progress": "executing"}
+    eng.set_state({"models": {1: model}, "actions": {1: action}})
+    eng.set_state(
+        {"models": {1: model}, "actions": {1: {"progress": "complete"}}}
+    )
+    eng.set_state({"models": {1: model}, "actions": {}})
+    assert eng.state_version == 3
+    assert changes == [
+        [
+            common.StateChange(1, "models", 1, model),
+            common.StateChange(1, "actions", 1, action),
+        ],
+        [common.StateChange(2, "actions", 1, {"progress": "complete"})],
+        [common.StateChange(3, "actions", 1, None, True)],
+    ]
+
+    await eng.async_close()
+
+
+async def test_default_actions():
+    eng = StateEngine()
+    actions = {
+        1: {"meta": {"call": "create_instance"}, "progress": "complete"},
+        2: {"meta": {"call": "fit", "model": 1}, "progress": "complete"},
+        3: {"meta": {"call": "predict", "model": 1}, "progress": "executing"},
+        4: {"meta": {"call": "predict", "model": 2}, "progress": "complete"},
+    }
+    eng.set_state({"models": {}, "actions": actions})
+
+    assert eng.get_actions() == actions
+    assert list(eng.get_actions(progress="complete")) == [1, 2, 4]
+    assert list(eng.get_actions(instance_id=1)) == [2, 3]
+    assert list(eng.get_actions("complete", 1)) == [2]
+
+    # engines without action history keep all actions in the state
+    assert eng.archive_actions() == {}
+    assert eng.state["actions"] == actions
+
+    await eng.async_close()
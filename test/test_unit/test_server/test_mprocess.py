@@ -2,8 +2,16 @@ from hat import aio
 from pytest_cov.embed import cleanup_on_signal
 import asyncio
 import contextlib
+import gc
+import numpy
+import os
+import pandas
 import pytest
+import resource
 import signal
+import sys
+import threading
+import threadpoolctl
 import time
 
 from aimm.server import mprocess
@@ -25,6 +33,110 @@ def disable_sigterm_handler(monkeypatch):
         yield
 
 
+def _fn_args(*f_args, **f_kwargs):
+    return f_args, f_kwargs
+
+
+def _fn_pid():
+    return os.getpid()
+
+
+def _fn_state(state_cb, states):
+    for state in states:
+        state_cb(state)
+    return "done"
+
+
+def _fn_state_sleep(state_cb, states, duration):
+    _fn_state(state_cb, states)
+    time.sleep(duration)
+    return "done"
+
+
+def _fn_exception(exception_text):
+    raise Exception(exception_text)
+
+
+def _fn_sleep():
+    time.sleep(10)
+
+
+_pickled = []
+
+
+class _Counted:
+    def __getstate__(self):
+        _pickled.append(self)
+        return {}
+
+
+def _fn_id(value):
+    return id(value)
+
+
+def _fn_arrays(array, df):
+    return {"array": array * 2, "df": df, "small": numpy.arange(3)}
+
+
+def _shm_segments():
+    return {
+        name for name in os.listdir("/dev/shm") if name.startswith("aimm_")
+    }
+
+
+def _mapped_segments():
+    with open("/proc/self/maps") as f:
+        return {line.split()[-2] for line in f if "/dev/shm/aimm_" in line}
+
+
+def _fn_kill_self():
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def _fn_state_wait(state_cb, duration):
+    state_cb("started")
+    time.sleep(duration)
+    return "done"
+
+
+def _fn_zygote(state_cb, module):
+    state_cb("started")
+    return os.getppid(), gc.get_freeze_count(), module in sys.modules
+
+
+def _fn_limits():
+    return (
+        resource.getrlimit(resource.RLIMIT_AS)[0],
+        os.sched_getaffinity(0),
+        os.getpriority(os.PRIO_PROCESS, 0),
+        os.getpid(),
+    )
+
+
+def _fn_threads():
+    return os.environ.get("OMP_NUM_THREADS"), _blas_threads(), os.getpid()
+
+
+def _blas_threads():
+    # numpy, imported by this module, loads its BLAS before child processes
+    # are forked, so environment variables no longer affect it
+    return {
+        info["num_threads"]
+        for info in threadpoolctl.threadpool_info()
+        if info["user_api"] == "blas"
+    }
+
+
+def _fn_allocate(size):
+    return len(bytearray(size))
+
+
+def _fn_wait(duration):
+    start = time.monotonic()
+    time.sleep(duration)
+    return start
+
+
 @pytest.mark.timeout(2)
 @pytest.mark.parametrize("action_count", [1, 2, 10])
 async def test_process_regular(action_count, disable_sigterm_handler):
@@ -48,6 +160,269 @@ async def test_process_regular(action_count, disable_sigterm_handler):
     await pa_pool.async_close()
 
 
+@pytest.mark.timeout(2)
+@pytest.mark.parametrize("worker_pool", [False, True])
+async def test_process_fifo(worker_pool, disable_sigterm_handler):
+    pa_pool = mprocess.ProcessManager(
+        1, aio.Group(), None, 2, worker_pool=worker_pool
+    )
+    async with aio.Group() as group:
+        tasks = []
+        for _ in range(4):
+            handler = pa_pool.create_handler(lambda _: None)
+            tasks.append(group.spawn(handler.run, _fn_wait, 0.05))
+        await asyncio.sleep(0.01)
+        assert pa_pool.active_children == 1
+        assert pa_pool.queue_depth == 3
+
+        await asyncio.wait(tasks, return_when=asyncio.ALL_COMPLETED)
+
+    starts = [t.result() for t in tasks]
+    assert starts == sorted(starts)
+    assert pa_pool.queue_depth == 0
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(2)
+@pytest.mark.parametrize("worker_pool", [False, True])
+async def test_process_concurrent(worker_pool, disable_sigterm_handler):
+    pa_pool = mprocess.ProcessManager(
+        3, aio.Group(), None, 2, worker_pool=worker_pool
+    )
+    async with aio.Group() as group:
+        tasks = []
+        for _ in range(3):
+            handler = pa_pool.create_handler(lambda _: None)
+            tasks.append(group.spawn(handler.run, _fn_wait, 0.3))
+        await asyncio.sleep(0.1)
+        assert pa_pool.active_children == 3
+        assert pa_pool.queue_depth == 0
+
+        await asyncio.wait(tasks, return_when=asyncio.ALL_COMPLETED)
+
+    starts = [t.result() for t in tasks]
+    assert max(starts) - min(starts) < 0.3
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(3)
+@pytest.mark.parametrize("worker_pool", [False, True])
+async def test_process_classes(worker_pool, disable_sigterm_handler):
+    pa_pool = mprocess.ProcessManager(
+        2,
+        aio.Group(),
+        None,
+        2,
+        worker_pool=worker_pool,
+        process_classes={
+            "online": mprocess.ProcessClass(reserved=1, priority=1)
+        },
+    )
+    async with aio.Group() as group:
+
+        def run(process_class, duration):
+            handler = pa_pool.create_handler(lambda _: None, process_class)
+            return group.spawn(handler.run, _fn_wait, duration)
+
+        batch_running = run("batch", 0.3)
+        await asyncio.sleep(0.05)
+        batch_waiting = run("batch", 0)
+        online_running = run("online", 0.5)
+        await asyncio.sleep(0.05)
+        assert pa_pool.active_children == 2
+        assert pa_pool.queue_depth == 1
+
+        online_waiting = run("online", 0)
+        await asyncio.sleep(0.05)
+        assert pa_pool.queue_depth == 2
+
+        await asyncio.wait(
+            [batch_running, batch_waiting, online_running, online_waiting]
+        )
+
+    assert online_running.result() < batch_running.result() + 0.1
+    assert online_waiting.result() < batch_waiting.result()
+    assert online_waiting.result() < online_running.result() + 0.5
+
+    await pa_pool.async_close()
+
+
+async def test_process_classes_reserved():
+    async with aio.Group() as group:
+        with pytest.raises(ValueError):
+            mprocess.ProcessManager(
+                2,
+                group,
+                None,
+                2,
+                process_classes={
+                    "a": mprocess.ProcessClass(reserved=2),
+                    "b": mprocess.ProcessClass(reserved=1),
+                },
+            )
+
+
+@pytest.mark.timeout(2)
+@pytest.mark.parametrize("worker_pool", [False, True])
+async def test_process_quotas(worker_pool, disable_sigterm_handler):
+    pa_pool = mprocess.ProcessManager(
+        3, aio.Group(), None, 2, worker_pool=worker_pool, quotas={"a": 1}
+    )
+    async with aio.Group() as group:
+        tasks = []
+        for quota_keys in [["a"], ["a", "b"], ["b"]]:
+            handler = pa_pool.create_handler(
+                lambda _: None, quota_keys=quota_keys
+            )
+            tasks.append(group.spawn(handler.run, _fn_wait, 0.2))
+        await asyncio.sleep(0.1)
+        assert pa_pool.active_children == 2
+        assert pa_pool.queue_depth == 1
+
+        await asyncio.wait(tasks, return_when=asyncio.ALL_COMPLETED)
+
+    first, second, third = [t.result() for t in tasks]
+    assert second - first >= 0.2
+    assert third < second
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(5)
+@pytest.mark.parametrize("worker_pool", [False, True])
+async def test_autoscaling(worker_pool, disable_sigterm_handler, monkeypatch):
+    monkeypatch.setattr(os, "cpu_count", lambda: 6)
+    autoscaling = mprocess.Autoscaling(
+        min_children=1, period=0.05, stable_periods=2, max_cpu_utilization=100
+    )
+    pa_pool = mprocess.ProcessManager(
+        3,
+        aio.Group(),
+        None,
+        2,
+        worker_pool=worker_pool,
+        autoscaling=autoscaling,
+    )
+    assert pa_pool.max_children == 3
+    assert pa_pool.autoscaling_metrics is None
+    handler = pa_pool.create_handler(lambda _: None)
+    threads, _, _ = await handler.run(_fn_threads)
+    assert threads == "2"
+
+    # unused child processes are removed, down to the minimum
+    await asyncio.sleep(0.5)
+    assert pa_pool.max_children == 1
+    assert pa_pool.autoscaling_metrics.max_children == 1
+    assert pa_pool.autoscaling_metrics.peak_children == 0
+
+    # default number of threads follows the number of child processes
+    handler = pa_pool.create_handler(lambda _: None)
+    threads, _, _ = await handler.run(_fn_threads)
+    assert threads == "6"
+
+    # waiting handlers add child processes, up to the maximum
+    async with aio.Group() as group:
+        tasks = [
+            group.spawn(
+                pa_pool.create_handler(lambda _: None).run, _fn_wait, 1
+            )
+            for _ in range(4)
+        ]
+        while pa_pool.max_children < 3:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.2)
+        assert pa_pool.max_children == 3
+        assert pa_pool.active_children == 3
+        assert pa_pool.autoscaling_metrics.queue_depth == 1
+        await asyncio.wait(tasks)
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(3)
+async def test_autoscaling_memory(disable_sigterm_handler):
+    autoscaling = mprocess.Autoscaling(
+        min_children=1,
+        period=0.05,
+        stable_periods=1,
+        max_cpu_utilization=100,
+        min_available_memory=2**62,
+    )
+    pa_pool = mprocess.ProcessManager(
+        2, aio.Group(), None, 2, autoscaling=autoscaling
+    )
+    async with aio.Group() as group:
+        tasks = [
+            group.spawn(
+                pa_pool.create_handler(lambda _: None).run, _fn_wait, 1
+            )
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0.3)
+        # child processes are removed despite the waiting handlers
+        assert pa_pool.max_children == 1
+        assert pa_pool.queue_depth > 0
+        await asyncio.wait(tasks)
+
+    with pytest.raises(ValueError):
+        mprocess.ProcessManager(
+            2,
+            aio.Group(),
+            None,
+            2,
+            process_classes={"a": mprocess.ProcessClass(reserved=2)},
+            autoscaling=autoscaling,
+        )
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(2)
+async def test_process_cancel_waiting(disable_sigterm_handler):
+    pa_pool = mprocess.ProcessManager(1, aio.Group(), None, 2)
+    async with aio.Group() as group:
+        running = pa_pool.create_handler(lambda _: None)
+        running_task = group.spawn(running.run, _fn_wait, 0.2)
+        waiting = pa_pool.create_handler(lambda _: None)
+        waiting_group = group.create_subgroup()
+        waiting_group.spawn(waiting.run, _fn_wait, 0)
+        await asyncio.sleep(0.05)
+        assert pa_pool.queue_depth == 1
+
+        await waiting_group.async_close()
+        assert pa_pool.queue_depth == 0
+
+        await running_task
+
+    handler = pa_pool.create_handler(lambda _: None)
+    await handler.run(_fn_wait, 0)
+    await handler.wait_closed()
+    assert pa_pool.active_children == 0
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(2)
+@pytest.mark.parametrize("worker_pool", [False, True])
+async def test_process_cancel_running(disable_sigterm_handler, worker_pool):
+    pa_pool = mprocess.ProcessManager(1, aio.Group(), None, 2, worker_pool)
+    running = pa_pool.create_handler(lambda _: None)
+    running_task = asyncio.create_task(running.run(_fn_wait, 10))
+    await asyncio.sleep(0.2)
+    running_task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await running_task
+    await running.wait_closed()
+
+    handler = pa_pool.create_handler(lambda _: None)
+    await handler.run(_fn_wait, 0)
+    await handler.wait_closed()
+
+    await pa_pool.async_close()
+
+
 @pytest.mark.timeout(2)
 async def test_process_exception(disable_sigterm_handler):
     exception_text = "test exception"
@@ -113,3 +488,458 @@ async def test_process_sigkill():
         assert not task.exception()
 
     await pa_pool.async_close()
+
+
+@pytest.mark.timeout(2)
+@pytest.mark.parametrize("worker_pool", [False, True])
+async def test_process_killed(worker_pool, disable_sigterm_handler):
+    pa_pool = mprocess.ProcessManager(
+        1, aio.Group(), None, 2, worker_pool=worker_pool
+    )
+    handler = pa_pool.create_handler(lambda _: None)
+    async with aio.Group() as group:
+
+        async def _run():
+            with pytest.raises(ProcessTerminatedException):
+                await handler.run(_fn_kill_self)
+
+        await group.spawn(_run)
+
+    handler = pa_pool.create_handler(lambda _: None)
+    assert await handler.run(_fn_args, 1) == ((1,), {})
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(3)
+@pytest.mark.parametrize("worker_pool", [False, True])
+async def test_process_no_threads(worker_pool, disable_sigterm_handler):
+    pa_pool = mprocess.ProcessManager(
+        10, aio.Group(), None, 2, worker_pool=worker_pool
+    )
+    threads = set(threading.enumerate())
+    states = []
+    async with aio.Group() as group:
+        tasks = []
+        for _ in range(10):
+            handler = pa_pool.create_handler(states.append)
+            tasks.append(
+                group.spawn(
+                    handler.run,
+                    _fn_state_wait,
+                    handler.proc_notify_state_change,
+                    0.5,
+                )
+            )
+        await asyncio.sleep(0.3)
+        assert set(threading.enumerate()) <= threads
+        await asyncio.wait(tasks, return_when=asyncio.ALL_COMPLETED)
+
+    assert [t.result() for t in tasks] == ["done"] * 10
+    assert states == ["started"] * 10
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(2)
+@pytest.mark.parametrize("action_count", [1, 2, 10])
+@pytest.mark.parametrize("max_children", [1, 3])
+async def test_worker_pool_regular(
+    action_count, max_children, disable_sigterm_handler
+):
+    args = ("arg1", "arg2")
+    kwargs = {"k1": "v1", "k2": "v2"}
+
+    pa_pool = mprocess.ProcessManager(
+        max_children, aio.Group(), 0.1, 2, worker_pool=True
+    )
+    async with aio.Group() as group:
+        tasks = []
+        for _ in range(action_count):
+            process_action = pa_pool.create_handler(lambda _: None)
+            tasks.append(
+                group.spawn(process_action.run, _fn_args, *args, **kwargs)
+            )
+        await asyncio.wait(tasks, return_when=asyncio.ALL_COMPLETED)
+
+    assert [t.result() for t in tasks] == [(args, kwargs)] * action_count
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(2)
+async def test_worker_pool_reuse(disable_sigterm_handler):
+    pa_pool = mprocess.ProcessManager(1, aio.Group(), 0.1, 2, worker_pool=True)
+
+    pids = set()
+    for _ in range(5):
+        handler = pa_pool.create_handler(lambda _: None)
+        pids.add(await handler.run(_fn_pid))
+        await handler.wait_closed()
+
+    assert len(pids) == 1
+    assert os.getpid() not in pids
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(2)
+async def test_worker_pool_state(disable_sigterm_handler):
+    pa_pool = mprocess.ProcessManager(1, aio.Group(), 0.1, 2, worker_pool=True)
+    states = []
+    handler = pa_pool.create_handler(states.append)
+
+    result = await handler.run(
+        _fn_state, handler.proc_notify_state_change, states=[1, 2, 3]
+    )
+    assert result == "done"
+    assert states == [1, 2, 3]
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(3)
+@pytest.mark.parametrize("worker_pool", [False, True])
+async def test_state_interval(worker_pool, disable_sigterm_handler):
+    pa_pool = mprocess.ProcessManager(
+        1, aio.Group(), None, 2, worker_pool=worker_pool, state_interval=0.2
+    )
+    states = []
+    handler = pa_pool.create_handler(states.append)
+    result = await handler.run(
+        _fn_state, handler.proc_notify_state_change, states=range(1000)
+    )
+    assert result == "done"
+    assert states[0] == 0
+    assert states[-1] == 999
+    assert len(states) < 10
+    await handler.wait_closed()
+
+    # state changes are coalesced per substate
+    states = []
+    handler = pa_pool.create_handler(states.append)
+    result = await handler.run(
+        _fn_state,
+        handler.proc_notify_state_change,
+        states=[
+            mprocess.Substate("a", 1),
+            mprocess.Substate("b", 1),
+            mprocess.Substate("a", 2),
+            3,
+            4,
+        ],
+    )
+    assert result == "done"
+    assert states == [
+        mprocess.Substate("a", 1),
+        mprocess.Substate("b", 1),
+        mprocess.Substate("a", 2),
+        4,
+    ]
+    await handler.wait_closed()
+
+    # latest state is sent once the interval passes, while the call runs
+    states = []
+    handler = pa_pool.create_handler(states.append)
+    task = asyncio.create_task(
+        handler.run(
+            _fn_state_sleep,
+            handler.proc_notify_state_change,
+            states=[1, 2, 3],
+            duration=1,
+        )
+    )
+    await asyncio.sleep(0.6)
+    assert not task.done()
+    assert states == [1, 3]
+    assert await task == "done"
+    assert states == [1, 3]
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(2)
+async def test_worker_pool_exception(disable_sigterm_handler):
+    exception_text = "test exception"
+
+    pa_pool = mprocess.ProcessManager(1, aio.Group(), 0.1, 2, worker_pool=True)
+    handler = pa_pool.create_handler(lambda _: None)
+
+    with pytest.raises(Exception, match=exception_text):
+        await handler.run(_fn_exception, exception_text)
+    await handler.wait_closed()
+
+    handler = pa_pool.create_handler(lambda _: None)
+    assert await handler.run(_fn_args, 1) == ((1,), {})
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(3)
+async def test_worker_pool_sigterm(disable_sigterm_handler):
+    pa_pool = mprocess.ProcessManager(1, aio.Group(), 0.1, 2, worker_pool=True)
+    handler = pa_pool.create_handler(lambda _: None)
+    pid = await handler.run(_fn_pid)
+
+    handler = pa_pool.create_handler(lambda _: None)
+    async with aio.Group() as group:
+
+        async def _run():
+            with pytest.raises(ProcessTerminatedException):
+                await handler.run(_fn_sleep)
+
+        task = group.spawn(_run)
+        await asyncio.sleep(0.2)
+        await handler.async_close()
+        await task
+        assert not task.exception()
+
+    handler = pa_pool.create_handler(lambda _: None)
+    assert await handler.run(_fn_pid) != pid
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(2)
+async def test_worker_pool_resident(disable_sigterm_handler):
+    pa_pool = mprocess.ProcessManager(
+        1, aio.Group(), None, 2, worker_pool=True, max_resident=1
+    )
+    _pickled.clear()
+
+    async def run(key, version, value):
+        handler = pa_pool.create_handler(lambda _: None)
+        arg = mprocess.Resident(key=key, version=version, value=value)
+        return await handler.run(_fn_id, arg)
+
+    value = _Counted()
+    first_id = await run(1, 1, value)
+    assert len(_pickled) == 1
+    assert await run(1, 1, value) == first_id
+    assert len(_pickled) == 1
+
+    assert await run(1, 2, value) != first_id
+    assert len(_pickled) == 2
+
+    await run(2, 1, value)
+    assert len(_pickled) == 3
+    await run(1, 2, value)
+    assert len(_pickled) == 4
+
+    pa_pool.invalidate_resident(1)
+    await run(1, 2, value)
+    assert len(_pickled) == 5
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(2)
+async def test_resident_without_pool(disable_sigterm_handler):
+    pa_pool = mprocess.ProcessManager(1, aio.Group(), None, 2)
+    handler = pa_pool.create_handler(lambda _: None)
+    arg = mprocess.Resident(key=1, version=1, value="value")
+    assert await handler.run(_fn_args, arg) == (("value",), {})
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(3)
+@pytest.mark.parametrize("worker_pool", [False, True])
+@pytest.mark.filterwarnings("error::pytest.PytestUnraisableExceptionWarning")
+async def test_shared_memory(worker_pool, disable_sigterm_handler):
+    pa_pool = mprocess.ProcessManager(
+        1,
+        aio.Group(),
+        None,
+        2,
+        worker_pool=worker_pool,
+        shared_memory_threshold=1024,
+    )
+    array = numpy.arange(10_000, dtype=float)
+    df = pandas.DataFrame({"a": numpy.arange(10_000), "b": ["x"] * 10_000})
+
+    handler = pa_pool.create_handler(lambda _: None)
+    result = await handler.run(_fn_arrays, array, df=df)
+    await handler.wait_closed()
+
+    numpy.testing.assert_array_equal(result["array"], array * 2)
+    pandas.testing.assert_frame_equal(result["df"], df)
+    numpy.testing.assert_array_equal(result["small"], numpy.arange(3))
+    result["array"][0] = 1
+    assert result["array"][0] == 1
+    assert not _shm_segments()
+    assert _mapped_segments()
+
+    # segments are unmapped once the objects using them are released
+    array_view = result["array"][10:]
+    del result
+    gc.collect()
+    assert _mapped_segments()
+    assert array_view[0] == 20
+    del array_view
+    gc.collect()
+    assert not _mapped_segments()
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(3)
+@pytest.mark.parametrize("worker_pool", [False, True])
+async def test_shared_memory_exception(worker_pool, disable_sigterm_handler):
+    pa_pool = mprocess.ProcessManager(
+        1,
+        aio.Group(),
+        None,
+        2,
+        worker_pool=worker_pool,
+        shared_memory_threshold=1024,
+    )
+    handler = pa_pool.create_handler(lambda _: None)
+    with pytest.raises(Exception, match="test exception"):
+        await handler.run(_fn_exception, "test exception")
+    await handler.wait_closed()
+
+    handler = pa_pool.create_handler(lambda _: None)
+    async with aio.Group() as group:
+
+        async def _run():
+            with pytest.raises(ProcessTerminatedException):
+                await handler.run(_fn_sleep)
+
+        task = group.spawn(_run)
+        await asyncio.sleep(0.2)
+        await handler.async_close()
+        await task
+    assert not _shm_segments()
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(10)
+@pytest.mark.parametrize("worker_pool", [False, True])
+async def test_zygote(worker_pool):
+    pa_pool = mprocess.ProcessManager(
+        1,
+        aio.Group(),
+        None,
+        2,
+        worker_pool=worker_pool,
+        zygote_preload=["colorsys"],
+    )
+    states = []
+    handler = pa_pool.create_handler(states.append)
+    parent_pid, freeze_count, preloaded = await handler.run(
+        _fn_zygote, handler.proc_notify_state_change, "colorsys"
+    )
+    await handler.wait_closed()
+
+    assert parent_pid != os.getpid()
+    assert freeze_count > 0
+    assert preloaded
+    assert states == ["started"]
+
+    handler = pa_pool.create_handler(lambda _: None)
+    async with aio.Group() as group:
+
+        async def _run():
+            with pytest.raises(ProcessTerminatedException):
+                await handler.run(_fn_sleep)
+
+        task = group.spawn(_run)
+        await asyncio.sleep(0.2)
+        await handler.async_close()
+        await task
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(3)
+@pytest.mark.parametrize("worker_pool", [False, True])
+async def test_limits(worker_pool, disable_sigterm_handler):
+    pa_pool = mprocess.ProcessManager(
+        1, aio.Group(), None, 2, worker_pool=worker_pool
+    )
+    limits = mprocess.ProcessLimits(
+        max_memory=2**30,
+        cpu_affinity=[0],
+        nice=os.getpriority(os.PRIO_PROCESS, 0) + 1,
+    )
+    handler = pa_pool.create_handler(lambda _: None, limits=limits)
+    max_memory, cpu_affinity, nice, pid = await handler.run(_fn_limits)
+    await handler.wait_closed()
+
+    assert max_memory == limits.max_memory
+    assert cpu_affinity == set(limits.cpu_affinity)
+    assert nice == limits.nice
+
+    # limits are not left in the workers of the pool
+    handler = pa_pool.create_handler(lambda _: None)
+    max_memory, _, nice, other_pid = await handler.run(_fn_limits)
+    assert max_memory == resource.getrlimit(resource.RLIMIT_AS)[0]
+    assert nice == os.getpriority(os.PRIO_PROCESS, 0)
+    assert other_pid != pid
+
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(3)
+@pytest.mark.parametrize("worker_pool", [False, True])
+async def test_thread_limits(
+    worker_pool, disable_sigterm_handler, monkeypatch
+):
+    monkeypatch.delenv("OMP_NUM_THREADS", raising=False)
+    pa_pool = mprocess.ProcessManager(
+        2, aio.Group(), None, 2, worker_pool=worker_pool
+    )
+    blas_threads = _blas_threads()
+    assert blas_threads
+    default_threads = max(1, os.cpu_count() // 2)
+    handler = pa_pool.create_handler(lambda _: None)
+    threads, child_blas_threads, pid = await handler.run(_fn_threads)
+    assert threads == str(default_threads)
+    assert child_blas_threads == {default_threads}
+    await handler.wait_closed()
+
+    limits = mprocess.ProcessLimits(threads=3)
+    handler = pa_pool.create_handler(lambda _: None, limits=limits)
+    threads, child_blas_threads, _ = await handler.run(_fn_threads)
+    assert threads == "3"
+    assert child_blas_threads == {3}
+    await handler.wait_closed()
+
+    # thread limits are lifted after calls, so workers are reused
+    limits = mprocess.ProcessLimits(threads=0)
+    handler = pa_pool.create_handler(lambda _: None, limits=limits)
+    threads, child_blas_threads, other_pid = await handler.run(_fn_threads)
+    assert threads is None
+    assert child_blas_threads == blas_threads
+    assert (other_pid == pid) == worker_pool
+
+    await pa_pool.async_close()
+
+    pa_pool = mprocess.ProcessManager(
+        2, aio.Group(), None, 2, worker_pool=worker_pool, max_threads=5
+    )
+    handler = pa_pool.create_handler(lambda _: None)
+    threads, child_blas_threads, _ = await handler.run(_fn_threads)
+    assert threads == "5"
+    assert child_blas_threads == {5}
+    await pa_pool.async_close()
+
+
+@pytest.mark.timeout(3)
+@pytest.mark.parametrize("worker_pool", [False, True])
+async def test_limits_exceeded(worker_pool, disable_sigterm_handler):
+    pa_pool = mprocess.ProcessManager(
+        1, aio.Group(), None, 2, worker_pool=worker_pool
+    )
+    limits = mprocess.ProcessLimits(max_memory=2**30)
+    handler = pa_pool.create_handler(lambda _: None, limits=limits)
+    with pytest.raises(mprocess.ProcessLimitException):
+        await handler.run(_fn_allocate, 2**31)
+    await handler.wait_closed()
+
+    handler = pa_pool.create_handler(lambda _: None, limits=limits)
+    assert await handler.run(_fn_allocate, 2**20) == 2**20
+
+    await pa_pool.async_close()